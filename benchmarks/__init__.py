@@ -0,0 +1,9 @@
+import os
+import sys
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLES_DIR = os.path.join(REPO_DIR, "examples")
+
+# Enable `examplescraper` lookup as benchmarks leverage `examplesite`.
+sys.path.insert(0, EXAMPLES_DIR)
@@ -0,0 +1,235 @@
+"""
+Load the controller (`scrapemeagain.dockerized.controller.server`) with
+N simulated scrapers, for each available `Config.CONTROLLER_SERVER`.
+
+Each scraper runs in its own process and fires the requests a real scraper
+does, i.e. it registers and then repeatedly checks an IP, leases a list URLs
+range (and assigns its list URLs), adds item URLs to the frontier and leases
+a batch of them, sends a batch of items to the datastore and commits,
+releases the leased list and item URLs and sends a heartbeat, i.e. fires up
+to 10 requests per round.
+
+Usage:
+    `python3 -m benchmarks.controller [-r <rounds>] [-b <batch size>]
+    [-s <scrapers> ...]`
+
+    Example:
+    $ python3 -m benchmarks.controller -r 50 -s 1 10 50
+"""
+
+
+import argparse
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+from requests import get, post, RequestException
+
+from scrapemeagain.config import Config
+from scrapemeagain.dockerized.controller import client as controller_client
+
+from benchmarks.utils import EXAMPLESITE_HOST, generate_item_urls, report
+
+
+CONTROLLER_HOST = "localhost"
+CONTROLLER_PORT = 9095
+
+
+def _run_controller(server, data_directory):
+    os.environ["SCRAPER_PACKAGE"] = "examplescraper"
+    # NOTE: `examplescraper` expects it when running in a container.
+    os.environ.setdefault("DOCKER_HOST_IP", EXAMPLESITE_HOST)
+
+    import examplescraper.config  # noqa
+
+    Config.DATA_DIRECTORY = data_directory
+    Config.LOG_LEVEL = "WARNING"
+    Config.CONTROLLER_SERVER = server
+    # NOTE: each scraper checks unique IPs.
+    Config.IPSTORE_REUSE_THRESHOLD = 1
+
+    from scrapemeagain.dockerized.controller import server as controller
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    controller.run(CONTROLLER_HOST, CONTROLLER_PORT)
+
+
+def _wait_for_controller(process, attempts=50):
+    for _ in range(attempts):
+        if not process.is_alive():
+            break
+
+        try:
+            get(controller_client._build_url("health"))
+            return
+        except RequestException:
+            time.sleep(0.1)
+
+    raise RuntimeError("Failed to start the controller")
+
+
+def _lease(endpoint, data):
+    # NOTE: unlike `controller_client` lease once, i.e. don't wait while
+    # there is nothing to lease.
+    response = post(controller_client._build_url(endpoint), json=data)
+    return response.json()
+
+
+def _simulate_scraper(scraper_id, rounds, batch_size, results):
+    scraper = "scraper-{}".format(scraper_id)
+    requests_count = 0
+    failed_count = 0
+
+    def request(function, *args):
+        nonlocal requests_count, failed_count
+
+        requests_count += 1
+        try:
+            return function(*args)
+        except Exception:
+            failed_count += 1
+
+    request(controller_client.register_scraper, scraper)
+
+    urls = generate_item_urls(rounds * batch_size)
+    for round_id in range(rounds):
+        item_urls = [next(urls) for _ in range(batch_size)]
+        batch = [
+            {"url": url, "h1": "Scraper {}".format(scraper_id)}
+            for url in item_urls
+        ]
+        ip = "10.{0}.{1}.{2}".format(
+            scraper_id // 256, scraper_id % 256, round_id % 256
+        )
+
+        request(controller_client.check_ip_safeness, ip)
+
+        list_urls = []
+        lease = request(_lease, "list-urls-lease", {"scraper": scraper})
+        if lease and lease["lease"] is not None:
+            list_urls = [
+                "list-url-{}".format(page)
+                for page in range(lease["start"], lease["end"])
+            ]
+            request(
+                controller_client.assign_list_urls, lease["lease"], list_urls
+            )
+
+        request(controller_client.add_item_urls, item_urls)
+        lease = request(
+            _lease, "item-urls-lease", {"size": batch_size, "scraper": scraper}
+        )
+
+        request(
+            controller_client.insert_multiple_data, batch, uuid.uuid4().hex
+        )
+        request(controller_client.commit)
+
+        if lease and lease["lease"] is not None:
+            request(controller_client.release_item_urls, lease["urls"])
+        if list_urls:
+            request(controller_client.release_list_urls, list_urls)
+
+        request(controller_client.send_heartbeat, scraper)
+
+    request(controller_client.finish_scraper, scraper)
+
+    results.put((requests_count, failed_count))
+
+
+def benchmark_controller(server, scrapers_count, rounds, batch_size):
+    data_directory = tempfile.mkdtemp()
+
+    controller = multiprocessing.Process(
+        target=_run_controller, args=(server, data_directory)
+    )
+    controller.daemon = True
+    controller.start()
+
+    try:
+        _wait_for_controller(controller)
+
+        results = multiprocessing.Queue()
+        scrapers = [
+            multiprocessing.Process(
+                target=_simulate_scraper,
+                args=(scraper_id, rounds, batch_size, results),
+            )
+            for scraper_id in range(scrapers_count)
+        ]
+
+        start = time.perf_counter()
+        for scraper in scrapers:
+            scraper.start()
+        counts = [results.get() for _ in scrapers]
+        elapsed = time.perf_counter() - start
+
+        for scraper in scrapers:
+            scraper.join()
+    finally:
+        controller.terminate()
+        controller.join()
+        shutil.rmtree(data_directory)
+
+    name = "{0} ({1} scrapers)".format(server, scrapers_count)
+    report(
+        name,
+        sum(count[0] for count in counts),
+        sum(count[1] for count in counts),
+        elapsed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-r",
+        "--rounds",
+        type=int,
+        default=50,
+        help="Number of rounds (up to 10 requests each) per scraper.",
+    )
+    parser.add_argument(
+        "-b",
+        "--batch-size",
+        type=int,
+        default=Config.DATASTORE_BATCH_SIZE,
+        help="Number of items sent to the datastore at once.",
+    )
+    parser.add_argument(
+        "-s",
+        "--scrapers",
+        type=int,
+        nargs="+",
+        default=[1, 10],
+        help="Numbers of simulated scrapers to benchmark.",
+    )
+    args = parser.parse_args()
+
+    controller_client.BASE_URL = "http://{0}:{1}".format(
+        CONTROLLER_HOST, CONTROLLER_PORT
+    )
+    # NOTE: don't hide failed requests behind retries.
+    Config.DATASTORE_MAX_ATTEMPTS = 1
+
+    servers = ["flask"]
+    try:
+        import waitress  # noqa
+
+        servers.append("waitress")
+    except ImportError:
+        print('Skipping "waitress", it\'s not installed')
+
+    for scrapers_count in args.scrapers:
+        for server in servers:
+            benchmark_controller(
+                server, scrapers_count, args.rounds, args.batch_size
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Compare inserting rows one ORM object at a time with batched Core inserts
+(`BaseDatabaser.insert`).
+
+Usage:
+    `python3 -m benchmarks.db_inserts [-n <rows>]`
+
+    Example:
+    $ python3 -m benchmarks.db_inserts -n 100000
+"""
+
+
+import argparse
+import shutil
+import tempfile
+import time
+
+from sqlalchemy import Column, Integer, String
+from sqlalchemy.ext.declarative import declarative_base
+
+from scrapemeagain.config import Config
+from scrapemeagain.databaser import Databaser
+
+from benchmarks.utils import generate_item_urls, report
+
+
+Base = declarative_base()
+
+
+class BenchmarkDataTable(Base):
+    __tablename__ = "benchmark_item_data"
+
+    id = Column(Integer, primary_key=True)
+    url = Column(String)
+    title = Column(String)
+    price = Column(Integer)
+
+
+def generate_rows(count):
+    for item_id, url in enumerate(generate_item_urls(count)):
+        yield {"url": url, "title": "Post {}".format(item_id), "price": 100}
+
+
+def orm_insert(databaser, data, table):
+    """The previous `BaseDatabaser.insert`: one ORM object per row."""
+    row = table()
+    for key, value in data.items():
+        setattr(row, key, value)
+
+    databaser.session.add(row)
+    databaser.manage_transaction()
+
+
+def benchmark_inserts(name, insert, rows_count):
+    databaser = Databaser(name, BenchmarkDataTable)
+    rows = list(generate_rows(rows_count))
+
+    start = time.perf_counter()
+    for row in rows:
+        insert(databaser, row, databaser.item_data_table)
+    databaser.commit()
+    elapsed = time.perf_counter() - start
+
+    report(name, rows_count, 0, elapsed, unit="rows")
+
+
+def benchmark_item_urls(name, insert_multiple, rows_count, page_size=50):
+    databaser = Databaser(name, BenchmarkDataTable)
+    rows = [{"url": url} for url in generate_item_urls(rows_count)]
+
+    start = time.perf_counter()
+    for page_start in range(0, rows_count, page_size):
+        page = rows[page_start : page_start + page_size]  # noqa
+        insert_multiple(databaser, page)
+    databaser.commit()
+    elapsed = time.perf_counter() - start
+
+    report(name, rows_count, 0, elapsed, unit="rows")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-n",
+        "--rows",
+        type=int,
+        default=100000,
+        help="Number of rows to insert.",
+    )
+    args = parser.parse_args()
+
+    Config.DATA_DIRECTORY = tempfile.mkdtemp()
+    try:
+        benchmark_inserts("orm", orm_insert, args.rows)
+        benchmark_inserts(
+            "core",
+            lambda databaser, data, table: databaser.insert(data, table),
+            args.rows,
+        )
+        benchmark_item_urls(
+            "item URLs orm",
+            lambda databaser, data: [
+                orm_insert(databaser, item, databaser.item_urls_table)
+                for item in data
+            ],
+            args.rows,
+        )
+        benchmark_item_urls(
+            "item URLs core",
+            lambda databaser, data: databaser.insert_item_urls(data),
+            args.rows,
+        )
+    finally:
+        shutil.rmtree(Config.DATA_DIRECTORY)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Compare the 'threads' and 'asyncio' fetch engines against `examplesite`.
+
+Usage:
+    `python3 -m benchmarks.fetch_engines [-n <requests>] [-w <workers> ...]`
+
+    Example:
+    $ python3 -m benchmarks.fetch_engines -n 2000 -w 50 200 1000
+"""
+
+
+import argparse
+import logging
+import time
+
+from scrapemeagain.config import Config
+from scrapemeagain.pipeline import Pipeline
+
+from benchmarks.utils import (
+    configure_benchmark,
+    examplesite,
+    generate_item_urls,
+    report,
+)
+
+
+def benchmark_engine(engine, workers_count, requests_count):
+    Config.FETCH_ENGINE = engine
+    Config.WORKERS_COUNT = workers_count
+
+    pipeline = Pipeline(None, None, None)
+    pipeline.prepare_pipeline()
+
+    urls = list(generate_item_urls(requests_count))
+
+    start = time.perf_counter()
+    responses = list(pipeline.pool.map(pipeline.fetch, urls))
+    elapsed = time.perf_counter() - start
+
+    pipeline.pool.shutdown()
+
+    failed_count = sum(1 for response in responses if not response.ok)
+    name = "{0} ({1} workers)".format(engine, workers_count)
+    report(name, requests_count, failed_count, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-n",
+        "--requests",
+        type=int,
+        default=2000,
+        help="Number of requests per engine and workers count.",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[Config.WORKERS_COUNT],
+        help="Workers counts (concurrent requests) to benchmark.",
+    )
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    configure_benchmark()
+
+    with examplesite():
+        for workers_count in args.workers:
+            for engine in ("threads", "asyncio"):
+                benchmark_engine(engine, workers_count, args.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Compare requests with and without kept alive connections (`HTTP_KEEP_ALIVE`)
+against `examplesite`.
+
+Usage:
+    `python3 -m benchmarks.http_sessions [-n <requests>] [-w <workers> ...]`
+
+    Example:
+    $ python3 -m benchmarks.http_sessions -n 2000 -w 1 10 50
+"""
+
+
+import argparse
+import logging
+import time
+
+from scrapemeagain.config import Config
+from scrapemeagain.pipeline import Pipeline
+
+from benchmarks.utils import (
+    configure_benchmark,
+    examplesite,
+    generate_item_urls,
+    report,
+)
+
+
+def benchmark_keep_alive(keep_alive, engine, workers_count, requests_count):
+    Config.HTTP_KEEP_ALIVE = keep_alive
+    Config.FETCH_ENGINE = engine
+    Config.WORKERS_COUNT = workers_count
+
+    pipeline = Pipeline(None, None, None)
+    pipeline.prepare_pipeline()
+
+    urls = list(generate_item_urls(requests_count))
+
+    start = time.perf_counter()
+    responses = list(pipeline.pool.map(pipeline.fetch, urls))
+    elapsed = time.perf_counter() - start
+
+    pipeline.pool.shutdown()
+
+    failed_count = sum(1 for response in responses if not response.ok)
+    name = "{0} {1} ({2} workers)".format(
+        engine, "keep-alive" if keep_alive else "close", workers_count
+    )
+    report(name, requests_count, failed_count, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-n",
+        "--requests",
+        type=int,
+        default=2000,
+        help="Number of requests per setting and workers count.",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[Config.WORKERS_COUNT],
+        help="Workers counts (concurrent requests) to benchmark.",
+    )
+    parser.add_argument(
+        "-e",
+        "--engine",
+        choices=("threads", "asyncio"),
+        default="threads",
+        help="Fetch engine to benchmark.",
+    )
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    configure_benchmark()
+
+    with examplesite():
+        for workers_count in args.workers:
+            for keep_alive in (False, True):
+                benchmark_keep_alive(
+                    keep_alive, args.engine, workers_count, args.requests
+                )
+
+
+if __name__ == "__main__":
+    main()
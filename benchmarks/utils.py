@@ -0,0 +1,87 @@
+from contextlib import contextmanager
+import multiprocessing
+import time
+
+from requests import get, RequestException
+from werkzeug.serving import WSGIRequestHandler
+
+from scrapemeagain.config import Config
+
+from examplescraper.examplesite.app import app as examplesite_app
+
+
+EXAMPLESITE_HOST = "localhost"
+EXAMPLESITE_PORT = 9090
+EXAMPLESITE_URL = "http://{0}:{1}/posts/".format(
+    EXAMPLESITE_HOST, EXAMPLESITE_PORT
+)
+
+
+def configure_benchmark():
+    """Make `Config` usable without Tor and Privoxy."""
+    # `examplesite` runs locally so we cannot route traffic via privoxy/tor.
+    Config.LOCAL_HTTP_PROXY = ""
+    Config.USER_AGENTS = ["ScrapeMeAgain benchmark"]
+
+
+def generate_item_urls(count):
+    """Generate `examplesite` item URLs.
+
+    :argument count: number of URLs
+    :type count: int
+
+    :returns iterator
+    """
+    for item_id in range(1, count + 1):
+        yield "{0}{1}".format(EXAMPLESITE_URL, item_id)
+
+
+def _wait_for_examplesite(process, attempts=50):
+    for _ in range(attempts):
+        if not process.is_alive():
+            break
+
+        try:
+            get(EXAMPLESITE_URL)
+            return
+        except RequestException:
+            time.sleep(0.1)
+
+    raise RuntimeError("Failed to start examplesite")
+
+
+def _run_examplesite():
+    # NOTE: the development server speaks HTTP/1.0 by default, i.e. closes
+    # each connection, unlike any real site.
+    WSGIRequestHandler.protocol_version = "HTTP/1.1"
+    examplesite_app.run(EXAMPLESITE_HOST, EXAMPLESITE_PORT, threaded=True)
+
+
+@contextmanager
+def examplesite():
+    """Run `examplesite` in a separate process for the duration of a block."""
+    process = multiprocessing.Process(target=_run_examplesite)
+    process.daemon = True
+    process.start()
+
+    try:
+        _wait_for_examplesite(process)
+        yield EXAMPLESITE_URL
+    finally:
+        process.terminate()
+        process.join()
+
+
+def report(name, requests_count, failed_count, elapsed, unit="requests"):
+    """Print a single benchmark result line."""
+    print(
+        "{name:<34} {count:>7} {unit} {failed:>5} failed "
+        "{elapsed:>8.2f} s {rate:>9.1f} {unit}/s".format(
+            name=name,
+            count=requests_count,
+            unit=unit,
+            failed=failed_count,
+            elapsed=elapsed,
+            rate=requests_count / elapsed,
+        )
+    )
@@ -1,6 +1,7 @@
 import os
 
 from bs4 import BeautifulSoup
+from scrapemeagain.config import Config
 from scrapemeagain.dockerized.controller import (
     client as controller_client,
     urlbrokers,
@@ -73,11 +74,24 @@ class ExampleScraper(BaseScraper):
 
 class DockerizedExampleScraper(ExampleScraper):
     @property
-    def list_urls_range(self):
-        if not hasattr(self, "_list_urls_range"):
-            self._list_urls_range = controller_client.get_list_urls_range()
+    def list_urls_count(self):
+        # NOTE list URLs are leased on demand (see `generate_list_urls`), this
+        # is just the expected share of a single scraper to report progress.
+        return super().list_urls_count // Config.SCRAPERS_COUNT
 
-        return self._list_urls_range
+    def generate_list_urls(self):
+        # Take small chunks of list URLs from the controller one by one, so
+        # faster scrapers process more of them. The controller is told which
+        # URLs a chunk holds, so it's released once all of them are processed.
+        leases = controller_client.lease_list_urls_ranges()
+        for lease_id, start, end in leases:
+            list_urls = [
+                self._format_list_url(list_url_number)
+                for list_url_number in range(start, end, -1)
+            ]
+            controller_client.assign_list_urls(lease_id, list_urls)
+
+            yield from list_urls
 
 
 class ListUrlsBroker(urlbrokers.ListUrlsBroker):
@@ -1,5 +1,4 @@
 from multiprocessing import Event
-from time import sleep
 
 from scrapemeagain.pipeline import Pipeline
 
@@ -11,10 +10,6 @@ class ExhaustApiLimitPipeLine(Pipeline):
         # New event to determine when an IP should be changed.
         self.change_ip_now = Event()
 
-        # Set this to the upper limit of requests per second your target API
-        # is able to handle from a single IP.
-        self.workers_count = 5
-
     def change_ip(self):
         """
         Override the default `change_ip` behavior.
@@ -30,10 +25,6 @@ class ExhaustApiLimitPipeLine(Pipeline):
             self.change_ip_now.clear()
             super().change_ip()
 
-        # Don't overuse the API - make sure you don't fire more than the
-        # allowed number of requests per second.
-        sleep(0.2)  # The actual sleep time may be different for you!
-
     def _classify_response(self, response):
         """
         Override the default `_classify_response` behavior.
@@ -8,6 +8,7 @@ from scrapemeagain.scrapers.examplescraper2.custom_pipeline import (
 from scrapemeagain.scrapers.examplescraper2.scraper import ExampleScraper2
 from scrapemeagain.utils import services
 from scrapemeagain.utils.logger import setup_logging
+from scrapemeagain.utils.ratelimiter import ANY_HOST
 from scrapemeagain.utils.useragents import get_user_agents
 
 
@@ -23,6 +24,10 @@ tor_ip_changer = TorIpChanger(
 # Configure useragents.
 Config.USER_AGENTS = get_user_agents()
 
+# Don't overuse the API - set this to the upper limit of requests per second
+# (and burst) your target API is able to handle from a single IP.
+Config.RATE_LIMITS = {ANY_HOST: (5, 5)}
+
 # Configure logging.
 setup_logging(logger_name="example-scraper2")
 
@@ -37,7 +42,7 @@ try:
     services.start_backbone_services()
 
     # Change IP before starting.
-    pipeline.tor_ip_changer.get_new_ip()
+    pipeline.ip_rotator.change_ip()
 
     # Collect item properties.
     pipeline.get_item_properties()
@@ -0,0 +1,117 @@
+"""
+Adapting the number of requests in flight to how the target site copes.
+"""
+
+
+import logging
+import threading
+
+from scrapemeagain.config import Config
+
+
+# Status codes meaning the target site is overloaded (or the request timed
+# out) and fewer requests should be fired at once.
+OVERLOAD_STATUS_CODES = (408, 429, 503)
+
+
+class ConcurrencyController:
+    def __init__(self, min_limit, max_limit):
+        """AIMD (additive increase, multiplicative decrease) limit of
+        requests in flight.
+
+        The limit starts at `min_limit` and grows by one after each window of
+        `limit` healthy responses. It's cut by `Config.CONCURRENCY_DECREASE`
+        on a timeout, 429 or 503 or on a response slower than
+        `Config.CONCURRENCY_MAX_LATENCY`, but at most once per window as
+        responses to requests fired before the cut are often slow too.
+
+        :argument min_limit:
+        :type min_limit: int
+        :argument max_limit:
+        :type max_limit: int
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+
+        self.decrease = Config.CONCURRENCY_DECREASE
+        self.max_latency = Config.CONCURRENCY_MAX_LATENCY
+
+        self.limit = min_limit
+        self.in_flight = 0
+
+        self._healthy_responses = 0
+        self._responses_since_cut = 0
+        self._condition = threading.Condition()
+
+    def _set_limit(self, limit, reason):
+        """Change the limit and log why.
+
+        :argument limit:
+        :type limit: int
+        :argument reason:
+        :type reason: str
+        """
+        logging.info(
+            "Concurrency limit {0} -> {1} ({2})".format(
+                self.limit, limit, reason
+            )
+        )
+
+        self.limit = limit
+        self._healthy_responses = 0
+        self._condition.notify_all()
+
+    def update(self, response):
+        """Adapt the limit to a finished request.
+
+        :argument response:
+        :type response: request.response
+        """
+        latency = response.elapsed.total_seconds()
+
+        with self._condition:
+            self._responses_since_cut += 1
+
+            if response.status_code in OVERLOAD_STATUS_CODES:
+                reason = "status {}".format(response.status_code)
+            elif latency > self.max_latency:
+                reason = "latency {:.2f}s".format(latency)
+            else:
+                reason = None
+
+            if reason is not None:
+                if self._responses_since_cut >= self.limit:
+                    self._responses_since_cut = 0
+                    self._set_limit(
+                        max(self.min_limit, int(self.limit * self.decrease)),
+                        reason,
+                    )
+                return
+
+            # NOTE: other server errors don't cut the limit, but don't count
+            # as healthy either.
+            if response.status_code >= 500:
+                return
+
+            self._healthy_responses += 1
+            if (
+                self._healthy_responses >= self.limit
+                and self.limit < self.max_limit
+            ):
+                self._set_limit(self.limit + 1, "healthy")
+
+    def acquire(self):
+        """Wait till there are less than `limit` requests in flight and
+        register a new one.
+        """
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+
+            self.in_flight += 1
+
+    def release(self):
+        """Unregister a finished request."""
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
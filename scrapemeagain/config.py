@@ -11,14 +11,131 @@ class Config:
     # How often data (how many items at once) should be commited to the DB.
     TRANSACTION_SIZE = 5000
 
+    # How old (in seconds) a transaction can get before it's commited, even
+    # if it has fewer than `TRANSACTION_SIZE` items. Together with
+    # `TRANSACTION_SIZE` it bounds how much data a crash can lose.
+    TRANSACTION_TIMEOUT = 1
+
+    # SQLite settings applied to each DB connection. The WAL journal mode lets
+    # readers (e.g. reading item URLs to scrape) and the writer (storing data)
+    # work at the same time, 'NORMAL' synchronous mode is safe with WAL.
+    # NOTE a negative 'cache_size' is in KiB, 'mmap_size' is in bytes and
+    # 'busy_timeout' (how long to wait for a locked DB) in milliseconds.
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64 * 1024,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 30000,
+    }
+
+    # How many rows to insert to the DB at once.
+    INSERT_BATCH_SIZE = 500
+
+    # How many pending item URLs to read from the DB at once.
+    ITEM_URLS_BATCH_SIZE = 1000
+
     #
     # Scraping settings.
     # Number of threads used to asynchronously scrape data from URLs.
+    # NOTE with the 'asyncio' fetch engine this is the number of concurrent
+    # requests and can be set to thousands.
     WORKERS_COUNT = 50
 
+    # How many requests to fire at once: 'fixed' always fires
+    # `WORKERS_COUNT`; 'adaptive' starts at `MIN_WORKERS_COUNT` and raises the
+    # limit (up to `WORKERS_COUNT`) while responses are healthy and cuts it
+    # on timeouts, 429s and 503s or on responses slower than
+    # `CONCURRENCY_MAX_LATENCY` (in seconds). Changes are logged.
+    CONCURRENCY_MODE = "fixed"
+    MIN_WORKERS_COUNT = 5
+    CONCURRENCY_MAX_LATENCY = 5
+    # How much to cut the limit, e.g. 0.5 halves it.
+    CONCURRENCY_DECREASE = 0.5
+
+    # Engine used to fire requests: 'threads' (`ThreadPoolExecutor` and
+    # `requests`) or 'asyncio' (a single event loop and `aiohttp`).
+    # NOTE 'asyncio' requires `aiohttp` (`pip install scrapemeagain[asyncio]`).
+    FETCH_ENGINE = "threads"
+
+    # How to dispatch URLs: 'buckets' requests `WORKERS_COUNT` URLs at once and
+    # waits till all of them are finished; 'streaming' keeps `WORKERS_COUNT`
+    # requests in flight and fires a new one as soon as any of them finishes.
+    DISPATCH_MODE = "buckets"
+
+    # Change IP after this many requests in the 'streaming' dispatch mode
+    # (the 'buckets' mode changes IP after each bucket).
+    # NOTE `None` means after each `WORKERS_COUNT` requests.
+    CHANGE_IP_AFTER = None
+
+    # Number of processes scraping data from responses (CPU bound), e.g. set
+    # to `os.cpu_count()` if parsing pages can't keep up with requesting them.
+    PARSER_PROCESSES = 1
+
+    # Number of processes storing data. With more than one, each process
+    # writes its own `<db_name>_<shard>.shard` DB (a shard) and all shards
+    # are merged into the main DB once the pipeline finishes.
+    STORE_PROCESSES = 1
+
     # How long to wait for a response (in seconds).
     REQUEST_TIMEOUT = 10
 
+    # Keep connections (to Privoxy) alive and reuse them for the next
+    # requests rather than connecting for each request. Connections are
+    # reopened after each IP change.
+    HTTP_KEEP_ALIVE = True
+
+    # Max number of connections a 'threads' fetch engine thread keeps alive.
+    HTTP_POOL_SIZE = 10
+
+    # Response headers passed on for scraping (along with URL, status code,
+    # encoding and content), see `scrapemeagain.utils.http.ResponseRecord`.
+    RESPONSE_HEADERS = ("Content-Type", "Last-Modified")
+
+    # Max number of responses waiting to be scraped and of data items waiting
+    # to be stored; when a queue is full the stage feeding it waits.
+    # NOTE 0 means unbounded.
+    RESPONSE_QUEUE_SIZE = 1000
+    DATA_QUEUE_SIZE = 10000
+
+    # Max total size of response bodies waiting to be scraped (in bytes).
+    # NOTE 0 means unbounded.
+    RESPONSE_QUEUE_BYTES = 256 * 1024 * 1024
+
+    # How to pass response bodies from requesting to scraping processes:
+    # 'queue' pickles them through a queue, 'shared_memory' copies them to
+    # a shared memory ring buffer and only their location goes through the
+    # queue.
+    # NOTE 'shared_memory' requires Python 3.8+.
+    RESPONSE_TRANSPORT = "queue"
+
+    # Shared memory ring buffer slots count and slot size (in bytes). Bodies
+    # larger than a slot are pickled through the queue.
+    SHARED_MEMORY_SLOTS = 100
+    SHARED_MEMORY_SLOT_SIZE = 1024 * 1024
+
+    # Max request rates as host -> (requests per second, burst), applied to
+    # each exit IP separately. The '*' host applies to hosts not listed, e.g.
+    # `{"*": (5, 5)}` fires at most 5 requests per second from each IP.
+    # NOTE empty means unlimited.
+    RATE_LIMITS = {}
+
+    #
+    # Retrying failed requests.
+    # How many times to retry an URL which failed with a status code >= 408
+    # (e.g. timed out or a server error) before giving up and storing it in
+    # the 'failed_urls' table. Status codes with a custom policy are retried
+    # as many times as set in `RETRY_POLICIES` (0 means never).
+    RETRY_MAX_RETRIES = 5
+    RETRY_POLICIES = {410: 0, 451: 0, 501: 0, 505: 0, 429: 10}
+
+    # How long to wait before retrying an URL (in seconds). The wait time
+    # doubles with each failed attempt up to the max backoff, a half of it is
+    # random. A longer 'Retry-After' response header is honored.
+    RETRY_BACKOFF = 1
+    RETRY_MAX_BACKOFF = 60
+
     # User agents to use in requests.
     # NOTE must be populated before starting the scraping process.
     USER_AGENTS = None
@@ -46,6 +163,17 @@ class Config:
         "scrapemeagain.dockerized.ipchanger.DockerizedTorIpChanger"
     )
 
+    #
+    # IP rotation.
+    # Change IP in a background thread so requesting URLs doesn't stall.
+    BACKGROUND_IP_CHANGE = True
+    # How many times to try to change IP before giving up (till the next
+    # change) and how long to wait after a failed attempt (in seconds). The
+    # wait time doubles with each failed attempt up to the max backoff.
+    CHANGE_IP_MAX_ATTEMPTS = 5
+    CHANGE_IP_BACKOFF = 0.5
+    CHANGE_IP_MAX_BACKOFF = 10
+
     # =========================================================================
     # DOCKERIZED SETTINGS.
     # =========================================================================
@@ -57,6 +185,17 @@ class Config:
     SCRAPERS_COUNT = 1
     CONTROLLER_PORT = 5000
 
+    #
+    # Controller server.
+    # Server which handles requests from all scrapers, either "flask" (Flask's
+    # development server) or "waitress" (a production WSGI server, requires
+    # `pip install scrapemeagain[waitress]`). Both handle each request in
+    # a separate thread; "waitress" with at most `CONTROLLER_THREADS` threads
+    # at once and at most `CONTROLLER_CONNECTION_LIMIT` open connections.
+    CONTROLLER_SERVER = "flask"
+    CONTROLLER_THREADS = 16
+    CONTROLLER_CONNECTION_LIMIT = 1000
+
     #
     # IpStore.
     IPSTORE_REUSE_THRESHOLD = REUSE_THRESHOLD * SCRAPERS_COUNT
@@ -68,9 +207,54 @@ class Config:
     URLBROKER_CLASS = (
         "scrapemeagain.dockerized.controller.urlbrokers.ListUrlsBroker"
     )
+    # List URLs are leased to scrapers on demand in chunks of at most
+    # `URLS_CHUNK_SIZE` URLs. A chunk which isn't released in
+    # `URLS_LEASE_TIMEOUT` seconds (e.g. its scraper died) is leased again.
+    URLS_CHUNK_SIZE = 10
+    URLS_LEASE_TIMEOUT = 600
+    # How long (at most) a scraper waits before asking for a chunk again while
+    # all chunks are leased to the others (in seconds).
+    URLS_LEASE_POLL_INTERVAL = 5
+
+    #
+    # Item URLs frontier.
+    # Collect item URLs found by all scrapers in the controller (each URL only
+    # once) and lease them to scrapers in batches of `ITEM_URLS_BATCH_SIZE`
+    # URLs, so all scrapers share the item URLs work. Item URLs which aren't
+    # processed in `ITEM_URLS_LEASE_TIMEOUT` seconds are leased again (to
+    # scrapers still leasing item URLs).
+    # NOTE set to `False` to let each scraper process item URLs it found.
+    ITEM_URLS_FRONTIER = True
+    ITEM_URLS_LEASE_TIMEOUT = 600
+
+    #
+    # Scrapers registry.
+    # Scrapers register to the controller, send a heartbeat each
+    # `SCRAPER_HEARTBEAT_INTERVAL` seconds and report once they are done. A
+    # scraper which misses heartbeats for `SCRAPER_HEARTBEAT_TIMEOUT` seconds
+    # is considered dead and the list and item URLs leased to it are leased
+    # again. The master scraper exits as soon as all scrapers are done (or
+    # dead).
+    SCRAPER_HEARTBEAT_INTERVAL = 2
+    SCRAPER_HEARTBEAT_TIMEOUT = 10
+    # Scrapers which don't register in `SCRAPER_REGISTRATION_TIMEOUT` seconds
+    # since the controller started (e.g. they crashed right away) are
+    # considered dead too.
+    SCRAPER_REGISTRATION_TIMEOUT = 120
 
     #
     # DataStore.
     # NOTE set 'scrapemeagain.scrapers.{your scraper}.config.DATASTORE_CLASS'
     # if your scraper adds custom functionality to `DataStoreDatabaser`.
     DATASTORE_DATABASER_CLASS = "scrapemeagain.databaser.DataStoreDatabaser"
+    # How many items a scraper sends to the datastore at once and how long
+    # (in seconds) it may keep collected items before sending them anyway.
+    DATASTORE_BATCH_SIZE = 100
+    DATASTORE_FLUSH_INTERVAL = 1
+    # How many times to try to send items before giving up (till the next
+    # flush) and how long to wait after a failed attempt (in seconds). The
+    # wait time doubles with each failed attempt.
+    DATASTORE_MAX_ATTEMPTS = 5
+    DATASTORE_BACKOFF = 0.5
+    # How many inserts (requests) may wait for the datastore writer thread.
+    DATASTORE_WRITER_QUEUE_SIZE = 1000
@@ -3,16 +3,43 @@ Common database functionality.
 """
 
 
+import copy
 import logging
+import math
 import os
+import re
 import socket
+import time
 
-from sqlalchemy import create_engine
+from requests import RequestException
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker
 
 from scrapemeagain.config import Config
 from scrapemeagain.dockerized.controller import client as controller_client
-from scrapemeagain.scrapers.basemodel import ItemUrlsTable
+from scrapemeagain.scrapers.basemodel import FailedUrlsTable, ItemUrlsTable
+
+
+# Max number of values bound in a single query, SQLite's default limit is 999.
+SQL_VARIABLES_MAX = 900
+
+# Name of a DB shard, see `BaseDatabaser.get_shard`.
+SHARD_NAME = "{0}_{1}"
+
+# File extensions of a DB and of a DB shard. Shards have their own extension,
+# so no other DB is ever merged into the main DB (and removed) as a shard.
+DB_EXTENSION = "sqlite"
+SHARD_EXTENSION = "shard"
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Apply `Config.SQLITE_PRAGMAS` to a new DB connection.
+    """
+    cursor = dbapi_connection.cursor()
+    for pragma, value in Config.SQLITE_PRAGMAS.items():
+        cursor.execute("PRAGMA {0} = {1}".format(pragma, value))
+    cursor.close()
 
 
 class BaseDatabaser:
@@ -29,13 +56,40 @@ class BaseDatabaser:
 
         self.item_data_table = data_table
         self.item_urls_table = ItemUrlsTable
+        self.failed_urls_table = FailedUrlsTable
 
-        self.transaction_items = 0
         self.transaction_items_max = Config.TRANSACTION_SIZE
+        self.transaction_timeout = Config.TRANSACTION_TIMEOUT
+        self.pending_rows_max = Config.INSERT_BATCH_SIZE
+
+        # Flag marking a DB shard, see `get_shard`.
+        self.is_shard = False
+
+        self.connect()
+
+    def connect(self):
+        """
+        Open a session to the DB with a clean transaction state.
+        """
+        self.transaction_items = 0
+        self.transaction_started_at = None
+
+        # Rows waiting to be inserted at once, per table and set of columns.
+        self.pending_rows = {}
+
+        # Item URLs waiting to be marked as done at once.
+        self.pending_done_urls = []
 
         self.engine = self.create_engine()
         self.session = sessionmaker(bind=self.engine)()
 
+    def close(self):
+        """
+        Close the session and all DB connections.
+        """
+        self.session.close()
+        self.engine.dispose()
+
     def create_engine(self):
         """
         Create an SQLite database engine.
@@ -44,12 +98,25 @@ class BaseDatabaser:
         if not os.path.exists(Config.DATA_DIRECTORY):
             os.makedirs(Config.DATA_DIRECTORY)
 
-        db = os.path.join(Config.DATA_DIRECTORY, self.db_name) + ".sqlite"
+        db = self.get_db_path()
         if not os.path.exists(db):
             with open(db, "w"):
                 pass
 
-        return create_engine("sqlite:///{}".format(db))
+        engine = create_engine("sqlite:///{}".format(db))
+        event.listen(engine, "connect", set_sqlite_pragmas)
+
+        return engine
+
+    def get_db_path(self):
+        """
+        Get path to the SQLite database file.
+        """
+        extension = SHARD_EXTENSION if self.is_shard else DB_EXTENSION
+
+        return os.path.join(
+            Config.DATA_DIRECTORY, "{0}.{1}".format(self.db_name, extension)
+        )
 
     def create_tables(self, create_urls_table=True, create_data_table=True):
         """
@@ -57,45 +124,201 @@ class BaseDatabaser:
         """
         if create_urls_table:
             self.item_urls_table.__table__.create(self.engine, checkfirst=True)
+            self._migrate_item_urls_table()
+            self.failed_urls_table.__table__.create(
+                self.engine, checkfirst=True
+            )
 
         if create_data_table:
             self.item_data_table.__table__.create(self.engine, checkfirst=True)
 
+    def _migrate_item_urls_table(self):
+        """
+        Add the status column and indexes to an item URLs table created by
+        an older version.
+
+        NOTE: duplicate item URLs are removed (once) before the unique URL
+        index is created.
+        """
+        table = self.item_urls_table.__table__
+
+        inspector = inspect(self.engine)
+        columns = [
+            column["name"] for column in inspector.get_columns(table.name)
+        ]
+        indexes = {
+            index["name"]: bool(index["unique"])
+            for index in inspector.get_indexes(table.name)
+        }
+
+        with self.engine.begin() as connection:
+            if self.item_urls_table.status.key not in columns:
+                connection.execute(
+                    text(
+                        "ALTER TABLE {table} ADD COLUMN {status} INTEGER "
+                        "NOT NULL DEFAULT {pending}".format(
+                            table=table.name,
+                            status=self.item_urls_table.status.key,
+                            pending=self.item_urls_table.PENDING,
+                        )
+                    )
+                )
+
+            for index in table.indexes:
+                if indexes.get(index.name) == bool(index.unique):
+                    continue
+
+                if index.name in indexes:
+                    connection.execute(
+                        text("DROP INDEX {}".format(index.name))
+                    )
+
+                if index.unique:
+                    self._remove_duplicate_item_urls(connection)
+
+                connection.execute(
+                    text(
+                        "CREATE {unique}INDEX {name} "
+                        "ON {table} ({columns})".format(
+                            unique="UNIQUE " if index.unique else "",
+                            name=index.name,
+                            table=table.name,
+                            columns=", ".join(
+                                column.name for column in index.columns
+                            ),
+                        )
+                    )
+                )
+
+    def flush(self):
+        """
+        Insert all pending rows and mark all pending item URLs as done.
+        """
+        pending_rows = self.pending_rows
+        self.pending_rows = {}
+
+        for (table, _), rows in pending_rows.items():
+            self.session.execute(table.__table__.insert(), rows)
+
+        self._flush_done_urls()
+
+    def _flush_done_urls(self):
+        """
+        Mark pending item URLs as done, many URLs per statement.
+        """
+        urls = self.pending_done_urls
+        self.pending_done_urls = []
+
+        table = self.item_urls_table
+
+        if self.is_shard and urls:
+            # NOTE: item URLs read from the main DB aren't in the shard, keep
+            # them so they can be marked as done when the shard is merged.
+            self.session.execute(
+                table.__table__.insert().prefix_with("OR IGNORE"),
+                [{"url": url, "status": table.DONE} for url in urls],
+            )
+
+        for start in range(0, len(urls), SQL_VARIABLES_MAX):
+            self.session.query(table).filter(
+                table.url.in_(urls[start : start + SQL_VARIABLES_MAX])  # noqa
+            ).update({table.status: table.DONE}, synchronize_session=False)
+
     def commit(self):
         """
-        Commit changes.
+        Commit changes and report how many items were committed and how long
+        it took.
+
+        :returns bool: whether changes were committed
         """
+        committed_at = time.monotonic()
+        transaction_items = self.transaction_items
+
+        # NOTE: a new transaction starts either way, as a rolled back one is
+        # gone.
+        self.transaction_items = 0
+        self.transaction_started_at = None
+
         try:
+            self.flush()
             self.session.commit()
-            self.transaction_items = 0
-            logging.info("Changes successfully committed")
         except Exception as exc:
             logging.error("Failed to commit changes, rolling back ...")
             logging.exception(exc)
             self.session.rollback()
+            return False
 
-    def manage_transaction(self):
+        logging.info(
+            "Changes successfully committed ({0} items in {1:.1f} ms)".format(
+                transaction_items, (time.monotonic() - committed_at) * 1000
+            )
+        )
+
+        return True
+
+    def _add_transaction_item(self):
         """
-        Manage transaction, i.e. decide when to commit.
+        Count an item to the open transaction.
         """
+        if self.transaction_started_at is None:
+            self.transaction_started_at = time.monotonic()
+
         self.transaction_items += 1
+
+    def is_commit_due(self):
+        """
+        Check whether the open transaction should be committed, i.e. whether
+        it holds more than `transaction_items_max` items or is older than
+        `transaction_timeout` seconds.
+
+        :returns bool
+        """
+        if not self.transaction_items:
+            return False
+
         if self.transaction_items > self.transaction_items_max:
+            return True
+
+        return (
+            time.monotonic() - self.transaction_started_at
+            >= self.transaction_timeout
+        )
+
+    def commit_if_due(self):
+        """
+        Commit changes if the open transaction is big or old enough.
+        """
+        if self.is_commit_due():
             self.commit()
 
+    def manage_transaction(self):
+        """
+        Manage transaction, i.e. decide when to commit.
+        """
+        self._add_transaction_item()
+        self.commit_if_due()
+
     def _actually_insert(self, data, table):
         """
         Insert data to table.
 
+        NOTE: rows are inserted in batches (via `executemany`), a batch is
+        formed by rows with the same columns so missing values still get
+        column defaults.
+
         :argument data:
         :type data: dict
         :argument table: table reference
         :type table: SQLAlchemy table
         """
-        row = table()
-        for key, value in data.items():
-            setattr(row, key, value)
+        key = (table, tuple(sorted(data)))
 
-        self.session.add(row)
+        rows = self.pending_rows.setdefault(key, [])
+        rows.append(data)
+
+        if len(rows) >= self.pending_rows_max:
+            del self.pending_rows[key]
+            self.session.execute(table.__table__.insert(), rows)
 
     def insert(self, data, table):
         """
@@ -118,50 +341,391 @@ class BaseDatabaser:
 
     def delete_url(self, url):
         """
-        Delete item URL.
+        Mark item URL as processed, see `mark_url_done`.
+
+        NOTE: only for backwards compatibility, processed item URLs aren't
+        deleted any more, so they aren't stored again.
 
         :argument url:
         :type url: str
         """
-        self.session.query(self.item_urls_table).filter(
-            self.item_urls_table.url == url
+        self.mark_url_done(url)
+
+    def insert_item_urls(self, data):
+        """
+        Insert item URLs which aren't stored yet.
+
+        NOTE: the unique URL index makes the DB skip stored item URLs.
+
+        :argument data:
+        :type data: list of dicts
+
+        :returns list of actually inserted item URLs
+        """
+        table = self.item_urls_table
+
+        # NOTE: the store process is the only writer, hence item URLs which
+        # aren't stored now won't be stored till they are inserted below.
+        new_data = {}
+        for item in data:
+            new_data.setdefault(item["url"], item)
+
+        urls = list(new_data)
+        for start in range(0, len(urls), SQL_VARIABLES_MAX):
+            stored_urls = self.session.query(table.url).filter(
+                table.url.in_(urls[start : start + SQL_VARIABLES_MAX])  # noqa
+            )
+            for row in stored_urls:
+                del new_data[row.url]
+
+        inserted = list(new_data.values())
+        if inserted:
+            self.session.execute(
+                table.__table__.insert().prefix_with("OR IGNORE"), inserted
+            )
+
+        for _ in inserted:
+            self.manage_transaction()
+
+        return inserted
+
+    def mark_url_done(self, url):
+        """
+        Mark item URL as processed, so it isn't requested again.
+
+        NOTE: item URLs are marked in batches, always in the same transaction
+        as their data.
+
+        :argument url:
+        :type url: str
+        """
+        self.pending_done_urls.append(url)
+        if len(self.pending_done_urls) >= self.pending_rows_max:
+            self._flush_done_urls()
+
+        self._add_transaction_item()
+
+    def insert_failed_url(self, url, status_code, attempts, is_list_url):
+        """
+        Store an URL which failed to be requested even after retrying.
+
+        NOTE: an URL which failed already (e.g. in a previous run) is kept
+        only once, with the latest status code and attempts.
+
+        :argument url:
+        :type url: str
+        :argument status_code: status code of the last attempt
+        :type status_code: int
+        :argument attempts: number of failed attempts
+        :type attempts: int
+        :argument is_list_url: flag if the URL is a list URL
+        :type is_list_url: bool
+        """
+        # NOTE: the URL may be still waiting to be inserted, e.g. it failed
+        # twice since the last flush.
+        self.flush()
+        self.session.query(self.failed_urls_table).filter(
+            self.failed_urls_table.url == url
         ).delete()
 
-        self.transaction_items += 1
+        self.insert(
+            {
+                "url": url,
+                "status_code": status_code,
+                "attempts": attempts,
+                "is_list_url": is_list_url,
+            },
+            self.failed_urls_table,
+        )
+
+    def get_failed_urls(self):
+        """
+        Get URLs which failed to be requested.
 
-    def _remove_duplicate_item_urls(self):
+        :returns query object
         """
-        Remove duplicate item URLs.
+        return self.session.query(self.failed_urls_table).order_by(
+            self.failed_urls_table.id
+        )
+
+    def redrive_failed_urls(self):
         """
-        raw_sql = """
-            DELETE
-            FROM {table}
-            WHERE {id} IN (
-                SELECT MAX({id})
-                FROM {table}
-                GROUP BY {url}
-                HAVING COUNT(*) > 1
-            )
-        """.format(
+        Move failed item URLs back to item URLs to be scraped again.
+
+        NOTE: failed list URLs are kept for reference, all list URLs are
+        requested again by rerunning `Pipeline.get_item_urls`.
+
+        :returns int number of moved URLs
+        """
+        self.flush()
+
+        failed_item_urls = self.session.query(self.failed_urls_table).filter(
+            self.failed_urls_table.is_list_url.is_(False)
+        )
+        urls = [row.url for row in failed_item_urls]
+
+        # Failed item URLs may be already stored (marked as done).
+        self.session.query(self.item_urls_table).filter(
+            self.item_urls_table.url.in_(urls)
+        ).update(
+            {self.item_urls_table.status: self.item_urls_table.PENDING},
+            synchronize_session=False,
+        )
+        self.insert_item_urls([{"url": url} for url in urls])
+
+        failed_item_urls.delete(synchronize_session=False)
+        self.commit()
+
+        return len(urls)
+
+    def _remove_duplicate_item_urls(self, connection):
+        """
+        Remove duplicate item URLs, keeping the oldest row of each URL (marked
+        as done if any of the duplicates is).
+
+        :argument connection:
+        :type connection: SQLAlchemy connection
+        """
+        names = dict(
             id=self.item_urls_table.id.key,
             url=self.item_urls_table.url.key,
+            status=self.item_urls_table.status.key,
             table=self.item_urls_table.__tablename__,
-        ).strip()
+        )
 
-        self.engine.execute(raw_sql)
+        connection.execute(
+            text(
+                """
+                UPDATE {table}
+                SET {status} = (
+                    SELECT MAX(duplicate.{status})
+                    FROM {table} AS duplicate
+                    WHERE duplicate.{url} = {table}.{url}
+                )
+                WHERE {id} IN (
+                    SELECT MIN({id})
+                    FROM {table}
+                    GROUP BY {url}
+                    HAVING COUNT(*) > 1
+                )
+                """.format(**names).strip()
+            )
+        )
+        connection.execute(
+            text(
+                """
+                DELETE
+                FROM {table}
+                WHERE {id} NOT IN (
+                    SELECT MIN({id})
+                    FROM {table}
+                    GROUP BY {url}
+                )
+                """.format(**names).strip()
+            )
+        )
 
     def get_item_urls(self):
         """
-        Get item URLs for scraping ordered from newest to oldest.
+        Get pending item URLs for scraping ordered from newest to oldest.
 
         :returns query object
         """
-        self._remove_duplicate_item_urls()
+        table = self.item_urls_table
+
+        return (
+            self.session.query(table.url)
+            .filter(table.status == table.PENDING)
+            .order_by(table.id.desc())
+        )
+
+    def count_item_urls(self):
+        """
+        Count pending item URLs.
+
+        :returns int
+        """
+        return self.get_item_urls().count()
+
+    def iter_item_urls(self, batch_size):
+        """
+        Iterate over pending item URLs from newest to oldest.
+
+        URLs are read in batches, each in a separate short transaction, so
+        neither the memory usage grows with the number of pending URLs nor
+        a long running read blocks storing data.
+
+        NOTE: item URLs stored while iterating aren't included.
+
+        :argument batch_size: number of URLs read at once
+        :type batch_size: int
+
+        :returns iterator of URLs
+        """
+        table = self.item_urls_table.__table__
+
+        last_id = None
+        while True:
+            query = (
+                table.select()
+                .where(table.c.status == self.item_urls_table.PENDING)
+                .order_by(table.c.id.desc())
+                .limit(batch_size)
+            )
+            if last_id is not None:
+                query = query.where(table.c.id < last_id)
+
+            with self.engine.connect() as connection:
+                batch = connection.execute(query).fetchall()
 
-        return self.session.query(self.item_urls_table.url).order_by(
-            self.item_urls_table.id.desc()
+            if not batch:
+                return
+
+            for row in batch:
+                yield row.url
+
+            last_id = batch[-1].id
+
+    def get_shard(self, shard):
+        """
+        Get a databaser of the same kind which writes to its own
+        `<db_name>_<shard>.shard` DB, so multiple processes can store data
+        at once without waiting for each other's write locks.
+
+        NOTE: must be called in the process which uses the shard.
+
+        :argument shard: shard number
+        :type shard: int
+
+        :returns databaser instance
+        """
+        databaser = copy.copy(self)
+        databaser.db_name = SHARD_NAME.format(self.db_name, shard)
+        databaser.is_shard = True
+        databaser.connect()
+        databaser.create_tables(
+            create_urls_table=self.item_urls_table is not None,
+            create_data_table=self.item_data_table is not None,
         )
 
+        return databaser
+
+    def get_shard_paths(self):
+        """
+        Get paths to all shards of this DB.
+
+        :returns list of str
+        """
+        pattern = re.compile(
+            r"^{0}_\d+\.{1}$".format(re.escape(self.db_name), SHARD_EXTENSION)
+        )
+
+        return [
+            os.path.join(Config.DATA_DIRECTORY, file_name)
+            for file_name in sorted(os.listdir(Config.DATA_DIRECTORY))
+            if pattern.match(file_name)
+        ]
+
+    def _get_merge_statements(self):
+        """
+        Get SQL statements which copy rows from a shard attached as `shard`.
+
+        :returns list of str
+        """
+        statements = []
+
+        def get_columns(table):
+            return ", ".join(
+                column.name
+                for column in table.__table__.columns
+                if not column.primary_key
+            )
+
+        if self.item_data_table is not None:
+            table = self.item_data_table.__tablename__
+            columns = get_columns(self.item_data_table)
+            statements.append(
+                "INSERT INTO main.{0} ({1}) SELECT {1} FROM shard.{0} "
+                "ORDER BY id".format(table, columns)
+            )
+
+        if self.item_urls_table is not None:
+            table = self.item_urls_table.__tablename__
+            columns = get_columns(self.item_urls_table)
+            statements.extend(
+                [
+                    "INSERT OR IGNORE INTO main.{0} ({1}) "
+                    "SELECT {1} FROM shard.{0} ORDER BY id".format(
+                        table, columns
+                    ),
+                    "UPDATE main.{0} SET status = {1} WHERE status != {1} "
+                    "AND url IN "
+                    "(SELECT url FROM shard.{0} WHERE status = {1})".format(
+                        table, self.item_urls_table.DONE
+                    ),
+                ]
+            )
+
+        if self.failed_urls_table is not None:
+            table = self.failed_urls_table.__tablename__
+            columns = get_columns(self.failed_urls_table)
+            statements.extend(
+                [
+                    "DELETE FROM main.{0} "
+                    "WHERE url IN (SELECT url FROM shard.{0})".format(table),
+                    "INSERT INTO main.{0} ({1}) SELECT {1} FROM shard.{0} "
+                    "ORDER BY id".format(table, columns),
+                ]
+            )
+
+        return statements
+
+    def _merge_shard(self, shard_path):
+        """
+        Copy all rows from a shard to this DB in a single transaction.
+
+        :argument shard_path:
+        :type shard_path: str
+        """
+        # NOTE: a raw connection, as ATTACH and DETACH can't run inside
+        # a transaction and all statements have to use the same connection.
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute("ATTACH DATABASE ? AS shard", (shard_path,))
+            try:
+                for statement in self._get_merge_statements():
+                    cursor.execute(statement)
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                cursor.execute("DETACH DATABASE shard")
+        finally:
+            connection.close()
+
+    def merge_shards(self):
+        """
+        Merge all shards into this DB and remove them.
+
+        NOTE: shards left by a crashed run are merged as well.
+
+        :returns int number of merged shards
+        """
+        shard_paths = self.get_shard_paths()
+
+        for shard_path in shard_paths:
+            self._merge_shard(shard_path)
+
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(shard_path + suffix):
+                    os.remove(shard_path + suffix)
+
+            logging.info("Merged DB shard {}".format(shard_path))
+
+        return len(shard_paths)
+
 
 class Databaser(BaseDatabaser):
     def __init__(self, db_name, data_table):
@@ -176,16 +740,22 @@ class DataOnlyDatabaser(BaseDatabaser):
     Instance of this class will have tables set as follows:
         self.item_data_table = data_table
         self.item_urls_table = None
+        self.failed_urls_table = None
     """
 
     def __init__(self, db_name, data_table):
         super().__init__(db_name, data_table)
         self.item_urls_table = None
+        self.failed_urls_table = None
         self.create_tables(create_urls_table=False)
 
     def insert(self, data):
         super().insert(data, self.item_data_table)
 
+    def insert_multiple(self, data):
+        for item in data:
+            self.insert(item)
+
 
 class UrlsOnlyDatabaser(BaseDatabaser):
     """
@@ -194,6 +764,7 @@ class UrlsOnlyDatabaser(BaseDatabaser):
     Instance of this class will have tables set as follows:
         self.item_data_table = None
         self.item_urls_table = ItemUrlsTable
+        self.failed_urls_table = FailedUrlsTable
     """
 
     def __init__(self, db_name):
@@ -221,12 +792,112 @@ class DockerizedDatabaser(UrlsOnlyDatabaser):
     """
     A hybrid Databaser which stores item URLs locally but item data remotely.
 
+    With `Config.ITEM_URLS_FRONTIER` set item URLs are processed remotely, in
+    the controller's item URLs frontier shared by all scrapers. They are still
+    stored locally too, so they can be added to the frontier again (e.g. after
+    the controller restarted), see `restore_item_urls`.
+
     This is the databaser class each dockerized scraped should use/subclass.
     """
 
     def __init__(self, db_name):
         super().__init__("{0}_{1}".format(db_name, socket.gethostname()))
 
+        # Item data is sent to the datastore in batches.
+        self.data_buffer = controller_client.DataBuffer()
+
+        self.use_frontier = Config.ITEM_URLS_FRONTIER
+        # Processed item URLs waiting to be released in the frontier.
+        self.done_item_urls = []
+        # List URLs whose item URLs are stored, waiting to be released in the
+        # URL broker.
+        self.done_list_urls = []
+
+    def insert_item_urls(self, data):
+        new_data = super().insert_item_urls(data)
+        if not self.use_frontier:
+            return new_data
+
+        controller_client.add_item_urls([item["url"] for item in data])
+
+        # NOTE: item URLs are leased from the frontier, never streamed.
+        return []
+
+    def mark_url_done(self, url):
+        super().mark_url_done(url)
+
+        if self.use_frontier:
+            self.done_item_urls.append(url)
+
+    def restore_item_urls(self):
+        """
+        Add item URLs stored locally, but not processed yet, to the frontier
+        (which adds only those it doesn't know yet).
+
+        NOTE: the frontier lives only in the controller's memory, local item
+        URLs are the record to recover it from.
+        """
+        if not self.use_frontier:
+            return
+
+        urls = []
+        for url in super().iter_item_urls(Config.ITEM_URLS_BATCH_SIZE):
+            urls.append(url)
+            if len(urls) >= Config.ITEM_URLS_BATCH_SIZE:
+                controller_client.add_item_urls(urls)
+                urls = []
+
+        if urls:
+            controller_client.add_item_urls(urls)
+
+    def mark_list_url_done(self, url):
+        """
+        Mark list URL as processed, so its lease can be released.
+
+        NOTE: list URLs are released only after their item URLs are committed.
+
+        :argument url:
+        :type url: str
+        """
+        self.done_list_urls.append(url)
+        self._add_transaction_item()
+
+    def count_item_urls(self):
+        if not self.use_frontier:
+            return super().count_item_urls()
+
+        # NOTE: only the expected share of this scraper.
+        return math.ceil(
+            controller_client.count_item_urls() / Config.SCRAPERS_COUNT
+        )
+
+    def iter_item_urls(self, batch_size):
+        if not self.use_frontier:
+            yield from super().iter_item_urls(batch_size)
+            return
+
+        for urls in controller_client.lease_item_urls(batch_size):
+            yield from urls
+
+    def finish_item_urls_discovery(self):
+        """
+        Let the frontier know this scraper won't find any more item URLs.
+        """
+        if self.use_frontier:
+            controller_client.finish_item_urls_discovery(socket.gethostname())
+
+    def wait_for_item_urls(self):
+        """
+        Wait till item URLs leased to the other scrapers are processed or
+        leased again (e.g. as their scraper died).
+
+        :returns bool flag if there are item URLs to lease
+        """
+        if not self.use_frontier:
+            return False
+
+        return controller_client.wait_for_item_urls()
+
     def serialize_data(self, data):
         """
         Update the raw `data` dict to be JSON serializable and return it.
@@ -238,13 +909,46 @@ class DockerizedDatabaser(UrlsOnlyDatabaser):
             # Store item data remotely
             # (`self.item_data_table = None` as we are a `UrlsOnlyDatabaser`).
             data = self.serialize_data(data)
-            controller_client.insert_data(data)
+            self.data_buffer.add(data)
         else:
             # Store item URLs locally.
             super()._actually_insert(data, table)
 
         self.manage_transaction()
 
+    def is_commit_due(self):
+        return self.data_buffer.is_flush_due() or super().is_commit_due()
+
     def commit(self):
-        controller_client.commit()
-        super().commit()
+        # NOTE: item URLs are marked as done only after their data is sent.
+        try:
+            self.data_buffer.flush()
+            controller_client.commit()
+
+            if self.done_item_urls:
+                controller_client.release_item_urls(self.done_item_urls)
+                self.done_item_urls = []
+        except RequestException as exc:
+            logging.error("Failed to send data to the datastore")
+            logging.exception(exc)
+
+            # NOTE: buffered data is kept to be sent by the next commit, which
+            # is due only once the new transaction is big or old enough, so
+            # the controller isn't asked again for each item meanwhile.
+            self.transaction_items = 0
+            self.transaction_started_at = None
+            return False
+
+        if not super().commit():
+            return False
+
+        if self.done_list_urls:
+            try:
+                controller_client.release_list_urls(self.done_list_urls)
+                self.done_list_urls = []
+            except RequestException as exc:
+                # NOTE: kept to be released with the next commit.
+                logging.error("Failed to release list URLs")
+                logging.exception(exc)
+
+        return True
@@ -1,6 +1,13 @@
+import logging
 import os
+import socket
+import threading
+import time
+import uuid
 
-from requests import get, post
+from requests import delete, get, post, put, RequestException
+
+from scrapemeagain.config import Config
 
 
 BASE_URL = "http://{host}:{port}".format(
@@ -30,11 +37,378 @@ def get_list_urls_range():
     return (response_json["start"], response_json["end"])
 
 
+def _post_with_retries(url, json):
+    """
+    POST JSON data, retrying failed attempts with an exponential backoff.
+
+    :argument url:
+    :type url: str
+    :argument json: JSON serializable data
+    :type json: object
+    """
+    for attempt in range(1, Config.DATASTORE_MAX_ATTEMPTS + 1):
+        try:
+            post(url, json=json).raise_for_status()
+            return
+        except RequestException as exc:
+            if attempt == Config.DATASTORE_MAX_ATTEMPTS:
+                raise
+
+            logging.error("Failed posting to {0}: {1}".format(url, exc))
+            time.sleep(Config.DATASTORE_BACKOFF * 2 ** (attempt - 1))
+
+
+def lease_list_urls_range():
+    """
+    Lease a chunk of list URLs, waiting while the controller asks to.
+
+    :returns tuple (lease ID, start, end) or None if all list URLs are
+    leased
+    """
+    url = _build_url("list-urls-lease")
+
+    while True:
+        response_json = post(
+            url, json={"scraper": socket.gethostname()}
+        ).json()
+
+        if response_json["lease"] is not None:
+            return (
+                response_json["lease"],
+                response_json["start"],
+                response_json["end"],
+            )
+
+        if response_json["finished"]:
+            return None
+
+        time.sleep(response_json["retry_after"])
+
+
+def release_list_urls_range(lease_id):
+    url = _build_url("list-urls-lease", lease_id)
+    delete(url)
+
+
+def assign_list_urls(lease_id, urls):
+    """
+    Let the controller know list URLs of a leased range, so the range can be
+    released by `release_list_urls` once all of them are processed.
+
+    :argument lease_id:
+    :type lease_id: int
+    :argument urls: list URLs of the range
+    :type urls: list
+    """
+    url = _build_url("list-urls-lease", lease_id)
+    put(url, json=urls)
+
+
+def lease_list_urls_ranges():
+    """
+    Generate list URLs ranges leased from the controller till all list URLs
+    are leased.
+
+    NOTE: list URLs of a range have to be assigned by `assign_list_urls` and
+    released by `release_list_urls` once processed (i.e. once their item URLs
+    are stored), otherwise the range is leased again once its lease expires.
+
+    :returns iterator of (lease ID, start, end) tuples
+    """
+    while True:
+        lease = lease_list_urls_range()
+        if lease is None:
+            return
+
+        yield lease
+
+
+def release_list_urls(urls):
+    """
+    Release processed list URLs, see `lease_list_urls_ranges`.
+
+    :argument urls:
+    :type urls: list
+    """
+    url = _build_url("list-urls/done")
+    _post_with_retries(url, urls)
+
+
+def wait_for_list_urls():
+    """
+    Wait till there are list URLs ranges to lease again (e.g. ranges leased to
+    a scraper which died) or all list URLs are processed.
+
+    :returns bool flag if there are list URLs ranges to lease
+    """
+    url = _build_url("list-urls-lease")
+
+    while True:
+        response_json = get(url).json()
+
+        if response_json["pending"]:
+            return True
+
+        if response_json["released"]:
+            return False
+
+        time.sleep(Config.URLS_LEASE_POLL_INTERVAL)
+
+
+def count_item_urls():
+    url = _build_url("item-urls")
+    return get(url).json()["pending"]
+
+
+def add_item_urls(urls):
+    url = _build_url("item-urls")
+    _post_with_retries(url, urls)
+
+
+def finish_item_urls_discovery(scraper):
+    url = _build_url("item-urls/discovered", scraper)
+    _post_with_retries(url, None)
+
+
+def lease_item_urls_batch(size):
+    """
+    Lease a batch of item URLs, waiting while there are none to lease but
+    more may come (i.e. other scrapers still find item URLs).
+
+    :argument size: max number of item URLs to lease
+    :type size: int
+
+    :returns list of item URLs or None if all item URLs are leased
+    """
+    url = _build_url("item-urls-lease")
+
+    while True:
+        response_json = post(
+            url, json={"size": size, "scraper": socket.gethostname()}
+        ).json()
+
+        if response_json["lease"] is not None:
+            return response_json["urls"]
+
+        if response_json["finished"]:
+            return None
+
+        time.sleep(response_json["retry_after"])
+
+
+def lease_item_urls(size):
+    """
+    Generate batches of item URLs leased from the controller till all item
+    URLs are leased.
+
+    NOTE: leased item URLs have to be released by `release_item_urls`.
+
+    :argument size: max number of item URLs in a batch
+    :type size: int
+
+    :returns iterator of lists of item URLs
+    """
+    while True:
+        urls = lease_item_urls_batch(size)
+        if urls is None:
+            return
+
+        yield urls
+
+
+def release_item_urls(urls):
+    url = _build_url("item-urls/done")
+    _post_with_retries(url, urls)
+
+
+def wait_for_item_urls():
+    """
+    Wait till there are item URLs to lease again (e.g. item URLs leased to
+    a scraper which died) or all item URLs are processed.
+
+    :returns bool flag if there are item URLs to lease
+    """
+    url = _build_url("item-urls")
+
+    while True:
+        response_json = get(url).json()
+
+        if response_json["pending"]:
+            return True
+
+        if response_json["released"]:
+            return False
+
+        time.sleep(Config.URLS_LEASE_POLL_INTERVAL)
+
+
 def insert_data(data):
     url = _build_url("datastore/insert-data")
     post(url, json=data)
 
 
+def insert_multiple_data(data, batch_id):
+    """
+    Send a batch of items to the datastore.
+
+    NOTE: the datastore stores a batch only once, even if it's sent again
+    as the first attempt failed only seemingly (e.g. it timed out after the
+    items were stored).
+
+    :argument data: JSON serializable items
+    :type data: list
+    :argument batch_id: unique batch ID
+    :type batch_id: str
+    """
+    url = _build_url("datastore/insert-multiple-data")
+    _post_with_retries(url, {"batch": batch_id, "items": data})
+
+
+class DataBuffer:
+    def __init__(self):
+        """
+        Collect item data and send it to the datastore in batches, once
+        `Config.DATASTORE_BATCH_SIZE` items are collected or the oldest item
+        is `Config.DATASTORE_FLUSH_INTERVAL` seconds old.
+        """
+        self.items = []
+        self.items_max = Config.DATASTORE_BATCH_SIZE
+        self.flush_interval = Config.DATASTORE_FLUSH_INTERVAL
+        self.collected_at = None
+
+        # Batches (batch ID and items) which failed to be sent and when the
+        # last attempt failed.
+        self.batches = []
+        self.failed_at = None
+
+    def add(self, data):
+        """
+        Collect a single item.
+
+        :argument data: JSON serializable item data
+        :type data: dict
+        """
+        if not self.items:
+            self.collected_at = time.monotonic()
+
+        self.items.append(data)
+        if len(self.items) >= self.items_max:
+            self.flush()
+
+    def is_flush_due(self):
+        """
+        Check whether collected items should be sent.
+
+        NOTE: batches which failed to be sent are sent again only once
+        `flush_interval` seconds passed since the failure.
+
+        :returns bool
+        """
+        if self.batches:
+            return time.monotonic() - self.failed_at >= self.flush_interval
+
+        return bool(self.items) and (
+            time.monotonic() - self.collected_at >= self.flush_interval
+        )
+
+    def flush(self):
+        """
+        Send all collected items to the datastore.
+
+        NOTE: batches which failed to be sent are kept and sent again (with
+        the same batch ID) with the next flush.
+        """
+        if self.items:
+            self.batches.append((uuid.uuid4().hex, self.items))
+            self.items = []
+            self.collected_at = None
+
+        while self.batches:
+            batch_id, items = self.batches[0]
+            try:
+                insert_multiple_data(items, batch_id)
+            except RequestException:
+                self.failed_at = time.monotonic()
+                raise
+
+            self.batches.pop(0)
+
+
 def commit():
     url = _build_url("datastore/commit")
     get(url)
+
+
+def register_scraper(scraper):
+    url = _build_url("scrapers", scraper)
+    _post_with_retries(url, None)
+
+
+def send_heartbeat(scraper):
+    url = _build_url("scrapers/{}/heartbeat".format(scraper))
+    post(url, timeout=Config.SCRAPER_HEARTBEAT_INTERVAL).raise_for_status()
+
+
+def finish_scraper(scraper):
+    url = _build_url("scrapers/{}/done".format(scraper))
+    _post_with_retries(url, None)
+
+
+def wait_for_scrapers():
+    """
+    Wait till all scrapers are done (or dead).
+
+    :returns dict of scrapers by their state
+    """
+    url = _build_url("scrapers")
+
+    while True:
+        # NOTE: the controller responds as soon as the last scraper is done.
+        response_json = get(
+            url, params={"timeout": Config.SCRAPER_HEARTBEAT_TIMEOUT}
+        ).json()
+
+        if response_json["finished"]:
+            return response_json
+
+
+class Heartbeat:
+    def __init__(self, scraper):
+        """
+        Register a scraper and report it's alive each
+        `Config.SCRAPER_HEARTBEAT_INTERVAL` seconds from a daemon thread, till
+        it's done.
+
+        :argument scraper: scraper's hostname
+        :type scraper: str
+        """
+        self.scraper = scraper
+        self.interval = Config.SCRAPER_HEARTBEAT_INTERVAL
+
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def _beat(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                send_heartbeat(self.scraper)
+            except RequestException as exc:
+                logging.error("Failed sending heartbeat: {}".format(exc))
+
+    def start(self):
+        """
+        Register the scraper and start sending heartbeats.
+        """
+        register_scraper(self.scraper)
+
+        self._thread = threading.Thread(target=self._beat, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop sending heartbeats and report the scraper is done.
+        """
+        self._stopped.set()
+        self._thread.join()
+
+        finish_scraper(self.scraper)
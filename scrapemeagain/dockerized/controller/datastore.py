@@ -0,0 +1,95 @@
+"""
+Datastore writer which lets a multithreaded server share a single databaser.
+"""
+
+
+import logging
+from queue import Empty, Queue
+import threading
+
+from scrapemeagain.config import Config
+
+
+class DatastoreWriter:
+    def __init__(self, databaser):
+        """Store data sent by scrapers in a dedicated thread.
+
+        Request handlers only queue data (or a commit) and return, the writer
+        thread passes it on to the databaser in order. Hence requests can be
+        handled in many threads, while the DB session is used by a single one.
+
+        :argument databaser: a datastore databaser instance
+        :type databaser: `scrapemeagain.databaser.DataStoreDatabaser`
+        """
+        self.databaser = databaser
+
+        # IDs of inserted batches, see `insert_multiple`.
+        self._batch_ids = set()
+
+        # NOTE: bounded to hold request handlers back if the DB can't keep up.
+        self.tasks = Queue(Config.DATASTORE_WRITER_QUEUE_SIZE)
+
+        self._thread = threading.Thread(target=self._write, daemon=True)
+        self._thread.start()
+
+    def _write(self):
+        """Run queued tasks and commit when it's due, also while idle."""
+        while True:
+            try:
+                task, args, done = self.tasks.get(
+                    timeout=Config.TRANSACTION_TIMEOUT
+                )
+            except Empty:
+                self.databaser.commit_if_due()
+                continue
+
+            try:
+                task(*args)
+            except Exception as exc:
+                logging.error("Failed storing data")
+                logging.exception(exc)
+            finally:
+                if done is not None:
+                    done.set()
+
+    def insert(self, data):
+        """Queue a single item to be inserted.
+
+        :argument data:
+        :type data: dict
+        """
+        self.tasks.put((self.databaser.insert, (data,), None))
+
+    def _insert_batch(self, data, batch_id):
+        """Insert a batch of items unless it's been inserted already.
+
+        :argument data:
+        :type data: list of dicts
+        :argument batch_id:
+        :type batch_id: str
+        """
+        if batch_id in self._batch_ids:
+            logging.warning("Batch {} is already stored".format(batch_id))
+            return
+
+        self.databaser.insert_multiple(data)
+        self._batch_ids.add(batch_id)
+
+    def insert_multiple(self, data, batch_id):
+        """Queue a batch of items to be inserted.
+
+        NOTE: a batch sent again (e.g. as sending it seemingly failed) is
+        inserted only once.
+
+        :argument data:
+        :type data: list of dicts
+        :argument batch_id: unique batch ID
+        :type batch_id: str
+        """
+        self.tasks.put((self._insert_batch, (data, batch_id), None))
+
+    def commit(self):
+        """Commit all data queued so far and wait till it's done."""
+        done = threading.Event()
+        self.tasks.put((self.databaser.commit, (), done))
+        done.wait()
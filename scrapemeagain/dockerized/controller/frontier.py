@@ -0,0 +1,186 @@
+from collections import deque
+import itertools
+import logging
+import time
+
+from scrapemeagain.config import Config
+
+
+class ItemUrlsFrontier:
+    def __init__(self):
+        """Item URLs found by all scrapers, leased to scrapers in batches.
+
+        Each item URL is kept only once, no matter how many scrapers found it.
+        Item URLs of a lease which aren't released (i.e. processed) in
+        `lease_timeout` seconds are leased again.
+
+        NOTE: all item URLs are found only once all scrapers report so, as
+        a scraper may still be storing item URLs of list URLs it has already
+        released to the URL broker.
+        """
+        self.lease_timeout = Config.ITEM_URLS_LEASE_TIMEOUT
+        self.scrapers_count = Config.SCRAPERS_COUNT
+
+        self._seen_urls = set()
+        self._pending_urls = deque()
+        # Leased item URLs (an ordered set) and expiration, and scrapers they
+        # are leased to by lease ID.
+        self._leases = {}
+        self._lease_owners = {}
+        self._url_leases = {}
+        self._lease_ids = itertools.count(1)
+
+        # Scrapers which won't find any more item URLs.
+        self._discovered_by = set()
+
+    @property
+    def pending_count(self):
+        """Number of item URLs waiting to be leased (including those of
+        expired leases).
+        """
+        self._reassign_expired_leases(time.monotonic())
+        return len(self._pending_urls)
+
+    def add(self, urls):
+        """Add item URLs which weren't added yet.
+
+        :argument urls:
+        :type urls: list
+
+        :returns list of actually added item URLs
+        """
+        added_urls = []
+
+        for url in urls:
+            if url not in self._seen_urls:
+                self._seen_urls.add(url)
+                added_urls.append(url)
+
+        self._pending_urls.extend(added_urls)
+
+        return added_urls
+
+    def finish_discovery(self, scraper):
+        """Register a scraper which won't find any more item URLs.
+
+        :argument scraper: scraper's hostname
+        :type scraper: str
+        """
+        self._discovered_by.add(scraper)
+
+    def undo_finish_discovery(self, scraper):
+        """Unregister a scraper which may find more item URLs after all, e.g.
+        the placeholder of a scraper which registered late.
+
+        :argument scraper: scraper's hostname
+        :type scraper: str
+        """
+        self._discovered_by.discard(scraper)
+
+    @property
+    def all_urls_discovered(self):
+        """Flag if no more item URLs are going to be added."""
+        return len(self._discovered_by) >= self.scrapers_count
+
+    def _reassign_expired_leases(self, now):
+        """Put item URLs of expired leases back to be leased again first.
+
+        :argument now: current `time.monotonic` value
+        :type now: float
+        """
+        expired_urls = []
+
+        for lease_id, (urls, expires_at) in list(self._leases.items()):
+            if expires_at <= now:
+                del self._leases[lease_id]
+                del self._lease_owners[lease_id]
+                expired_urls.extend(urls)
+
+                logging.warning(
+                    "Item URLs lease {0} ({1} URLs) expired, "
+                    "reassigning".format(lease_id, len(urls))
+                )
+
+        for url in expired_urls:
+            del self._url_leases[url]
+
+        # NOTE: keep the original order of item URLs.
+        self._pending_urls.extendleft(reversed(expired_urls))
+
+    def lease(self, size, scraper=None):
+        """Lease a batch of item URLs.
+
+        :argument size: max number of item URLs to lease
+        :type size: int
+        :argument scraper: hostname of the scraper to lease item URLs to
+        :type scraper: str
+
+        :returns tuple (lease ID, list of item URLs) or `(None, [])` if there
+        are no item URLs to lease
+        """
+        now = time.monotonic()
+
+        self._reassign_expired_leases(now)
+
+        if not self._pending_urls:
+            return None, []
+
+        urls = [
+            self._pending_urls.popleft()
+            for _ in range(min(size, len(self._pending_urls)))
+        ]
+
+        lease_id = next(self._lease_ids)
+        expires_at = now + self.lease_timeout
+        self._leases[lease_id] = (dict.fromkeys(urls), expires_at)
+        self._lease_owners[lease_id] = scraper
+        for url in urls:
+            self._url_leases[url] = lease_id
+
+        return lease_id, urls
+
+    def release(self, urls):
+        """Release leased item URLs, i.e. mark them as processed.
+
+        :argument urls:
+        :type urls: list
+        """
+        for url in urls:
+            lease_id = self._url_leases.pop(url, None)
+            if lease_id is None:
+                continue
+
+            lease_urls, _ = self._leases[lease_id]
+            del lease_urls[url]
+            if not lease_urls:
+                del self._leases[lease_id]
+                del self._lease_owners[lease_id]
+
+    def expire_leases(self, scraper):
+        """Let leases of a scraper (e.g. a dead one) expire right away, so its
+        item URLs are leased again.
+
+        :argument scraper: scraper's hostname
+        :type scraper: str
+        """
+        now = time.monotonic()
+
+        for lease_id, owner in self._lease_owners.items():
+            if owner == scraper:
+                urls, _ = self._leases[lease_id]
+                self._leases[lease_id] = (urls, now)
+
+    @property
+    def all_urls_leased(self):
+        """Flag if all item URLs were found and there are none to lease.
+
+        NOTE: scrapers don't wait for other scrapers' leases to be released
+        while leasing, as a scraper which waits for more item URLs can't
+        process those it has already leased (see `all_urls_released`).
+        """
+        return self.all_urls_discovered and not self._pending_urls
+
+    @property
+    def all_urls_released(self):
+        """Flag if all item URLs were found, leased and released."""
+        return self.all_urls_leased and not self._leases
@@ -0,0 +1,161 @@
+import logging
+import time
+
+from scrapemeagain.config import Config
+
+
+# Name of an expected scraper which didn't register in time.
+UNREGISTERED_SCRAPER = "unregistered-{}"
+
+
+class ScrapersRegistry:
+    def __init__(self):
+        """Scrapers which registered to the controller and their state.
+
+        A registered scraper is running till it reports it's done. A running
+        scraper which doesn't send a heartbeat in `heartbeat_timeout` seconds
+        is considered dead. So are expected scrapers which don't register in
+        `registration_timeout` seconds since the registry was created.
+        """
+        self.scrapers_count = Config.SCRAPERS_COUNT
+        self.heartbeat_timeout = Config.SCRAPER_HEARTBEAT_TIMEOUT
+        self.registration_timeout = Config.SCRAPER_REGISTRATION_TIMEOUT
+
+        self.created_at = time.monotonic()
+
+        # Last heartbeat (a `time.monotonic` value) by scraper.
+        self._heartbeats = {}
+        self._done = set()
+        self._dead = set()
+        # Placeholders of expected scrapers which didn't register in time.
+        self._unregistered = []
+
+    def register(self, scraper):
+        """Register a scraper which has just started.
+
+        A scraper registering late takes the place of the placeholder of an
+        expected scraper which didn't register in time.
+
+        :argument scraper: scraper's hostname
+        :type scraper: str
+
+        :returns placeholder replaced by the scraper or `None`
+        """
+        placeholder = None
+        if scraper not in self._heartbeats and self._unregistered:
+            # NOTE: pop the last placeholder to keep placeholders numbered
+            # continuously.
+            placeholder = self._unregistered.pop()
+            self._dead.discard(placeholder)
+            logging.warning(
+                "Scraper {0} registered late, replacing {1}".format(
+                    scraper, placeholder
+                )
+            )
+
+        logging.info("Scraper {} registered".format(scraper))
+        self.heartbeat(scraper)
+
+        return placeholder
+
+    def heartbeat(self, scraper):
+        """Register a scraper's heartbeat.
+
+        :argument scraper: scraper's hostname
+        :type scraper: str
+        """
+        if scraper in self._dead:
+            self._dead.remove(scraper)
+            logging.warning("Scraper {} is alive again".format(scraper))
+
+        self._heartbeats[scraper] = time.monotonic()
+
+    def finish(self, scraper):
+        """Register a scraper which is done.
+
+        :argument scraper: scraper's hostname
+        :type scraper: str
+        """
+        self.heartbeat(scraper)
+        self._done.add(scraper)
+
+        logging.info("Scraper {} is done".format(scraper))
+
+    def _find_unregistered_scrapers(self, now):
+        """Find expected scrapers which didn't register in time.
+
+        :argument now: current `time.monotonic` value
+        :type now: float
+
+        :returns list of placeholders of scrapers found unregistered since
+        the last call
+        """
+        if now - self.created_at <= self.registration_timeout:
+            return []
+
+        unregistered_count = (
+            self.scrapers_count
+            - len(self._heartbeats)
+            - len(self._unregistered)
+        )
+
+        unregistered_scrapers = [
+            UNREGISTERED_SCRAPER.format(len(self._unregistered) + i)
+            for i in range(1, unregistered_count + 1)
+        ]
+
+        for scraper in unregistered_scrapers:
+            self._unregistered.append(scraper)
+            self._dead.add(scraper)
+            logging.error("Scraper {} is dead".format(scraper))
+
+        return unregistered_scrapers
+
+    def find_dead_scrapers(self):
+        """Find running scrapers which missed their heartbeats and expected
+        scrapers which didn't register in time.
+
+        :returns list of scrapers found dead since the last call
+        """
+        now = time.monotonic()
+
+        dead_scrapers = [
+            scraper
+            for scraper, heartbeat_at in self._heartbeats.items()
+            if scraper not in self._done
+            and scraper not in self._dead
+            and now - heartbeat_at > self.heartbeat_timeout
+        ]
+
+        for scraper in dead_scrapers:
+            self._dead.add(scraper)
+            logging.error("Scraper {} is dead".format(scraper))
+
+        return dead_scrapers + self._find_unregistered_scrapers(now)
+
+    @property
+    def all_scrapers_finished(self):
+        """Flag if all scrapers registered (or didn't in time) and each is
+        done or dead.
+        """
+        known_count = len(self._heartbeats) + len(self._unregistered)
+        if known_count < self.scrapers_count:
+            return False
+
+        return all(
+            scraper in self._done or scraper in self._dead
+            for scraper in self._heartbeats
+        )
+
+    def get_status(self):
+        """Get scrapers by their state.
+
+        :returns dict
+        """
+        return {
+            "running": sorted(
+                set(self._heartbeats) - self._done - self._dead
+            ),
+            "done": sorted(self._done),
+            "dead": sorted(self._dead),
+        }
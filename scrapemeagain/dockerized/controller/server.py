@@ -1,28 +1,70 @@
+import threading
+import time
+
 import flask
 from toripchanger import TorIpChanger
 
 from scrapemeagain.config import Config
+from scrapemeagain.dockerized.controller.datastore import DatastoreWriter
+from scrapemeagain.dockerized.controller.frontier import ItemUrlsFrontier
+from scrapemeagain.dockerized.controller.registry import ScrapersRegistry
 from scrapemeagain.dockerized.utils import (
     apply_scraper_config,
     get_class_from_path,
 )
 from scrapemeagain.utils.logger import setup_logging
 
+try:
+    import waitress
+except ImportError:  # pragma: no cover
+    waitress = None
+
 
 setup_logging(__name__)
 apply_scraper_config()
 
 
+# NOTE: requests are handled in multiple threads, hence the DB is written by
+# a dedicated thread and the other singletons are guarded by locks.
 datastore_class = get_class_from_path(Config.DATASTORE_DATABASER_CLASS)
-DATASTORE = datastore_class()
+DATASTORE = DatastoreWriter(datastore_class())
 urlbroker_class = get_class_from_path(Config.URLBROKER_CLASS)
 URLBROKER = urlbroker_class()
+URLBROKER_LOCK = threading.Lock()
 IPSTORE = TorIpChanger(reuse_threshold=Config.IPSTORE_REUSE_THRESHOLD)
+IPSTORE_LOCK = threading.Lock()
+ITEM_URLS = ItemUrlsFrontier()
+ITEM_URLS_LOCK = threading.Lock()
+SCRAPERS = ScrapersRegistry()
+# NOTE: notified whenever a scraper is done or found dead.
+SCRAPERS_CHANGED = threading.Condition()
 
 
 app = flask.Flask(__name__)
 
 
+def requeue_dead_scrapers_urls():
+    """Find dead scrapers and lease list and item URLs leased to them
+    again.
+    """
+    # NOTE: keep the registry locked, a scraper registering late replaces
+    # its placeholder only once the placeholder is fully handled as dead.
+    with SCRAPERS_CHANGED:
+        dead_scrapers = SCRAPERS.find_dead_scrapers()
+        if dead_scrapers:
+            SCRAPERS_CHANGED.notify_all()
+
+        for scraper in dead_scrapers:
+            with URLBROKER_LOCK:
+                URLBROKER.expire_leases(scraper)
+
+            with ITEM_URLS_LOCK:
+                ITEM_URLS.expire_leases(scraper)
+                # NOTE: list URLs the scraper didn't process are leased
+                # again, i.e. their item URLs are found by the others.
+                ITEM_URLS.finish_discovery(scraper)
+
+
 @app.route("/health/")
 def healthcheck():
     return ""
@@ -30,30 +72,246 @@ def healthcheck():
 
 @app.route("/ip-is-safe/<ip>/")
 def ip_is_safe(ip):
-    safe = IPSTORE._ip_is_safe(ip)
-    if safe:
-        IPSTORE._manage_used_ips(ip)
+    with IPSTORE_LOCK:
+        safe = IPSTORE._ip_is_safe(ip)
+        if safe:
+            IPSTORE._manage_used_ips(ip)
 
     return flask.jsonify({"safe": safe})
 
 
 @app.route("/list-urls-range/")
 def list_urls_range():
-    start, end = URLBROKER.get_urls_range()
+    with URLBROKER_LOCK:
+        start, end = URLBROKER.get_urls_range()
     return flask.jsonify({"start": start, "end": end})
 
 
+@app.route("/list-urls-lease/", methods=["POST"])
+def lease_list_urls_range():
+    requeue_dead_scrapers_urls()
+
+    with URLBROKER_LOCK:
+        lease_id, urls_range = URLBROKER.lease_urls_range(
+            flask.request.json["scraper"]
+        )
+        if lease_id is not None:
+            start, end = urls_range
+            return flask.jsonify(
+                {"lease": lease_id, "start": start, "end": end}
+            )
+
+        finished = URLBROKER.all_urls_leased
+
+    return flask.jsonify(
+        {
+            "lease": None,
+            "finished": finished,
+            "retry_after": Config.URLS_LEASE_POLL_INTERVAL,
+        }
+    )
+
+
+@app.route("/list-urls-lease/", methods=["GET"])
+def count_list_urls_ranges():
+    requeue_dead_scrapers_urls()
+
+    with URLBROKER_LOCK:
+        pending = URLBROKER.pending_count
+        released = URLBROKER.all_urls_released
+
+    return flask.jsonify({"pending": pending, "released": released})
+
+
+@app.route("/list-urls-lease/<int:lease_id>/", methods=["PUT"])
+def assign_list_urls(lease_id):
+    with URLBROKER_LOCK:
+        active = URLBROKER.assign_urls(lease_id, flask.request.json)
+
+    return "", 204 if active else 404
+
+
+@app.route("/list-urls-lease/<int:lease_id>/", methods=["DELETE"])
+def release_list_urls_range(lease_id):
+    with URLBROKER_LOCK:
+        URLBROKER.release_urls_range(lease_id)
+
+    return "", 204
+
+
+@app.route("/list-urls/done/", methods=["POST"])
+def release_list_urls():
+    with URLBROKER_LOCK:
+        URLBROKER.release_urls(flask.request.json)
+
+    return "", 204
+
+
+@app.route("/item-urls/", methods=["GET"])
+def count_item_urls():
+    requeue_dead_scrapers_urls()
+
+    with ITEM_URLS_LOCK:
+        pending = ITEM_URLS.pending_count
+        released = ITEM_URLS.all_urls_released
+
+    return flask.jsonify({"pending": pending, "released": released})
+
+
+@app.route("/item-urls/", methods=["POST"])
+def add_item_urls():
+    with ITEM_URLS_LOCK:
+        added_urls = ITEM_URLS.add(flask.request.json)
+
+    return flask.jsonify({"added": len(added_urls)}), 201
+
+
+@app.route("/item-urls/discovered/<scraper>/", methods=["POST"])
+def finish_item_urls_discovery(scraper):
+    with ITEM_URLS_LOCK:
+        ITEM_URLS.finish_discovery(scraper)
+
+    return "", 204
+
+
+@app.route("/item-urls-lease/", methods=["POST"])
+def lease_item_urls():
+    requeue_dead_scrapers_urls()
+
+    with ITEM_URLS_LOCK:
+        lease_id, urls = ITEM_URLS.lease(
+            flask.request.json["size"], flask.request.json["scraper"]
+        )
+        if lease_id is not None:
+            return flask.jsonify({"lease": lease_id, "urls": urls})
+
+        finished = ITEM_URLS.all_urls_leased
+
+    return flask.jsonify(
+        {
+            "lease": None,
+            "finished": finished,
+            "retry_after": Config.URLS_LEASE_POLL_INTERVAL,
+        }
+    )
+
+
+@app.route("/item-urls/done/", methods=["POST"])
+def release_item_urls():
+    with ITEM_URLS_LOCK:
+        ITEM_URLS.release(flask.request.json)
+
+    return "", 204
+
+
+@app.route("/scrapers/", methods=["GET"])
+def get_scrapers():
+    """Get scrapers by their state, waiting at most `timeout` seconds (a query
+    parameter) till all scrapers are done or dead.
+    """
+    timeout = flask.request.args.get("timeout", 0, type=float)
+    deadline = time.monotonic() + timeout
+
+    while True:
+        requeue_dead_scrapers_urls()
+
+        with SCRAPERS_CHANGED:
+            finished = SCRAPERS.all_scrapers_finished
+            remaining = deadline - time.monotonic()
+            if finished or remaining <= 0:
+                status = SCRAPERS.get_status()
+                break
+
+            # NOTE: wake up regularly to find dead scrapers.
+            SCRAPERS_CHANGED.wait(
+                min(remaining, Config.SCRAPER_HEARTBEAT_INTERVAL)
+            )
+
+    status["finished"] = finished
+    return flask.jsonify(status)
+
+
+@app.route("/scrapers/<scraper>/", methods=["POST"])
+def register_scraper(scraper):
+    with SCRAPERS_CHANGED:
+        placeholder = SCRAPERS.register(scraper)
+        if placeholder is not None:
+            # NOTE: the scraper finds item URLs instead of its placeholder.
+            with ITEM_URLS_LOCK:
+                ITEM_URLS.undo_finish_discovery(placeholder)
+
+    return "", 201
+
+
+@app.route("/scrapers/<scraper>/heartbeat/", methods=["POST"])
+def scraper_heartbeat(scraper):
+    with SCRAPERS_CHANGED:
+        SCRAPERS.heartbeat(scraper)
+
+    return "", 204
+
+
+@app.route("/scrapers/<scraper>/done/", methods=["POST"])
+def finish_scraper(scraper):
+    with SCRAPERS_CHANGED:
+        SCRAPERS.finish(scraper)
+        SCRAPERS_CHANGED.notify_all()
+
+    return "", 204
+
+
 @app.route("/datastore/insert-data/", methods=["POST"])
 def insert_data():
     DATASTORE.insert(flask.request.json)
     return "", 201
 
 
+@app.route("/datastore/insert-multiple-data/", methods=["POST"])
+def insert_multiple_data():
+    batch = flask.request.json
+    DATASTORE.insert_multiple(batch["items"], batch["batch"])
+    return "", 201
+
+
 @app.route("/datastore/commit/")
 def commit():
     DATASTORE.commit()
     return "", 204
 
 
+def run(host="0.0.0.0", port=None):
+    """Serve the controller app with the server set in
+    `Config.CONTROLLER_SERVER`.
+
+    :argument host: address to listen on
+    :type host: str
+    :argument port: port to listen on, defaults to `Config.CONTROLLER_PORT`
+    :type port: int
+    """
+    if port is None:
+        port = Config.CONTROLLER_PORT
+
+    if Config.CONTROLLER_SERVER == "flask":
+        app.run(host=host, port=port, threaded=True)
+    elif Config.CONTROLLER_SERVER == "waitress":
+        if waitress is None:
+            raise RuntimeError(
+                'The "waitress" controller server requires waitress '
+                "(`pip install scrapemeagain[waitress]`)"
+            )
+
+        waitress.serve(
+            app,
+            host=host,
+            port=port,
+            threads=Config.CONTROLLER_THREADS,
+            connection_limit=Config.CONTROLLER_CONNECTION_LIMIT,
+        )
+    else:
+        raise ValueError(
+            'Invalid controller server: "{}"'.format(Config.CONTROLLER_SERVER)
+        )
+
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=Config.CONTROLLER_PORT)
+    run()
@@ -1,3 +1,8 @@
+from collections import deque
+import itertools
+import logging
+import time
+
 from scrapemeagain.config import Config
 
 
@@ -6,6 +11,18 @@ class UrlsRangeManager:
         self._urls_range = None
         self.descending = descending
 
+        self.chunk_size = Config.URLS_CHUNK_SIZE
+        self.lease_timeout = Config.URLS_LEASE_TIMEOUT
+
+        # Chunks waiting to be leased, leased chunks, scrapers they are leased
+        # to and their URLs (an ordered set) not processed yet by lease ID.
+        self._chunks = None
+        self._leases = {}
+        self._lease_owners = {}
+        self._lease_urls = {}
+        self._url_leases = {}
+        self._lease_ids = itertools.count(1)
+
     def get_urls_count(self):
         return 0
 
@@ -27,6 +44,181 @@ class UrlsRangeManager:
             if end == 0:
                 break
 
+    def generate_urls_chunks(self):
+        """Split URLs into ranges of at most `chunk_size` URLs.
+
+        :returns iterator
+        """
+        urls_count = self.get_urls_count()
+
+        for i in range(urls_count, 0, -self.chunk_size):
+            start = i
+            end = max(i - self.chunk_size, 0)
+
+            # See `generate_urls_range`.
+            yield (start, end) if self.descending else (end, start)
+
+    def _drop_lease(self, lease_id):
+        """Forget a lease and URLs assigned to it.
+
+        :argument lease_id:
+        :type lease_id: int
+
+        :returns bool flag if the lease was active
+        """
+        self._lease_owners.pop(lease_id, None)
+        for url in self._lease_urls.pop(lease_id, ()):
+            del self._url_leases[url]
+
+        return self._leases.pop(lease_id, None) is not None
+
+    def _reassign_expired_leases(self, now):
+        """Put chunks of expired leases back to be leased again first.
+
+        :argument now: current `time.monotonic` value
+        :type now: float
+        """
+        expired_chunks = []
+
+        for lease_id, (chunk, expires_at) in list(self._leases.items()):
+            if expires_at <= now:
+                self._drop_lease(lease_id)
+                expired_chunks.append(chunk)
+
+                logging.warning(
+                    "URLs lease {0} {1} expired, reassigning".format(
+                        lease_id, chunk
+                    )
+                )
+
+        # NOTE: keep the original order of chunks.
+        self._chunks.extendleft(reversed(expired_chunks))
+
+    def lease_urls_range(self, scraper=None):
+        """Lease the next chunk of URLs, e.g. to a scraper which is done with
+        the previous one. Chunks which aren't released in `lease_timeout`
+        seconds are leased again.
+
+        :argument scraper: hostname of the scraper to lease the chunk to
+        :type scraper: str
+
+        :returns tuple (lease ID, (start, end)) or `(None, None)` if there is
+        no chunk to lease
+        """
+        now = time.monotonic()
+
+        if self._chunks is None:
+            self._chunks = deque(self.generate_urls_chunks())
+
+        self._reassign_expired_leases(now)
+
+        if not self._chunks:
+            return None, None
+
+        chunk = self._chunks.popleft()
+        lease_id = next(self._lease_ids)
+        self._leases[lease_id] = (chunk, now + self.lease_timeout)
+        self._lease_owners[lease_id] = scraper
+
+        return lease_id, chunk
+
+    def release_urls_range(self, lease_id):
+        """Release a leased chunk of URLs, i.e. mark it as processed.
+
+        NOTE: a chunk whose lease has expired stays leased to the scraper it
+        was reassigned to.
+
+        :argument lease_id:
+        :type lease_id: int
+
+        :returns bool flag if the lease was active
+        """
+        return self._drop_lease(lease_id)
+
+    def assign_urls(self, lease_id, urls):
+        """Assign URLs of a leased chunk, so the chunk can be released URL by
+        URL, see `release_urls`.
+
+        :argument lease_id:
+        :type lease_id: int
+        :argument urls: URLs of the chunk
+        :type urls: list
+
+        :returns bool flag if the lease is active
+        """
+        if lease_id not in self._leases:
+            return False
+
+        if not urls:
+            # Nothing to process.
+            self._drop_lease(lease_id)
+            return True
+
+        self._lease_urls[lease_id] = dict.fromkeys(urls)
+        for url in urls:
+            self._url_leases[url] = lease_id
+
+        return True
+
+    def release_urls(self, urls):
+        """Release processed URLs. A chunk is released once all of its URLs
+        are released.
+
+        :argument urls:
+        :type urls: list
+        """
+        for url in urls:
+            lease_id = self._url_leases.pop(url, None)
+            if lease_id is None:
+                continue
+
+            lease_urls = self._lease_urls[lease_id]
+            del lease_urls[url]
+            if not lease_urls:
+                self._drop_lease(lease_id)
+
+    def expire_leases(self, scraper):
+        """Let leases of a scraper (e.g. a dead one) expire right away, so its
+        chunks are leased again.
+
+        :argument scraper: scraper's hostname
+        :type scraper: str
+        """
+        now = time.monotonic()
+
+        for lease_id, owner in self._lease_owners.items():
+            if owner == scraper:
+                chunk, _ = self._leases[lease_id]
+                self._leases[lease_id] = (chunk, now)
+
+    @property
+    def pending_count(self):
+        """Number of chunks waiting to be leased (including those of expired
+        leases).
+        """
+        if self._chunks is None:
+            return 0
+
+        self._reassign_expired_leases(time.monotonic())
+        return len(self._chunks)
+
+    @property
+    def all_urls_leased(self):
+        """Flag if all chunks of URLs were leased.
+
+        NOTE: scrapers don't wait for other scrapers' leases to be released
+        while leasing, as a scraper which waits for more URLs can't process
+        those it has already leased (see `all_urls_released`).
+        """
+        return self._chunks is not None and not self._chunks
+
+    @property
+    def all_urls_released(self):
+        """Flag if there are no chunks to lease or to be released, i.e. also
+        if no chunk was ever leased.
+        """
+        return not self._chunks and not self._leases
+
     def get_urls_range(self):
         if self._urls_range is None:
             self._urls_range = self.generate_urls_range()
@@ -1,11 +1,9 @@
 import fcntl
 import os
-from subprocess import CalledProcessError, check_call, PIPE
 import socket
 import struct
-from time import sleep
 
-from scrapemeagain.config import Config
+from scrapemeagain.dockerized.controller import client as controller_client
 
 
 def get_class_from_path(path):
@@ -47,44 +45,13 @@ def apply_scraper_config(scraper_package=None, scraper_config=None):
     get_class_from_path("{}.config".format(scraper_package))
 
 
-def scraper_is_running(hostname):
-    """
-    Check if a given scraper is running by trying to ping it.
-
-    :argument hostname: scraper's hostname
-    :type hostname: str
-
-    :returns: bool
-    """
-    try:
-        result = check_call(
-            ["ping", "-c", "2", hostname], stdout=PIPE, stderr=PIPE
-        )
-    except CalledProcessError:
-        result = 1
-
-    # If ping's return code == 0 the scraper is running.
-    return result == 0
-
-
 def wait_for_other_scrapers():
     """
-    Wait untill the rest of the scrapers is finished.
+    Wait untill the rest of the scrapers is finished, i.e. till each scraper
+    reports it's done or misses its heartbeats.
     """
     apply_scraper_config()
-
-    for sraper_id in range(0, Config.SCRAPERS_COUNT):
-        sraper_id += 1
-
-        if sraper_id == 1:
-            continue
-
-        hostname = os.environ.get("SERVICE_NAME_TEMPLATE").format(sraper_id)
-        while True:
-            if not scraper_is_running(hostname):
-                break
-
-            sleep(2)
+    controller_client.wait_for_scrapers()
 
 
 def get_inf_ip_address(ifname):
@@ -0,0 +1,126 @@
+"""
+Tor IP rotation which doesn't stall the fetching stage.
+"""
+
+
+import logging
+import threading
+import time
+
+from scrapemeagain.config import Config
+
+
+class IpRotator:
+    def __init__(self, tor_ip_changer, on_new_ip=None):
+        """Change Tor IP on demand, either right away or in the background.
+
+        `rotate` only requests a new IP and returns immediately; the change
+        (i.e. asking Tor for a new circuit and validating its exit IP) is then
+        carried out by a daemon thread while requests keep flowing. Requests
+        made while a change is already in progress are merged into it.
+
+        :argument tor_ip_changer: a TorIpChanger instance
+        :type tor_ip_changer: object
+        :argument on_new_ip: function called after IP has changed
+        :type on_new_ip: function
+        """
+        self.tor_ip_changer = tor_ip_changer
+        self.on_new_ip = on_new_ip
+
+        self.max_attempts = Config.CHANGE_IP_MAX_ATTEMPTS
+        self.backoff = Config.CHANGE_IP_BACKOFF
+        self.max_backoff = Config.CHANGE_IP_MAX_BACKOFF
+
+        self._current_ip = None
+        self._lock = threading.Lock()
+
+        self._thread = None
+        self._rotation_lock = threading.Lock()
+        self._rotation_requested = threading.Event()
+        self._rotation_finished = threading.Event()
+        self._rotation_finished.set()
+
+    @property
+    def current_ip(self):
+        """Last successfully obtained IP address."""
+        with self._lock:
+            return self._current_ip
+
+    def _get_backoff(self, attempt):
+        """Get how long to wait before the next attempt to change IP.
+
+        :argument attempt: number of failed attempts so far
+        :type attempt: int
+
+        :returns float
+        """
+        return min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+
+    def change_ip(self):
+        """Change IP address and wait till it's done.
+
+        Failed attempts are retried with an exponential backoff, but at most
+        `max_attempts` times.
+
+        :returns str or None if no new IP was obtained
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                new_ip = self.tor_ip_changer.get_new_ip()
+            except:  # noqa
+                logging.error("Failed setting new IP")
+
+                if attempt < self.max_attempts:
+                    time.sleep(self._get_backoff(attempt))
+
+                continue
+
+            with self._lock:
+                self._current_ip = new_ip
+
+            if self.on_new_ip is not None:
+                self.on_new_ip()
+
+            logging.info("New IP: {new_ip}".format(new_ip=new_ip))
+            return new_ip
+
+        logging.error(
+            "Giving up setting new IP after {} attempts".format(
+                self.max_attempts
+            )
+        )
+
+    def _rotate(self):
+        """Change IP each time a rotation is requested."""
+        while True:
+            self._rotation_requested.wait()
+            self._rotation_requested.clear()
+
+            try:
+                self.change_ip()
+            finally:
+                with self._rotation_lock:
+                    if not self._rotation_requested.is_set():
+                        self._rotation_finished.set()
+
+    def rotate(self):
+        """Request IP change to be carried out in the background."""
+        with self._rotation_lock:
+            self._rotation_finished.clear()
+            self._rotation_requested.set()
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._rotate, daemon=True
+                )
+                self._thread.start()
+
+    def wait(self, timeout=None):
+        """Wait till all requested IP changes are finished.
+
+        :argument timeout: how long to wait at most (in seconds)
+        :type timeout: float
+
+        :returns bool
+        """
+        return self._rotation_finished.wait(timeout)
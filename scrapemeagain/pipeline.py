@@ -5,16 +5,57 @@ Multithread I/O and multiprocess CPU intensive tasks to maximize performance.
 
 from concurrent.futures import ThreadPoolExecutor
 import logging
-from multiprocessing import Event, Process, Queue, Value
+from multiprocessing import Process, Queue, Value
+from queue import Empty
+import socket
+import threading
 import time
+import zlib
 
+from requests import RequestException
+
+from scrapemeagain.concurrency import ConcurrencyController
 from scrapemeagain.config import Config
+from scrapemeagain.dockerized.controller import client as controller_client
+from scrapemeagain.iprotator import IpRotator
+from scrapemeagain.retrier import FailedUrl, get_retry_after, Retrier
 from scrapemeagain.utils.alnum import get_current_datetime
-from scrapemeagain.utils.http import get
+from scrapemeagain.utils.executors import AsyncioExecutor
+from scrapemeagain.utils.http import (
+    async_get,
+    get,
+    reset_sessions,
+    ResponseRecord,
+)
+from scrapemeagain.utils.queues import (
+    ByteBudget,
+    get_body_size,
+    get_queue_size,
+)
+from scrapemeagain.utils.ratelimiter import rate_limited, RateLimiter
+from scrapemeagain.utils.ringbuffer import SharedMemoryRingBuffer
 
 
 EXIT = "__exit__"
-DUMP_URLS_BUCKET = "__dump_urls_bucket__"
+
+# How long to wait for more URLs to fill a bucket (in seconds).
+BUCKET_FILL_TIMEOUT = 0.1
+
+# How often to inform about the scraping progress (in seconds).
+PROGRESS_INTERVAL = 5
+
+
+class ItemUrls(list):
+    def __init__(self, urls, list_url):
+        """Item URLs scraped from a list page.
+
+        :argument urls: item URLs
+        :type urls: list
+        :argument list_url: URL of the list page
+        :type list_url: str
+        """
+        super().__init__(urls)
+        self.list_url = list_url
 
 
 class Pipeline:
@@ -39,26 +80,100 @@ class Pipeline:
         self.scraper = scraper
         self.databaser = databaser
         self.tor_ip_changer = tor_ip_changer
+        # NOTE: connections opened before IP has changed would keep using
+        # the old IP.
+        self.ip_rotator = IpRotator(tor_ip_changer, on_new_ip=reset_sessions)
 
         self.workers_count = Config.WORKERS_COUNT
+        self.dispatch_mode = Config.DISPATCH_MODE
+        self.concurrency_mode = Config.CONCURRENCY_MODE
+        self.parsers_count = Config.PARSER_PROCESSES
+        self.stores_count = Config.STORE_PROCESSES
+
+        # Flag to request item URLs as soon as they are scraped, see
+        # `get_item_urls_and_properties`.
+        self.stream_item_urls = False
 
         self.workers = []
+        # Thread classifying responses of the 'asyncio' engine, see
+        # `stream_html`.
+        self.classifier = None
 
     def prepare_pipeline(self):
         """Prepare all necessary multithreading and multiprocessing objects."""
+        # NOTE: 'url_queue' is fed in steps of `workers_count` URLs, hence it
+        # doesn't need to be bounded.
         self.url_queue = Queue()
-        self.response_queue = Queue()
-        self.data_queue = Queue()
+        self.response_queue = Queue(Config.RESPONSE_QUEUE_SIZE)
+        # NOTE: each 'store_data' worker has its own queue, 'data_queue' is
+        # the first (and by default the only) one.
+        self.data_queues = [
+            Queue(Config.DATA_QUEUE_SIZE) for _ in range(self.stores_count)
+        ]
+        self.data_queue = self.data_queues[0]
+
+        if Config.RESPONSE_QUEUE_BYTES:
+            self.response_bytes = ByteBudget(Config.RESPONSE_QUEUE_BYTES)
+        else:
+            self.response_bytes = None
+
+        # Pick how response bodies get from requesting to scraping processes.
+        if Config.RESPONSE_TRANSPORT == "queue":
+            self.response_buffer = None
+        elif Config.RESPONSE_TRANSPORT == "shared_memory":
+            self.response_buffer = SharedMemoryRingBuffer(
+                Config.SHARED_MEMORY_SLOTS, Config.SHARED_MEMORY_SLOT_SIZE
+            )
+        else:
+            raise ValueError(
+                'Invalid response transport: "{}"'.format(
+                    Config.RESPONSE_TRANSPORT
+                )
+            )
 
-        self.pool = ThreadPoolExecutor(self.workers_count)
+        # Pick the engine which fires requests, `self.fetch` is the function
+        # `self.pool` runs for each URL.
+        if Config.FETCH_ENGINE == "threads":
+            self.pool_class = ThreadPoolExecutor
+            self.fetch = get
+        elif Config.FETCH_ENGINE == "asyncio":
+            self.pool_class = AsyncioExecutor
+            self.fetch = async_get
+        else:
+            raise ValueError(
+                'Invalid fetch engine: "{}"'.format(Config.FETCH_ENGINE)
+            )
+        # NOTE: the pool is shut down once `get_html` is finished, hence
+        # a new one is created for each run.
+        self.pool = self.pool_class(self.workers_count)
+
+        # Pick how many requests are fired at once.
+        if self.concurrency_mode == "fixed":
+            self.concurrency = None
+        elif self.concurrency_mode == "adaptive":
+            self.concurrency = ConcurrencyController(
+                Config.MIN_WORKERS_COUNT, self.workers_count
+            )
+        else:
+            raise ValueError(
+                'Invalid concurrency mode: "{}"'.format(self.concurrency_mode)
+            )
 
-        self.producing_urls_in_progress = Event()
-        self.requesting_in_progress = Event()
-        self.scraping_in_progress = Event()
+        # NOTE: each request waits for it's turn separately, so the others
+        # are fired meanwhile.
+        if Config.RATE_LIMITS:
+            self.rate_limiter = RateLimiter(Config.RATE_LIMITS)
+            self.fetch = rate_limited(
+                self.fetch, self.rate_limiter, self._get_current_ip
+            )
 
         self.urls_to_process = Value("i", 0)
         self.urls_processed = Value("i", 0)
-        self.urls_bucket_empty = Value("i", 1)
+        # URLs (and URL producers) which aren't fully processed yet.
+        self.urls_in_flight = Value("i", 0)
+        # URLs waiting to be requested again.
+        self.urls_to_retry = Value("i", 0)
+        self.retrier = Retrier(self.url_queue.put, self.urls_to_retry)
 
     def inform(self, message, log=True, end="\n"):
         """Print and if set log a message.
@@ -86,23 +201,102 @@ class Pipeline:
         except ZeroDivisionError:
             pass
 
+    def get_queue_depths(self):
+        """Get the current backlog of each pipeline stage.
+
+        :returns dict
+        """
+        data_queue_sizes = [get_queue_size(q) for q in self.data_queues]
+
+        depths = {
+            "url_queue": get_queue_size(self.url_queue),
+            "response_queue": get_queue_size(self.response_queue),
+            "data_queue": (
+                None if None in data_queue_sizes else sum(data_queue_sizes)
+            ),
+            "urls_in_flight": self.urls_in_flight.value,
+            "urls_to_retry": self.urls_to_retry.value,
+        }
+
+        if self.response_bytes is not None:
+            depths["response_queue_bytes"] = (
+                self.response_bytes.used_bytes.value
+            )
+
+        return depths
+
+    def _inform_queue_depths(self):
+        """Log the current backlog of each pipeline stage."""
+        depths = self.get_queue_depths()
+        logging.info(
+            "Queue depths: {}".format(
+                ", ".join(
+                    "{0}={1}".format(name, depth)
+                    for name, depth in sorted(depths.items())
+                )
+            )
+        )
+
+    def _get_current_ip(self):
+        """Get the current exit IP.
+
+        :returns str or None if IP wasn't changed yet
+        """
+        return self.ip_rotator.current_ip
+
     def change_ip(self):
         """Change IP address.
 
-        By default, IP is changed after each bunch of URLs is requested.
+        By default, IP is changed after each bunch of URLs is requested. With
+        `Config.BACKGROUND_IP_CHANGE` set the change is carried out in the
+        background and requesting URLs goes on meanwhile.
         """
-        try:
-            new_ip = self.tor_ip_changer.get_new_ip()
-            logging.info("New IP: {new_ip}".format(new_ip=new_ip))
-        except:  # noqa
-            logging.error("Failed setting new IP")
-            return self.change_ip()
+        if Config.BACKGROUND_IP_CHANGE:
+            self.ip_rotator.rotate()
+        else:
+            self.ip_rotator.change_ip()
+
+    def _track_urls(self, count=1):
+        """Register URLs entering the pipeline.
+
+        Each URL is tracked from being put to 'url_queue' till it's data is
+        stored (or it's dropped) and the pipeline exits right after the last
+        tracked URL is released.
+
+        :argument count: number of URLs
+        :type count: int
+        """
+        with self.urls_in_flight.get_lock():
+            self.urls_in_flight.value += count
+
+    def _release_urls(self, count=1):
+        """Unregister fully processed URLs and exit workers if there are no
+        more URLs to process.
+
+        :argument count: number of URLs
+        :type count: int
+        """
+        with self.urls_in_flight.get_lock():
+            self.urls_in_flight.value -= count
+            urls_in_flight = self.urls_in_flight.value
+
+        if not urls_in_flight:
+            self.exit_workers()
+
+    def enqueue_url(self, url):
+        """Put a new URL to 'url_queue'.
+
+        :argument url:
+        :type url: str
+        """
+        self._track_urls()
+        self.url_queue.put(url)
 
     def generate_list_urls(self):
         """Create a generator for populating `url_queue` with list URLs."""
         put_urls = 0
         for list_url in self.scraper.generate_list_urls():
-            self.url_queue.put(list_url)
+            self.enqueue_url(list_url)
 
             put_urls += 1
             if put_urls == self.workers_count:
@@ -111,28 +305,81 @@ class Pipeline:
 
     def generate_item_urls(self):
         """Create a generator for populating `url_queue` with item URLs."""
-        query = self.databaser.get_item_urls()
+        item_urls = self.databaser.iter_item_urls(Config.ITEM_URLS_BATCH_SIZE)
 
         put_urls = 0
-        for item_url in query.yield_per(self.workers_count):
-            self.url_queue.put(item_url[0])
+        for item_url in item_urls:
+            self.enqueue_url(item_url)
 
             put_urls += 1
             if put_urls == self.workers_count:
                 put_urls = 0
                 yield
 
+    def _retry_url(self, response):
+        """Schedule URL of a failed response to be requested again or, once
+        out of attempts, pass it on to be stored as failed.
+
+        :argument response:
+        :type response: request.response
+        """
+        retried = self.retrier.retry(
+            response.url, response.status_code, get_retry_after(response)
+        )
+
+        if not retried:
+            self.put_data(
+                FailedUrl(
+                    response.url,
+                    response.status_code,
+                    self.retrier.forget(response.url),
+                    self.scraper.list_url_template in response.url,
+                )
+            )
+
     def _classify_response(self, response):
-        """Examine response and put it to 'response_queue' if it's OK or put
-        it's URL  back to 'url_queue'.
+        """Examine response and put it to 'response_queue' if it's OK or
+        schedule it's URL to be retried.
+
+        NOTE: only a compact `ResponseRecord` is passed on for scraping as
+        pickling the whole response is expensive.
 
         :argument response:
         :type response: request.response
         """
         if not response.ok and response.status_code >= 408:
-            self.url_queue.put(response.url)
+            self._retry_url(response)
         else:
-            self.response_queue.put(response)
+            self.retrier.forget(response.url)
+
+            record = ResponseRecord.from_response(response)
+            if self.response_buffer is not None:
+                record = self.response_buffer.pack(record)
+
+            if self.response_bytes is not None:
+                self.response_bytes.acquire(get_body_size(record))
+
+            self.response_queue.put(record)
+
+    def _get_workers_limit(self):
+        """Get how many requests may be fired at once.
+
+        :returns int
+        """
+        if self.concurrency is not None:
+            return self.concurrency.limit
+
+        return self.workers_count
+
+    def _adapt_concurrency(self, response):
+        """Let the adaptive concurrency controller (if used) know how
+        a request went.
+
+        :argument response:
+        :type response: request.response
+        """
+        if self.concurrency is not None:
+            self.concurrency.update(response)
 
     def _actually_get_html(self, urls):
         """Request provided URLs running multiple processes.
@@ -140,42 +387,84 @@ class Pipeline:
         :argument urls: URLs to get data from
         :type urls: list
         """
+        classified_urls = 0
+
         try:
-            self.requesting_in_progress.set()
-            for response in self.pool.map(get, urls):
+            for response in self.pool.map(self.fetch, urls):
+                self._adapt_concurrency(response)
                 self._classify_response(response)
+                classified_urls += 1
         except Exception as exc:
             logging.error("Failed scraping URLs")
             logging.exception(exc)
-        finally:
-            self.requesting_in_progress.clear()
+
+            # Unclassified URLs are lost.
+            self._release_urls(len(urls) - classified_urls)
+
+    def _produce_urls(self, urls_generator):
+        """Let the generator populate 'url_queue' with more URLs.
+
+        :argument urls_generator:
+        :type urls_generator: generator
+
+        :returns bool flag if the generator may produce more URLs
+        """
+        try:
+            next(urls_generator)
+            return True
+        except StopIteration:
+            # Release the generator itself, see `bucket_html`.
+            self._release_urls()
+            return False
 
     def get_html(self, urls_generator):
-        """Get HTML for URLs from 'url_queue'."""
+        """Get HTML for URLs from 'url_queue' and shut the pool down once
+        done (which also closes HTTP sessions of the 'asyncio' engine).
+        """
+        if self.pool is None:
+            self.pool = self.pool_class(self.workers_count)
+
+        try:
+            if self.dispatch_mode == "streaming":
+                self.stream_html(urls_generator)
+            else:
+                self.bucket_html(urls_generator)
+        finally:
+            self.pool.shutdown()
+            self.pool = None
+
+    def bucket_html(self, urls_generator):
+        """Get HTML for URLs from 'url_queue' in buckets of `workers_count`
+        URLs (or as many as the adaptive concurrency controller allows),
+        i.e. a new bucket is requested once the whole previous one finished.
+        """
         run = True
         self.inform("URLs to process: {}".format(self.urls_to_process.value))
-        self.producing_urls_in_progress.set()
+
+        # Track the generator as an URL so the pipeline won't exit before all
+        # URLs are produced.
+        self._track_urls()
+        producing = True
 
         while run:
-            try:
-                next(urls_generator)
-            except StopIteration:
-                self.producing_urls_in_progress.clear()
+            if producing:
+                producing = self._produce_urls(urls_generator)
 
             urls_bucket = []
-            self.urls_bucket_empty.value = 1
-            for _ in range(0, self.workers_count):
-                url = self.url_queue.get()
+            for _ in range(0, self._get_workers_limit()):
+                # NOTE: wait only for the first URL, a partial bucket is
+                # better than waiting for URLs which may never come.
+                timeout = BUCKET_FILL_TIMEOUT if urls_bucket else None
+                try:
+                    url = self.url_queue.get(timeout=timeout)
+                except Empty:
+                    break
 
                 if url == EXIT:
                     run = False
                     break
-                elif url == DUMP_URLS_BUCKET:
-                    break
 
                 urls_bucket.append(url)
-                if self.urls_bucket_empty.value:
-                    self.urls_bucket_empty.value = 0
 
             if urls_bucket:
                 self._actually_get_html(urls_bucket)
@@ -183,16 +472,147 @@ class Pipeline:
             if run:
                 self.change_ip()
 
+    def _request_url(self, url):
+        """Request provided URL without waiting for the response.
+
+        :argument url:
+        :type url: str
+        """
+        future = self.pool.submit(self.fetch, url)
+        future.add_done_callback(self._request_done)
+
+    def _request_done(self, future):
+        """Classify response of a finished request, by the classifier thread
+        if there is one.
+
+        :argument future: finished request
+        :type future: `concurrent.futures.Future`
+        """
+        if self.classifier is not None:
+            self.classifier.submit(self._classify_request, future)
+        else:
+            self._classify_request(future)
+
+    def _classify_request(self, future):
+        """Classify response of a finished request and free its slot.
+
+        :argument future: finished request
+        :type future: `concurrent.futures.Future`
+        """
+        try:
+            response = future.result()
+            self._adapt_concurrency(response)
+            self._classify_response(response)
+        except Exception as exc:
+            logging.error("Failed scraping URL")
+            logging.exception(exc)
+
+            # Unclassified URL is lost.
+            self._release_urls()
+        finally:
+            self.request_slots.release()
+
+    def stream_html(self, urls_generator):
+        """Get HTML for URLs from 'url_queue' keeping `workers_count` requests
+        (or as many as the adaptive concurrency controller allows) in flight,
+        i.e. a new request is fired as soon as any of them finishes.
+        """
+        self.inform("URLs to process: {}".format(self.urls_to_process.value))
+
+        if self.concurrency is not None:
+            self.request_slots = self.concurrency
+        else:
+            self.request_slots = threading.Semaphore(self.workers_count)
+
+        # NOTE: the 'asyncio' engine finishes requests on its event loop
+        # thread, classifying a response there could block the loop (e.g. on
+        # a full 'response_queue') and so all requests in flight.
+        if isinstance(self.pool, AsyncioExecutor):
+            self.classifier = ThreadPoolExecutor(1)
+
+        change_ip_after = Config.CHANGE_IP_AFTER or self.workers_count
+        requested_urls = 0
+
+        # See `bucket_html`.
+        self._track_urls()
+        producing = True
+
+        while True:
+            self.request_slots.acquire()
+
+            # NOTE: `urls_generator` puts `workers_count` URLs to 'url_queue'
+            # at once, so keep it one step ahead of fired requests.
+            if producing and requested_urls % self.workers_count == 0:
+                producing = self._produce_urls(urls_generator)
+
+            url = self.url_queue.get()
+
+            if url == EXIT:
+                self.request_slots.release()
+                break
+
+            self._request_url(url)
+
+            requested_urls += 1
+            if requested_urls % change_ip_after == 0:
+                self.change_ip()
+
+        if self.classifier is not None:
+            self.classifier.shutdown()
+            self.classifier = None
+
+    def _get_shard(self, url):
+        """Get number of the 'store_data' worker which stores data for the
+        given URL.
+
+        :argument url:
+        :type url: str
+
+        :returns int
+        """
+        return zlib.crc32(url.encode()) % self.stores_count
+
+    def put_data(self, data):
+        """Put data to the 'data_queue' of the worker which stores it.
+
+        NOTE: scraped item URLs are split by shard, so an item URL and its
+        properties are always stored in the same shard.
+
+        :argument data: data to store in the DB
+        :type data: `FailedUrl` or list or dict
+        """
+        if self.stores_count == 1:
+            self.data_queue.put(data)
+        elif isinstance(data, FailedUrl):
+            self.data_queues[self._get_shard(data.url)].put(data)
+        elif isinstance(data, list):
+            parts = {}
+            for item in data:
+                parts.setdefault(self._get_shard(item["url"]), []).append(item)
+
+            # Each part is stored (and counted as processed) separately.
+            self._track_urls(len(parts) - 1)
+            with self.urls_to_process.get_lock():
+                self.urls_to_process.value += len(parts) - 1
+
+            for shard, part in parts.items():
+                if isinstance(data, ItemUrls):
+                    part = ItemUrls(part, data.list_url)
+
+                self.data_queues[shard].put(part)
+        else:
+            self.data_queues[self._get_shard(data["url"])].put(data)
+
     def _scrape_data(self, response):
         """Scrape HTML provided by the given response.
 
         :argument response:
-        :type response: request.response
+        :type response: `ResponseRecord`
 
         :returns dict
         """
         if self.scraper.list_url_template in response.url:
-            data = self.scraper.get_item_urls(response)
+            data = ItemUrls(self.scraper.get_item_urls(response), response.url)
         else:
             data = self.scraper.get_item_properties(response)
 
@@ -202,21 +622,35 @@ class Pipeline:
         """Collect data from the given response.
 
         :argument response:
-        :type response: request.response
+        :type response: `ResponseRecord`
         """
-        try:
-            self.scraping_in_progress.set()
+        data = None
 
+        try:
             data = self._scrape_data(response)
             if data:
-                self.data_queue.put(data)
+                self.put_data(data)
         except Exception as exc:
             logging.error(
                 'Failed processing response for "{}"'.format(response.url)
             )
             logging.exception(exc)
         finally:
-            self.scraping_in_progress.clear()
+            # There is nothing to store, the URL is fully processed.
+            if not data:
+                self._discard_url(response.url)
+                self._release_urls()
+
+    def _discard_url(self, url):
+        """Handle an URL which has nothing to store, as scraping it failed or
+        found nothing.
+
+        NOTE: such an item URL isn't marked as done, so it's requested again
+        by the next run.
+
+        :argument url:
+        :type url: str
+        """
 
     def collect_data(self):
         """Get data for responses from 'response_queue'."""
@@ -226,6 +660,12 @@ class Pipeline:
             if response == EXIT:
                 break
 
+            if self.response_bytes is not None:
+                self.response_bytes.release(get_body_size(response))
+
+            if self.response_buffer is not None:
+                response = self.response_buffer.unpack(response)
+
             self._actually_collect_data(response)
 
     def _store_item_urls(self, data):
@@ -237,7 +677,27 @@ class Pipeline:
         if not data:
             return
 
-        self.databaser.insert_multiple(data, self.databaser.item_urls_table)
+        # NOTE: item URLs are stored even when streamed so they can be
+        # requested again if the run crashes.
+        new_data = self.databaser.insert_item_urls(data)
+
+        if self.stream_item_urls:
+            self._stream_item_urls(new_data)
+
+    def _stream_item_urls(self, data):
+        """Put new item URLs straight to 'url_queue'.
+
+        NOTE: runs in the store process, before the list URL the item URLs
+        come from is released.
+
+        :argument data: newly stored item URLs
+        :type data: list
+        """
+        with self.urls_to_process.get_lock():
+            self.urls_to_process.value += len(data)
+
+        for item in data:
+            self.enqueue_url(item["url"])
 
     def _store_item_properties(self, data):
         """Handle storing item properties.
@@ -250,17 +710,31 @@ class Pipeline:
             # there is no point in storing it.
             self.databaser.insert(data, self.databaser.item_data_table)
 
-        # Remove processed item URL.
-        self.databaser.delete_url(data["url"])
+        # Don't request the processed item URL again.
+        self.databaser.mark_url_done(data["url"])
+
+    def _store_failed_url(self, failed_url):
+        """Handle storing an URL which failed to be requested.
+
+        :argument failed_url:
+        :type failed_url: `scrapemeagain.retrier.FailedUrl`
+        """
+        self.databaser.insert_failed_url(*failed_url)
+
+        if not failed_url.is_list_url:
+            # Don't request the failed item URL again in the next run.
+            self.databaser.mark_url_done(failed_url.url)
 
     def _actually_store_data(self, data):
         """Store provided data in the DB.
 
         :argument data: data to store in the DB
-        :type data: str or list or dict
+        :type data: `FailedUrl` or list or dict
         """
         try:
-            if isinstance(data, list):
+            if isinstance(data, FailedUrl):
+                self._store_failed_url(data)
+            elif isinstance(data, list):
                 self._store_item_urls(data)
             else:
                 self._store_item_properties(data)
@@ -268,22 +742,53 @@ class Pipeline:
             logging.error("Failed storing data")
             logging.exception(exc)
         finally:
-            self.urls_processed.value += 1
+            with self.urls_processed.get_lock():
+                self.urls_processed.value += 1
+            self._release_urls()
 
-    def store_data(self):
-        """Consume 'data_queue' and store provided data in the DB."""
-        self.urls_processed.value = 0
+    def store_data(self, shard=None):
+        """Consume 'data_queue' and store provided data in the DB.
+
+        :argument shard: number of the shard to store data in (and of the
+        'data_queue' to consume), `None` to use the main DB
+        :type shard: int
+        """
+        data_queue = self.data_queue
+        if shard is not None:
+            # NOTE: runs in a separate process, the main process keeps using
+            # the main DB.
+            self.databaser = self.databaser.get_shard(shard)
+            data_queue = self.data_queues[shard]
+
+        progress_informed_at = time.time()
 
         while True:
-            data = self.data_queue.get()
+            try:
+                # NOTE: don't block forever to commit also while idle.
+                data = data_queue.get(timeout=Config.TRANSACTION_TIMEOUT)
+            except Empty:
+                data = None
 
             if data == EXIT:
                 break
 
-            self._actually_store_data(data)
+            if data is not None:
+                self._actually_store_data(data)
+
+            self.databaser.commit_if_due()
+
+            # Inform about the progress.
+            if time.time() - progress_informed_at >= PROGRESS_INTERVAL:
+                self._inform_progress()
+                self._inform_queue_depths()
+                progress_informed_at = time.time()
 
         self.databaser.commit()
 
+        if shard is not None:
+            # Leave the shard ready to be merged.
+            self.databaser.close()
+
     def exit_workers(self):
         """Exit workers started as separate processes by passing an EXIT
         message to all queues. This action leads to exiting `while` loops which
@@ -292,63 +797,20 @@ class Pipeline:
         self.inform("Exiting workers, please wait ...")
 
         self.url_queue.put(EXIT)
-        self.response_queue.put(EXIT)
-        self.data_queue.put(EXIT)
-
-    def _queues_empty(self):
-        """Check if queues are empty.
-
-        :returns bool
-        """
-        return (
-            self.url_queue.empty()
-            and self.response_queue.empty()
-            and self.data_queue.empty()
-        )
-
-    def _workers_idle(self):
-        """Check if workers are idle.
-
-        :returns bool
-        """
-        return (
-            not self.producing_urls_in_progress.is_set()
-            and not self.requesting_in_progress.is_set()
-            and not self.scraping_in_progress.is_set()
-        )
-
-    def switch_power(self):
-        """Check when to exit workers so the program won't run forever."""
-        while True:
-            # Check if workers can end.
-            if (
-                self._queues_empty()
-                and self._workers_idle()
-                and self.urls_bucket_empty.value
-            ):
-                self.exit_workers()
-                break
-
-            # Ensure all URLs are processed.
-            if (
-                self._queues_empty()
-                and self._workers_idle()
-                and not self.urls_bucket_empty.value
-            ):
-                logging.info("Dumping URLs bucket")
-                self.url_queue.put(DUMP_URLS_BUCKET)
+        for _ in range(self.parsers_count):
+            self.response_queue.put(EXIT)
+        for data_queue in self.data_queues:
+            data_queue.put(EXIT)
 
-            # Inform about the progress.
-            self._inform_progress()
-            time.sleep(5)
-
-    def employ_worker(self, target):
+    def employ_worker(self, target, *args):
         """Create and register a daemon worker process.
 
         :argument target: worker's task
         :type target: function
+        :argument args: arguments to pass to the task
+        :type args: tuple
         """
-        worker = Process(target=target)
+        worker = Process(target=target, args=args)
         worker.daemon = True
         worker.start()
 
@@ -362,15 +824,18 @@ class Pipeline:
     def run(self, target, urls_count, generate_url_function):
         self.inform("Collecting item {0}".format(target))
         self.urls_to_process.value = urls_count
+        self.urls_processed.value = 0
 
         # response_queue --> data_queue.
-        self.employ_worker(self.collect_data)
+        for _ in range(self.parsers_count):
+            self.employ_worker(self.collect_data)
 
         # data_queue --> DB.
-        self.employ_worker(self.store_data)
-
-        # Prevent running forever.
-        self.employ_worker(self.switch_power)
+        if self.stores_count == 1:
+            self.employ_worker(self.store_data)
+        else:
+            for shard in range(self.stores_count):
+                self.employ_worker(self.store_data, shard)
 
         # NOTE Execution will block until 'get_html' is finished.
         # url_queue --> response_queue.
@@ -379,6 +844,9 @@ class Pipeline:
 
         self.release_workers()
 
+        # DB shards --> DB.
+        self.databaser.merge_shards()
+
     def get_item_urls(self):
         """Get item URLs from item list pages."""
         urls_count = self.scraper.list_urls_count
@@ -386,12 +854,142 @@ class Pipeline:
 
     def get_item_properties(self):
         """Get item properties from item pages."""
-        urls_count = self.databaser.get_item_urls().count()
+        # Don't request item URLs already processed by a crashed run again.
+        self.databaser.merge_shards()
+
+        urls_count = self.databaser.count_item_urls()
         self.run("properties", urls_count, self.generate_item_urls)
 
+    def get_item_urls_and_properties(self):
+        """Get item URLs from item list pages and item properties from item
+        pages at once, i.e. request item URLs as soon as they are scraped.
+
+        NOTE: item URLs which weren't processed (e.g. the run crashed) stay
+        in the DB and can be processed by `get_item_properties`.
+        """
+        urls_count = self.scraper.list_urls_count
+
+        self.stream_item_urls = True
+        try:
+            self.run(
+                "URLs and properties", urls_count, self.generate_list_urls
+            )
+        finally:
+            self.stream_item_urls = False
+
 
 class DockerizedPipeline(Pipeline):
+    def __init__(self, scraper, databaser, tor_ip_changer):
+        """Pipeline of a scraper run by docker-compose, among other scrapers.
+
+        The scraper is registered to the controller once it starts collecting
+        item URLs or properties and reported done once it collected all item
+        properties (see `register` and `finish`).
+        """
+        super().__init__(scraper, databaser, tor_ip_changer)
+
+        self.heartbeat = None
+
     def inform(self, message, log=True, **kwargs):
         # Prevent using `end = '\r'` as that way docker-compose won't show all
         # messages.
         super().inform(message, log=log, end="\n")
+
+    def _discard_url(self, url):
+        # NOTE: the URL won't be processed again, release it so it (or its
+        # list URLs chunk) isn't leased again and again.
+        try:
+            if self.scraper.list_url_template in url:
+                controller_client.release_list_urls([url])
+            elif self.databaser.use_frontier:
+                controller_client.release_item_urls([url])
+        except RequestException as exc:
+            logging.error("Failed to release URL {}".format(url))
+            logging.exception(exc)
+
+    def _store_item_urls(self, data):
+        super()._store_item_urls(data)
+
+        # NOTE: with multiple 'store_data' workers the list URL is released
+        # once any part of its item URLs is committed.
+        self.databaser.mark_list_url_done(data.list_url)
+
+    def _store_failed_url(self, failed_url):
+        super()._store_failed_url(failed_url)
+
+        if failed_url.is_list_url:
+            # The failed list URL won't be requested again.
+            self.databaser.mark_list_url_done(failed_url.url)
+
+    def get_item_urls(self):
+        self.register()
+
+        # Item URLs found by a previous run (e.g. one which crashed) may be
+        # unknown to the frontier.
+        self.databaser.merge_shards()
+        self.databaser.restore_item_urls()
+
+        super().get_item_urls()
+
+        # Process list URLs leased again as the scraper they were leased to
+        # died (or stalled) meanwhile.
+        while controller_client.wait_for_list_urls():
+            super().get_item_urls()
+
+        # All item URLs found by this scraper are stored by now.
+        self.databaser.finish_item_urls_discovery()
+
+    def get_item_properties(self):
+        self.register()
+
+        super().get_item_properties()
+
+        # Process item URLs leased again as the scraper they were leased to
+        # died meanwhile.
+        while self.databaser.wait_for_item_urls():
+            super().get_item_properties()
+
+        self.finish()
+
+    def get_item_urls_and_properties(self):
+        self.register()
+
+        if self.databaser.use_frontier:
+            # NOTE: item URLs are sent to the frontier rather than streamed,
+            # hence they are leased from it once discovered.
+            self.get_item_urls()
+            self.get_item_properties()
+            return
+
+        super().get_item_urls_and_properties()
+
+        # See `get_item_urls`.
+        while controller_client.wait_for_list_urls():
+            super().get_item_urls_and_properties()
+
+        self.databaser.finish_item_urls_discovery()
+
+        self.finish()
+
+    def register(self):
+        """Register the scraper to the controller (unless it's registered
+        already) and keep reporting it's alive till it's finished.
+        """
+        if self.heartbeat is not None:
+            return
+
+        self.heartbeat = controller_client.Heartbeat(socket.gethostname())
+        self.heartbeat.start()
+
+    def finish(self):
+        """Let the controller know the scraper is done (unless it isn't
+        registered).
+
+        NOTE: it isn't called if the scraper failed, the controller finds it
+        dead and lets the others finish its work.
+        """
+        if self.heartbeat is None:
+            return
+
+        self.heartbeat.stop()
+        self.heartbeat = None
@@ -0,0 +1,191 @@
+"""
+Retrying failed requests with a backoff.
+"""
+
+
+from collections import namedtuple
+import heapq
+import logging
+from multiprocessing import Value
+import random
+import threading
+import time
+
+from scrapemeagain.config import Config
+
+
+# An URL which wasn't retried any more, passed on to be stored in the DB.
+FailedUrl = namedtuple(
+    "FailedUrl", ["url", "status_code", "attempts", "is_list_url"]
+)
+
+
+def get_retry_after(response):
+    """Get how long the server asked to wait before the next request.
+
+    :argument response:
+    :type response: request.response
+
+    :returns float or None if not set (or not set in seconds)
+    """
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class Retrier:
+    def __init__(self, requeue, scheduled_count=None):
+        """Decide whether and when to request a failed URL again.
+
+        Each URL may be retried as many times as the policy for the status
+        code it failed with allows. Retried URLs are requeued by a daemon
+        thread only after an exponential backoff (with jitter) elapses, so
+        the other URLs are requested meanwhile.
+
+        :argument requeue: function putting an URL back to be requested
+        :type requeue: function
+        :argument scheduled_count: shared counter of URLs waiting to be
+        requeued, readable from other processes
+        :type scheduled_count: multiprocessing.Value
+        """
+        self.requeue = requeue
+
+        self.max_retries = Config.RETRY_MAX_RETRIES
+        self.policies = Config.RETRY_POLICIES
+        self.backoff = Config.RETRY_BACKOFF
+        self.max_backoff = Config.RETRY_MAX_BACKOFF
+
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+        self._thread = None
+        self._scheduled = []
+        self._schedule_sequence = 0
+        self._condition = threading.Condition()
+
+        if scheduled_count is None:
+            scheduled_count = Value("i", 0)
+        self._scheduled_count = scheduled_count
+
+    def get_max_retries(self, status_code):
+        """Get how many times an URL failed with the status code may be
+        retried.
+
+        :argument status_code:
+        :type status_code: int
+
+        :returns int
+        """
+        return self.policies.get(status_code, self.max_retries)
+
+    def _get_backoff(self, attempt):
+        """Get how long to wait before the next attempt to request an URL.
+
+        NOTE: a half of the delay is random so URLs which failed together
+        aren't retried all at once.
+
+        :argument attempt: number of failed attempts so far
+        :type attempt: int
+
+        :returns float
+        """
+        delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def retry(self, url, status_code, retry_after=None):
+        """Schedule a failed URL to be requested again, if allowed.
+
+        :argument url:
+        :type url: str
+        :argument status_code: status code the URL failed with
+        :type status_code: int
+        :argument retry_after: how long the server asked to wait (in seconds)
+        :type retry_after: float
+
+        :returns bool flag if the URL will be retried
+        """
+        with self._lock:
+            attempts = self._attempts.get(url, 0) + 1
+            self._attempts[url] = attempts
+
+        if attempts > self.get_max_retries(status_code):
+            logging.error(
+                'Giving up "{0}" after {1} attempts (status {2})'.format(
+                    url, attempts, status_code
+                )
+            )
+            return False
+
+        delay = self._get_backoff(attempts)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_backoff))
+
+        self._schedule(url, delay)
+        return True
+
+    def forget(self, url):
+        """Stop tracking attempts of an URL.
+
+        :argument url:
+        :type url: str
+
+        :returns int number of failed attempts
+        """
+        with self._lock:
+            return self._attempts.pop(url, 0)
+
+    def _schedule(self, url, delay):
+        """Requeue an URL once the delay elapses.
+
+        :argument url:
+        :type url: str
+        :argument delay: (in seconds)
+        :type delay: float
+        """
+        with self._condition:
+            # NOTE: the counter keeps URLs due at the same time in order.
+            self._schedule_sequence += 1
+            heapq.heappush(
+                self._scheduled,
+                (time.monotonic() + delay, self._schedule_sequence, url),
+            )
+            self._condition.notify()
+
+            with self._scheduled_count.get_lock():
+                self._scheduled_count.value += 1
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._requeue_due, daemon=True
+                )
+                self._thread.start()
+
+    def _requeue_due(self):
+        """Requeue scheduled URLs as they become due."""
+        while True:
+            with self._condition:
+                while True:
+                    timeout = None
+                    if self._scheduled:
+                        timeout = self._scheduled[0][0] - time.monotonic()
+                        if timeout <= 0:
+                            break
+
+                    self._condition.wait(timeout)
+
+                url = heapq.heappop(self._scheduled)[2]
+
+                with self._scheduled_count.get_lock():
+                    self._scheduled_count.value -= 1
+
+            self.requeue(url)
+
+    @property
+    def scheduled_count(self):
+        """Number of URLs waiting to be requeued.
+
+        NOTE: it's kept in a shared counter, so it's safe to read in a forked
+        process (which has only a stale copy of the schedule).
+        """
+        return self._scheduled_count.value
@@ -1,7 +1,7 @@
 """SQLAlchemy common database tables definition."""
 
 
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Boolean, Column, Index, Integer, String
 from sqlalchemy.ext.declarative import declarative_base
 
 
@@ -13,11 +13,41 @@ class ItemUrlsTable(Base):
 
     __tablename__ = "item_urls"
 
+    # Item URL statuses.
+    # NOTE: processed item URLs are only marked as done, which is cheaper
+    # than deleting them.
+    PENDING = 0
+    DONE = 1
+
     id = Column(Integer, primary_key=True)
-    url = Column(String)
+    url = Column(String, index=True, unique=True)
+    status = Column(
+        Integer, default=PENDING, server_default=str(PENDING), nullable=False
+    )
+
+    # Pending item URLs are read in batches ordered by ID.
+    __table_args__ = (Index("ix_item_urls_status_id", "status", "id"),)
 
     def __repr__(self):
         """Nice ItemUrlsTable row representation."""
-        return "<Item URL (id={id}, url={url})>".format(
-            id=self.id, url=self.url
+        return "<Item URL (id={id}, url={url}, status={status})>".format(
+            id=self.id, url=self.url, status=self.status
+        )
+
+
+class FailedUrlsTable(Base):
+    """URLs which failed to be requested even after retrying."""
+
+    __tablename__ = "failed_urls"
+
+    id = Column(Integer, primary_key=True)
+    url = Column(String)
+    status_code = Column(Integer)
+    attempts = Column(Integer)
+    is_list_url = Column(Boolean)
+
+    def __repr__(self):
+        """Nice FailedUrlsTable row representation."""
+        return "<Failed URL (id={id}, url={url}, status_code={code})>".format(
+            id=self.id, url=self.url, code=self.status_code
         )
@@ -49,7 +49,7 @@ class BaseScraper(object):
         """Get item URLs from a given list page.
 
         :argument response: list page
-        :type response: `requests.Response`
+        :type response: `scrapemeagain.utils.http.ResponseRecord`
 
         :returns
         """
@@ -60,7 +60,7 @@ class BaseScraper(object):
         """Get item properties.
 
         :argument response:
-        :type response: `requests.Response`
+        :type response: `scrapemeagain.utils.http.ResponseRecord`
 
         :returns dict
         """
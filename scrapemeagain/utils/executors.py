@@ -0,0 +1,85 @@
+"""Custom `concurrent.futures` executors."""
+
+
+import asyncio
+from concurrent.futures import Executor
+import threading
+
+from scrapemeagain.utils.http import close_async_sessions
+
+
+class AsyncioExecutor(Executor):
+    def __init__(self, max_workers):
+        """Run coroutine functions on an event loop in a background thread.
+
+        A drop-in replacement for `ThreadPoolExecutor` when the submitted
+        callables are coroutine functions: `submit` and `map` return/yield
+        ordinary `concurrent.futures.Future` results, but a single thread
+        serves all requests and at most `max_workers` coroutines are awaited
+        at the same time.
+
+        :argument max_workers: maximum number of concurrently run coroutines
+        :type max_workers: int
+        """
+        self._max_workers = max_workers
+        self._shutdown = False
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, daemon=True)
+        self._thread.start()
+
+        # NOTE: the semaphore has to be created inside the running loop.
+        self._semaphore = asyncio.run_coroutine_threadsafe(
+            self._create_semaphore(), self._loop
+        ).result()
+
+    def _run_loop(self):
+        """Run the event loop until the executor is shut down."""
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_forever()
+        finally:
+            self._loop.close()
+
+    async def _create_semaphore(self):
+        return asyncio.Semaphore(self._max_workers)
+
+    async def _run_limited(self, fn, args, kwargs):
+        """Await the coroutine function once there is a free slot."""
+        async with self._semaphore:
+            return await fn(*args, **kwargs)
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule `fn(*args, **kwargs)` to be awaited on the event loop.
+
+        :argument fn: coroutine function
+        :type fn: function
+
+        :returns `concurrent.futures.Future` instance
+        """
+        if self._shutdown:
+            raise RuntimeError("cannot schedule new futures after shutdown")
+
+        return asyncio.run_coroutine_threadsafe(
+            self._run_limited(fn, args, kwargs), self._loop
+        )
+
+    async def _stop_loop(self):
+        """Close HTTP sessions bound to the event loop and stop it."""
+        try:
+            await close_async_sessions()
+        finally:
+            self._loop.stop()
+
+    def shutdown(self, wait=True):
+        """Stop the event loop.
+
+        :argument wait: flag to wait till the loop thread is finished
+        :type wait: bool
+        """
+        if not self._shutdown:
+            self._shutdown = True
+            asyncio.run_coroutine_threadsafe(self._stop_loop(), self._loop)
+
+        if wait:
+            self._thread.join()
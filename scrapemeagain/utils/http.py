@@ -1,16 +1,179 @@
 """Common HTTP functions."""
 
 
+import asyncio
+from contextlib import contextmanager
+from datetime import timedelta
 import logging
 from random import sample
+import threading
+import time
 
 import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
 
 from scrapemeagain.config import Config
 
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
 
 RESPONSE_LOG_MESSAGE = "{status} - {url}"
 
+# `requests.Session` instances, one per thread.
+_sessions = threading.local()
+
+# `aiohttp.ClientSession` instances, one per event loop.
+_async_sessions = {}
+
+# Number of requests in flight by `aiohttp.ClientSession`.
+_async_requests = {}
+
+# Outdated `aiohttp.ClientSession` instances waiting to be closed, by event
+# loop.
+_closing_async_sessions = {}
+
+# How often to check if an outdated `aiohttp.ClientSession` can be closed
+# (in seconds).
+ASYNC_SESSION_CLOSE_INTERVAL = 0.1
+
+# Sessions created before the last `reset_sessions` call are replaced.
+_sessions_generation = 0
+
+
+class ResponseRecord:
+    __slots__ = ("url", "status_code", "encoding", "content", "headers")
+
+    def __init__(
+        self, url, status_code, content=b"", encoding=None, headers=None
+    ):
+        """A compact `requests.Response` stand-in.
+
+        Holds only what scraping a page needs and hence is cheap to pass
+        between processes. Any other `requests.Response` attribute is
+        provided by an equivalent `requests.Response` built on demand.
+
+        :argument url:
+        :type url: str
+        :argument status_code:
+        :type status_code: int
+        :argument content: response body
+        :type content: bytes
+        :argument encoding:
+        :type encoding: str
+        :argument headers: selected response headers
+        :type headers: dict
+        """
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding
+        self.headers = CaseInsensitiveDict(headers)
+
+    @classmethod
+    def from_response(cls, response):
+        """Create a record from a `requests.Response`.
+
+        Only headers listed in `Config.RESPONSE_HEADERS` are kept.
+
+        :argument response:
+        :type response: `requests.Response`
+
+        :returns `ResponseRecord` instance
+        """
+        headers = {
+            header: response.headers[header]
+            for header in Config.RESPONSE_HEADERS
+            if header in response.headers
+        }
+
+        return cls(
+            response.url,
+            response.status_code,
+            response.content,
+            response.encoding,
+            headers,
+        )
+
+    def to_response(self):
+        """Create an equivalent `requests.Response`.
+
+        :returns `requests.Response` instance
+        """
+        response = requests.Response()
+        response.url = self.url
+        response.status_code = self.status_code
+        response.encoding = self.encoding
+        response.headers = CaseInsensitiveDict(self.headers)
+        response._content = self.content
+
+        return response
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.to_response().text
+
+    def json(self, **kwargs):
+        return self.to_response().json(**kwargs)
+
+    def __getattr__(self, name):
+        # NOTE: don't delegate special and not yet set attributes (e.g. while
+        # unpickling).
+        if name.startswith("__") or any(
+            name in getattr(cls, "__slots__", ()) for cls in type(self).__mro__
+        ):
+            raise AttributeError(name)
+
+        return getattr(self.to_response(), name)
+
+    def __repr__(self):
+        return "<ResponseRecord [{0}] {1}>".format(self.status_code, self.url)
+
+
+def reset_sessions():
+    """Make all threads and event loops use new sessions (i.e. new
+    connections) from now on, e.g. after IP has changed.
+
+    NOTE: Tor uses the new circuit (IP) only for new connections.
+    """
+    global _sessions_generation
+    _sessions_generation += 1
+
+
+def _get_session():
+    """Get a `requests.Session` keeping connections alive for the current
+    thread.
+
+    :returns `requests.Session` instance
+    """
+    session = getattr(_sessions, "session", None)
+    if session is not None and _sessions.generation == _sessions_generation:
+        return session
+
+    if session is not None:
+        session.close()
+
+    adapter = HTTPAdapter(
+        pool_connections=Config.HTTP_POOL_SIZE,
+        pool_maxsize=Config.HTTP_POOL_SIZE,
+    )
+
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    _sessions.session = session
+    _sessions.generation = _sessions_generation
+
+    return session
+
 
 def get(url, **kwargs):
     """GET data from provided URL.
@@ -32,7 +195,10 @@ def get(url, **kwargs):
     kwargs["headers"] = {"User-Agent": user_agent}
 
     try:
-        response = requests.get(url, **kwargs)
+        if Config.HTTP_KEEP_ALIVE:
+            response = _get_session().get(url, **kwargs)
+        else:
+            response = requests.get(url, **kwargs)
 
         logging.debug(
             RESPONSE_LOG_MESSAGE.format(status=response.status_code, url=url)
@@ -45,21 +211,180 @@ def get(url, **kwargs):
             response.url = url
     except Exception as exc:
         # Don't fail on any exception and setup a fake response instead.
-        response = requests.Response()
-        response.url = url
+        timed_out = isinstance(exc, requests.exceptions.Timeout)
+        response = _get_failed_response(url, exc, timed_out)
 
-        if isinstance(exc, requests.exceptions.Timeout):
-            response.status_code = 408
-        else:
-            response.status_code = 503
+    return response
+
+
+def _get_failed_response(url, exc, timed_out):
+    """Setup a fake response for a failed request.
+
+    :argument url:
+    :type url: str
+    :argument exc: exception the request failed with
+    :type exc: Exception
+    :argument timed_out: flag marking the request timed out
+    :type timed_out: bool
+
+    :returns `requests.Response` instance
+    """
+    response = requests.Response()
+    response.url = url
+    response.status_code = 408 if timed_out else 503
+
+    error_message = RESPONSE_LOG_MESSAGE.format(
+        status=response.status_code, url=url
+    )
 
-        error_message = RESPONSE_LOG_MESSAGE.format(
-            status=response.status_code, url=url
+    try:
+        error_message += " - {}".format(str(exc))
+    finally:
+        logging.error(error_message)
+
+    return response
+
+
+def _get_async_session():
+    """Get an `aiohttp.ClientSession` bound to the running event loop.
+
+    :returns `aiohttp.ClientSession` instance
+    """
+    if aiohttp is None:
+        raise RuntimeError('The "asyncio" fetch engine requires aiohttp')
+
+    loop = asyncio.get_event_loop()
+
+    session, generation = _async_sessions.get(loop, (None, None))
+    if (
+        session is not None
+        and not session.closed
+        and generation == _sessions_generation
+    ):
+        return session
+
+    if session is not None and not session.closed:
+        # NOTE: requests fired by the outdated session may be still running.
+        _closing_async_sessions.setdefault(loop, set()).add(session)
+        loop.create_task(_close_async_session(session))
+
+    # NOTE: the number of concurrent requests is limited by the executor
+    # running `async_get`, hence the connector itself is unlimited.
+    connector = aiohttp.TCPConnector(
+        limit=0, ssl=False, force_close=not Config.HTTP_KEEP_ALIVE
+    )
+    session = aiohttp.ClientSession(connector=connector)
+    _async_sessions[loop] = (session, _sessions_generation)
+
+    return session
+
+
+async def _close_async_session(session):
+    """Close an outdated `aiohttp.ClientSession` once all requests it fired
+    are finished, but at most after `Config.REQUEST_TIMEOUT` seconds (when
+    they time out anyway).
+
+    :argument session:
+    :type session: `aiohttp.ClientSession`
+    """
+    closing_at = time.monotonic() + Config.REQUEST_TIMEOUT
+
+    while _async_requests.get(session) and time.monotonic() < closing_at:
+        await asyncio.sleep(ASYNC_SESSION_CLOSE_INTERVAL)
+
+    loop = asyncio.get_event_loop()
+    _closing_async_sessions.get(loop, set()).discard(session)
+
+    await session.close()
+
+
+async def close_async_sessions():
+    """Close `aiohttp.ClientSession` instances bound to the running event
+    loop, e.g. before the loop is stopped.
+    """
+    loop = asyncio.get_event_loop()
+
+    session, _ = _async_sessions.pop(loop, (None, None))
+    sessions = _closing_async_sessions.pop(loop, set())
+    if session is not None:
+        sessions.add(session)
+
+    for session in sessions:
+        await session.close()
+
+
+@contextmanager
+def _track_async_request(session):
+    """Count a request in flight fired by the given session.
+
+    :argument session:
+    :type session: `aiohttp.ClientSession`
+    """
+    _async_requests[session] = _async_requests.get(session, 0) + 1
+
+    try:
+        yield
+    finally:
+        _async_requests[session] -= 1
+        if not _async_requests[session]:
+            del _async_requests[session]
+
+
+async def async_get(url, **kwargs):
+    """Asynchronously GET data from provided URL.
+
+    A coroutine counterpart of `get` meant to run on an event loop, e.g. one
+    driven by `scrapemeagain.utils.executors.AsyncioExecutor`.
+
+    :argument url:
+    :type url: str
+
+    :returns `requests.Response` instance
+    """
+    # NOTE: fails right away if aiohttp isn't installed.
+    session = _get_async_session()
+
+    if Config.LOCAL_HTTP_PROXY:
+        kwargs["proxy"] = "http://{}".format(Config.LOCAL_HTTP_PROXY)
+
+    kwargs["timeout"] = aiohttp.ClientTimeout(total=Config.REQUEST_TIMEOUT)
+
+    user_agent = sample(Config.USER_AGENTS, 1)[0]
+    kwargs["headers"] = {"User-Agent": user_agent}
+
+    try:
+        started_at = time.monotonic()
+
+        with _track_async_request(session):
+            async with session.get(url, **kwargs) as aiohttp_response:
+                elapsed = time.monotonic() - started_at
+                content = await aiohttp_response.read()
+
+        logging.debug(
+            RESPONSE_LOG_MESSAGE.format(
+                status=aiohttp_response.status, url=url
+            )
         )
 
-        try:
-            error_message += " - {}".format(str(exc))
-        finally:
-            logging.error(error_message)
+        # Provide a `requests.Response` so the rest of the pipeline (and
+        # scrapers) don't have to care which engine fired the request.
+        response = requests.Response()
+        response.url = url
+        response.status_code = aiohttp_response.status
+        response.reason = aiohttp_response.reason
+        response.headers = CaseInsensitiveDict(aiohttp_response.headers)
+        response.encoding = aiohttp_response.charset
+        response.elapsed = timedelta(seconds=elapsed)
+        response._content = content
+
+        # NOTE: keep the actually requested URL (see `get`).
+        if url != str(aiohttp_response.url):
+            logging.warning(
+                "Requested {0} got {1}".format(url, aiohttp_response.url)
+            )
+    except Exception as exc:
+        # Don't fail on any exception and setup a fake response instead.
+        timed_out = isinstance(exc, asyncio.TimeoutError)
+        response = _get_failed_response(url, exc, timed_out)
 
     return response
@@ -0,0 +1,75 @@
+"""Helpers for queues between pipeline stages."""
+
+
+from multiprocessing import Condition, Value
+
+
+class ByteBudget:
+    def __init__(self, max_bytes):
+        """Limit the total size of data buffered in a queue.
+
+        A producer acquires the size of an item before putting it to the
+        queue (and waits while the budget is exhausted), a consumer releases
+        it after taking the item from the queue.
+
+        :argument max_bytes: budget size (in bytes)
+        :type max_bytes: int
+        """
+        self.max_bytes = max_bytes
+
+        self.condition = Condition()
+        self.used_bytes = Value("q", 0, lock=False)
+
+    def acquire(self, size):
+        """Wait till `size` bytes fit into the budget and take them.
+
+        NOTE: an item larger than the whole budget is let through once the
+        budget is unused, otherwise it would wait forever.
+
+        :argument size: item size (in bytes)
+        :type size: int
+        """
+        with self.condition:
+            while (
+                self.used_bytes.value
+                and self.used_bytes.value + size > self.max_bytes
+            ):
+                self.condition.wait()
+
+            self.used_bytes.value += size
+
+    def release(self, size):
+        """Return `size` bytes to the budget.
+
+        :argument size: item size (in bytes)
+        :type size: int
+        """
+        with self.condition:
+            self.used_bytes.value -= size
+            self.condition.notify_all()
+
+
+def get_body_size(response):
+    """Get size of a response body waiting in a queue.
+
+    :argument response: an item put to 'response_queue'
+    :type response: `ResponseRecord` or any other object
+
+    :returns int
+    """
+    content = getattr(response, "content", None)
+    return len(content) if content else 0
+
+
+def get_queue_size(queue):
+    """Get the approximate number of items in a queue.
+
+    :argument queue:
+    :type queue: `multiprocessing.Queue`
+
+    :returns int or None if the platform doesn't support it
+    """
+    try:
+        return queue.qsize()
+    except NotImplementedError:
+        return None
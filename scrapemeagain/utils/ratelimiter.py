@@ -0,0 +1,144 @@
+"""Request rate limiting."""
+
+
+import asyncio
+from functools import wraps
+import threading
+import time
+from urllib.parse import urlparse
+
+
+# `RateLimiter` limits key for hosts without a limit of their own.
+ANY_HOST = "*"
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        """Token bucket allowing `rate` requests per second on average and
+        at most `burst` requests at once.
+
+        :argument rate: requests per second
+        :type rate: float
+        :argument burst: bucket capacity
+        :type burst: int
+        """
+        self.rate = rate
+        self.burst = burst
+
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token, possibly one which isn't available yet.
+
+        :returns float how long to wait till the token is available (in
+        seconds)
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated_at) * self.rate
+            )
+            self.updated_at = now
+
+            # NOTE: tokens go negative, i.e. reserved requests are queued
+            # and each of them waits for its own token.
+            self.tokens -= 1
+            return max(0, -self.tokens / self.rate)
+
+
+class RateLimiter:
+    def __init__(self, limits):
+        """Limit request rates per host and per exit IP.
+
+        Each host has a separate `TokenBucket` for each exit IP, so once IP
+        changes requests may be fired at the full rate again.
+
+        :argument limits: host (or `ANY_HOST`) -> (rate, burst)
+        :type limits: dict
+        """
+        self.limits = limits
+
+        self._ip = None
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _get_bucket(self, host, ip):
+        """Get token bucket of the host for the exit IP.
+
+        :argument host:
+        :type host: str
+        :argument ip: current exit IP
+        :type ip: str
+
+        :returns `TokenBucket` or None if the host isn't limited
+        """
+        limit = self.limits.get(host, self.limits.get(ANY_HOST))
+        if limit is None:
+            return None
+
+        with self._lock:
+            if ip != self._ip:
+                # Buckets of a previous IP aren't needed any more.
+                self._ip = ip
+                self._buckets = {}
+
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(*limit)
+
+            return self._buckets[host]
+
+    def reserve(self, url, ip=None):
+        """Reserve a request to the URL.
+
+        :argument url:
+        :type url: str
+        :argument ip: current exit IP
+        :type ip: str
+
+        :returns float how long to wait before firing the request (in
+        seconds)
+        """
+        bucket = self._get_bucket(urlparse(url).hostname, ip)
+        if bucket is None:
+            return 0
+
+        return bucket.reserve()
+
+
+def rate_limited(fetch, rate_limiter, get_ip):
+    """Make the fetch function wait till the rate limiter allows a request.
+
+    Only the request itself waits, other requests are fired meanwhile.
+
+    :argument fetch: function (or coroutine function) requesting an URL
+    :type fetch: function
+    :argument rate_limiter:
+    :type rate_limiter: `RateLimiter`
+    :argument get_ip: function returning the current exit IP
+    :type get_ip: function
+
+    :returns function (or coroutine function)
+    """
+    if asyncio.iscoroutinefunction(fetch):
+
+        @wraps(fetch)
+        async def limited_fetch(url):
+            delay = rate_limiter.reserve(url, get_ip())
+            if delay:
+                await asyncio.sleep(delay)
+
+            return await fetch(url)
+
+    else:
+
+        @wraps(fetch)
+        def limited_fetch(url):
+            delay = rate_limiter.reserve(url, get_ip())
+            if delay:
+                time.sleep(delay)
+
+            return fetch(url)
+
+    return limited_fetch
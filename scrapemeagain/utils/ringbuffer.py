@@ -0,0 +1,120 @@
+"""Shared memory transport for response bodies."""
+
+
+import atexit
+from multiprocessing import Queue
+
+from scrapemeagain.utils.http import ResponseRecord
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # pragma: no cover
+    shared_memory = None
+
+
+class BufferedResponseRecord(ResponseRecord):
+    """A `ResponseRecord` whose content lives in a `SharedMemoryRingBuffer`.
+
+    Only the location of the content (a slot and the content length) is
+    pickled when passing the record to another process.
+    """
+
+    __slots__ = ("slot", "length")
+
+
+class SharedMemoryRingBuffer:
+    def __init__(self, slots_count, slot_size):
+        """Ring buffer of fixed size slots in shared memory.
+
+        A writer takes a free slot (or waits till there is one), copies
+        a response body into it and passes on only a small record with the
+        slot number. A reader reads the body via `memoryview` and immediately
+        frees the slot for writers.
+
+        NOTE: must be created before worker processes are started.
+
+        :argument slots_count: number of slots
+        :type slots_count: int
+        :argument slot_size: size of a slot (in bytes)
+        :type slot_size: int
+        """
+        if shared_memory is None:
+            raise RuntimeError(
+                'The "shared_memory" response transport requires Python 3.8+'
+            )
+
+        self.slots_count = slots_count
+        self.slot_size = slot_size
+
+        self.memory = shared_memory.SharedMemory(
+            create=True, size=slots_count * slot_size
+        )
+        atexit.register(self.unlink)
+
+        self.free_slots = Queue()
+        for slot in range(slots_count):
+            self.free_slots.put(slot)
+
+    def _get_slot_view(self, slot, length):
+        start = slot * self.slot_size
+        return self.memory.buf[start : start + length]  # noqa
+
+    def pack(self, record):
+        """Move record content to a free slot.
+
+        :argument record:
+        :type record: `ResponseRecord`
+
+        :returns `BufferedResponseRecord` or the given record if its content
+        doesn't fit into a slot
+        """
+        length = len(record.content)
+        if length > self.slot_size:
+            return record
+
+        slot = self.free_slots.get()
+        self._get_slot_view(slot, length)[:] = record.content
+
+        buffered_record = BufferedResponseRecord(
+            record.url,
+            record.status_code,
+            None,
+            record.encoding,
+            record.headers,
+        )
+        buffered_record.slot = slot
+        buffered_record.length = length
+
+        return buffered_record
+
+    def unpack(self, record):
+        """Read record content from its slot and free the slot.
+
+        :argument record: a record taken from 'response_queue'
+        :type record: `BufferedResponseRecord` or any other object
+
+        :returns `ResponseRecord` or the given object if not buffered
+        """
+        if not isinstance(record, BufferedResponseRecord):
+            return record
+
+        try:
+            content = bytes(self._get_slot_view(record.slot, record.length))
+        finally:
+            self.free_slots.put(record.slot)
+
+        return ResponseRecord(
+            record.url,
+            record.status_code,
+            content,
+            record.encoding,
+            record.headers,
+        )
+
+    def unlink(self):
+        """Release the shared memory block."""
+        try:
+            self.memory.close()
+            self.memory.unlink()
+        except FileNotFoundError:
+            pass
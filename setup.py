@@ -31,6 +31,7 @@ setup(
     platforms="linux",
     python_requires=">=3.6",
     install_requires=requirements,
+    extras_require={"asyncio": ["aiohttp"], "waitress": ["waitress"]},
     tests_require=requirements,
     classifiers=[
         "Development Status :: 5 - Production/Stable",
@@ -1,7 +1,8 @@
 from unittest import TestCase
-from unittest.mock import Mock
+from unittest.mock import MagicMock, Mock
 
 from scrapemeagain.pipeline import Pipeline
+from scrapemeagain.utils.http import get
 
 
 class TestPipelineBase(TestCase):
@@ -17,7 +18,7 @@ class TestPipelineBase(TestCase):
         # Mock Databaser.
         self.pipeline.databaser.insert = Mock()
         self.pipeline.databaser.insert_multiple = Mock()
-        self.pipeline.databaser.delete_url = Mock()
+        self.pipeline.databaser.mark_url_done = Mock()
         self.pipeline.databaser.commit = Mock()
 
         #
@@ -26,24 +27,28 @@ class TestPipelineBase(TestCase):
         mock_pool = Mock()
         mock_pool.return_value.map = Mock()
         self.pipeline.pool = mock_pool
+        self.pipeline.fetch = get
+        self.pipeline.concurrency = None
 
         # Ensure each pipeline's Queue is an unique Mock object.
         self.pipeline.url_queue = Mock()
+        self.pipeline.retrier = Mock()
         self.pipeline.response_queue = Mock()
         self.pipeline.data_queue = Mock()
-
-        # Ensure each pipeline's Event is an unique Mock object.
-        self.pipeline.producing_urls_in_progress = Mock()
-        self.pipeline.requesting_in_progress = Mock()
-        self.pipeline.scraping_in_progress = Mock()
+        self.pipeline.data_queues = [self.pipeline.data_queue]
+        self.pipeline.response_bytes = None
+        self.pipeline.response_buffer = None
 
         # Mock counter Values.
-        mock_urls_to_process = Mock()
+        mock_urls_to_process = MagicMock()
         mock_urls_to_process.value = 0
         self.pipeline.urls_to_process = mock_urls_to_process
-        mock_urls_processed = Mock()
+        mock_urls_processed = MagicMock()
         mock_urls_processed.value = 0
         self.pipeline.urls_processed = mock_urls_processed
-
-        # Mock URLs bucket state.
-        self.pipeline.urls_bucket_empty = Mock()
+        mock_urls_in_flight = MagicMock()
+        mock_urls_in_flight.value = 0
+        self.pipeline.urls_in_flight = mock_urls_in_flight
+        mock_urls_to_retry = MagicMock()
+        mock_urls_to_retry.value = 0
+        self.pipeline.urls_to_retry = mock_urls_to_retry
@@ -0,0 +1,98 @@
+from datetime import timedelta
+import threading
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from scrapemeagain.concurrency import ConcurrencyController
+
+
+def create_response(status_code=200, latency=0.1):
+    return Mock(status_code=status_code, elapsed=timedelta(seconds=latency))
+
+
+class TestConcurrencyController(TestCase):
+    def setUp(self):
+        self.controller = ConcurrencyController(2, 4)
+        self.controller.decrease = 0.5
+        self.controller.max_latency = 1
+
+    @patch("scrapemeagain.concurrency.logging")
+    def test_update_increase(self, mock_logging):
+        """Test the limit grows by one after each window of healthy
+        responses, up to the max limit.
+        """
+        for _ in range(2):
+            self.controller.update(create_response())
+        self.assertEqual(self.controller.limit, 3)
+
+        for _ in range(3):
+            self.controller.update(create_response())
+        self.assertEqual(self.controller.limit, 4)
+
+        for _ in range(10):
+            self.controller.update(create_response())
+        self.assertEqual(self.controller.limit, 4)
+
+        mock_logging.info.assert_any_call("Concurrency limit 2 -> 3 (healthy)")
+
+    @patch("scrapemeagain.concurrency.logging")
+    def test_update_decrease(self, mock_logging):
+        """Test the limit is cut on overload, once per window."""
+        self.controller.limit = 4
+        self.controller._responses_since_cut = 4
+
+        self.controller.update(create_response(503))
+        self.assertEqual(self.controller.limit, 2)
+        mock_logging.info.assert_called_once_with(
+            "Concurrency limit 4 -> 2 (status 503)"
+        )
+
+        # Responses to requests fired before the cut don't cut it again.
+        self.controller.limit = 3
+        self.controller.update(create_response(429))
+        self.assertEqual(self.controller.limit, 3)
+
+    @patch("scrapemeagain.concurrency.logging")
+    def test_update_decrease_latency(self, mock_logging):
+        """Test the limit is cut on slow responses, but not below the min
+        limit.
+        """
+        self.controller.limit = 3
+        self.controller._responses_since_cut = 3
+
+        self.controller.update(create_response(latency=2))
+        self.assertEqual(self.controller.limit, 2)
+        mock_logging.info.assert_called_once_with(
+            "Concurrency limit 3 -> 2 (latency 2.00s)"
+        )
+
+    @patch("scrapemeagain.concurrency.logging")
+    def test_update_server_error(self, mock_logging):
+        """Test other server errors neither cut nor raise the limit."""
+        for _ in range(5):
+            self.controller.update(create_response(500))
+
+        self.assertEqual(self.controller.limit, 2)
+        mock_logging.info.assert_not_called()
+
+    @patch("scrapemeagain.concurrency.logging")
+    def test_acquire_release(self, mock_logging):
+        """Test 'acquire' waits while the limit is reached and a raised limit
+        lets more requests through.
+        """
+        self.controller.acquire()
+        self.controller.acquire()
+
+        request = threading.Thread(target=self.controller.acquire)
+        request.start()
+        request.join(0.1)
+        self.assertTrue(request.is_alive())
+
+        for _ in range(2):
+            self.controller.update(create_response())
+        request.join(1)
+        self.assertFalse(request.is_alive())
+        self.assertEqual(self.controller.in_flight, 3)
+
+        self.controller.release()
+        self.assertEqual(self.controller.in_flight, 2)
@@ -0,0 +1,288 @@
+import threading
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+from requests import ConnectionError
+
+from scrapemeagain.dockerized.controller import client
+from scrapemeagain.dockerized.controller.client import DataBuffer, Heartbeat
+
+
+class TestPostWithRetries(TestCase):
+    @patch("scrapemeagain.dockerized.controller.client.time.sleep")
+    @patch("scrapemeagain.dockerized.controller.client.post")
+    def test_post_with_retries(self, mock_post, mock_sleep):
+        """Test a failed POST is retried with an exponential backoff."""
+        mock_post.side_effect = [ConnectionError, ConnectionError, mock_post]
+
+        client._post_with_retries("url", [{"key": "value"}])
+
+        self.assertEqual(mock_post.call_count, 3)
+        mock_post.assert_called_with("url", json=[{"key": "value"}])
+        self.assertEqual(
+            [c[0][0] for c in mock_sleep.call_args_list],
+            [
+                client.Config.DATASTORE_BACKOFF,
+                client.Config.DATASTORE_BACKOFF * 2,
+            ],
+        )
+
+    @patch("scrapemeagain.dockerized.controller.client.time.sleep")
+    @patch("scrapemeagain.dockerized.controller.client.post")
+    def test_post_with_retries_gives_up(self, mock_post, mock_sleep):
+        """Test the last failure is raised once out of attempts."""
+        mock_post.side_effect = ConnectionError
+
+        with self.assertRaises(ConnectionError):
+            client._post_with_retries("url", [])
+
+        self.assertEqual(
+            mock_post.call_count, client.Config.DATASTORE_MAX_ATTEMPTS
+        )
+
+
+@patch(
+    "scrapemeagain.dockerized.controller.client.socket.gethostname",
+    return_value="scraper1",
+)
+class TestListUrlsLeases(TestCase):
+    @patch("scrapemeagain.dockerized.controller.client.time.sleep")
+    @patch("scrapemeagain.dockerized.controller.client.post")
+    def test_lease_list_urls_range(
+        self, mock_post, mock_sleep, mock_gethostname
+    ):
+        """Test leasing waits while all chunks are leased by others."""
+        mock_post.return_value.json.side_effect = [
+            {"lease": None, "finished": False, "retry_after": 2},
+            {"lease": 3, "start": 10, "end": 0},
+            {"lease": None, "finished": True, "retry_after": 0},
+        ]
+
+        self.assertEqual(client.lease_list_urls_range(), (3, 10, 0))
+        mock_sleep.assert_called_once_with(2)
+        mock_post.assert_called_with(
+            client._build_url("list-urls-lease"), json={"scraper": "scraper1"}
+        )
+
+        self.assertIsNone(client.lease_list_urls_range())
+
+    @patch("scrapemeagain.dockerized.controller.client.delete")
+    @patch("scrapemeagain.dockerized.controller.client.lease_list_urls_range")
+    def test_lease_list_urls_ranges(
+        self, mock_lease, mock_delete, mock_gethostname
+    ):
+        """Test ranges are leased till all are leased, but not released."""
+        mock_lease.side_effect = [(1, 20, 10), (2, 10, 0), None]
+
+        self.assertEqual(
+            list(client.lease_list_urls_ranges()), [(1, 20, 10), (2, 10, 0)]
+        )
+        mock_delete.assert_not_called()
+
+    @patch("scrapemeagain.dockerized.controller.client.put")
+    def test_assign_list_urls(self, mock_put, mock_gethostname):
+        client.assign_list_urls(1, ["url1", "url2"])
+
+        mock_put.assert_called_once_with(
+            client._build_url("list-urls-lease", 1), json=["url1", "url2"]
+        )
+
+    @patch("scrapemeagain.dockerized.controller.client._post_with_retries")
+    def test_release_list_urls(self, mock_post_with_retries, mock_gethostname):
+        client.release_list_urls(["url1"])
+
+        mock_post_with_retries.assert_called_once_with(
+            client._build_url("list-urls/done"), ["url1"]
+        )
+
+    @patch("scrapemeagain.dockerized.controller.client.time.sleep")
+    @patch("scrapemeagain.dockerized.controller.client.get")
+    def test_wait_for_list_urls(self, mock_get, mock_sleep, mock_gethostname):
+        """Test waiting till list URLs are leased again or all released."""
+        mock_get.return_value.json.side_effect = [
+            {"pending": 0, "released": False},
+            {"pending": 1, "released": False},
+            {"pending": 0, "released": True},
+        ]
+
+        self.assertTrue(client.wait_for_list_urls())
+        mock_sleep.assert_called_once_with(
+            client.Config.URLS_LEASE_POLL_INTERVAL
+        )
+
+        self.assertFalse(client.wait_for_list_urls())
+
+
+class TestItemUrlsLeases(TestCase):
+    @patch(
+        "scrapemeagain.dockerized.controller.client.socket.gethostname",
+        return_value="scraper1",
+    )
+    @patch("scrapemeagain.dockerized.controller.client.time.sleep")
+    @patch("scrapemeagain.dockerized.controller.client.post")
+    def test_lease_item_urls(self, mock_post, mock_sleep, mock_gethostname):
+        """Test item URLs are leased in batches till all are processed."""
+        mock_post.return_value.json.side_effect = [
+            {"lease": 1, "urls": ["url1", "url2"]},
+            {"lease": None, "finished": False, "retry_after": 2},
+            {"lease": 2, "urls": ["url3"]},
+            {"lease": None, "finished": True, "retry_after": 0},
+        ]
+
+        self.assertEqual(
+            list(client.lease_item_urls(2)), [["url1", "url2"], ["url3"]]
+        )
+        mock_post.assert_called_with(
+            client._build_url("item-urls-lease"),
+            json={"size": 2, "scraper": "scraper1"},
+        )
+        mock_sleep.assert_called_once_with(2)
+
+    @patch("scrapemeagain.dockerized.controller.client.time.sleep")
+    @patch("scrapemeagain.dockerized.controller.client.get")
+    def test_wait_for_item_urls(self, mock_get, mock_sleep):
+        """Test waiting till item URLs are leased again or all released."""
+        mock_get.return_value.json.side_effect = [
+            {"pending": 0, "released": False},
+            {"pending": 3, "released": False},
+            {"pending": 0, "released": True},
+        ]
+
+        self.assertTrue(client.wait_for_item_urls())
+        mock_sleep.assert_called_once_with(
+            client.Config.URLS_LEASE_POLL_INTERVAL
+        )
+
+        self.assertFalse(client.wait_for_item_urls())
+
+
+class TestScrapers(TestCase):
+    @patch("scrapemeagain.dockerized.controller.client.get")
+    def test_wait_for_scrapers(self, mock_get):
+        """Test waiting till all scrapers are finished."""
+        status = {"running": [], "done": ["scraper1"], "dead": ["scraper2"]}
+        mock_get.return_value.json.side_effect = [
+            dict(status, finished=False),
+            dict(status, finished=True),
+        ]
+
+        self.assertEqual(
+            client.wait_for_scrapers(), dict(status, finished=True)
+        )
+        mock_get.assert_called_with(
+            client._build_url("scrapers"),
+            params={"timeout": client.Config.SCRAPER_HEARTBEAT_TIMEOUT},
+        )
+
+    @patch("scrapemeagain.dockerized.controller.client.finish_scraper")
+    @patch("scrapemeagain.dockerized.controller.client.send_heartbeat")
+    @patch("scrapemeagain.dockerized.controller.client.register_scraper")
+    def test_heartbeat(
+        self, mock_register_scraper, mock_send_heartbeat, mock_finish_scraper
+    ):
+        """Test heartbeats are sent from registering till finishing."""
+        heartbeat = Heartbeat("scraper1")
+        heartbeat.interval = 0.01
+
+        sent = threading.Event()
+
+        def send_heartbeat(scraper):
+            # NOTE: a failed heartbeat doesn't stop the next ones.
+            if mock_send_heartbeat.call_count == 1:
+                raise ConnectionError
+
+            sent.set()
+
+        mock_send_heartbeat.side_effect = send_heartbeat
+
+        heartbeat.start()
+        mock_register_scraper.assert_called_once_with("scraper1")
+        self.assertTrue(sent.wait(1))
+
+        heartbeat.stop()
+        mock_finish_scraper.assert_called_once_with("scraper1")
+
+        call_count = mock_send_heartbeat.call_count
+        time.sleep(0.05)
+        self.assertEqual(mock_send_heartbeat.call_count, call_count)
+
+
+@patch("scrapemeagain.dockerized.controller.client.insert_multiple_data")
+class TestDataBuffer(TestCase):
+    def setUp(self):
+        self.buffer = DataBuffer()
+        self.buffer.items_max = 2
+        self.buffer.flush_interval = 1
+
+    def test_flush_on_size(self, mock_insert_multiple_data):
+        """Test items are sent once the buffer is full."""
+        self.buffer.add({"url": "url1"})
+        mock_insert_multiple_data.assert_not_called()
+
+        self.buffer.add({"url": "url2"})
+        mock_insert_multiple_data.assert_called_once()
+        self.assertEqual(
+            mock_insert_multiple_data.call_args[0][0],
+            [{"url": "url1"}, {"url": "url2"}],
+        )
+        self.assertEqual(self.buffer.items, [])
+        self.assertEqual(self.buffer.batches, [])
+
+    @patch("scrapemeagain.dockerized.controller.client.time.monotonic")
+    def test_flush_due(self, mock_monotonic, mock_insert_multiple_data):
+        """Test a flush is due once the oldest item is old enough."""
+        mock_monotonic.return_value = 10
+        self.assertFalse(self.buffer.is_flush_due())
+
+        self.buffer.add({"url": "url1"})
+        self.assertFalse(self.buffer.is_flush_due())
+
+        mock_monotonic.return_value = 11
+        self.assertTrue(self.buffer.is_flush_due())
+
+    @patch("scrapemeagain.dockerized.controller.client.time.monotonic")
+    def test_flush_failed(self, mock_monotonic, mock_insert_multiple_data):
+        """Test a batch is kept, and sent again with the same batch ID, if
+        sending it fails, but not right away.
+        """
+        mock_monotonic.return_value = 10
+        mock_insert_multiple_data.side_effect = ConnectionError
+        self.buffer.add({"url": "url1"})
+
+        with self.assertRaises(ConnectionError):
+            self.buffer.flush()
+        self.assertEqual(self.buffer.items, [])
+        self.assertFalse(self.buffer.is_flush_due())
+
+        mock_monotonic.return_value = 11
+        self.assertTrue(self.buffer.is_flush_due())
+        batch_id = mock_insert_multiple_data.call_args[0][1]
+
+        mock_insert_multiple_data.side_effect = None
+        mock_insert_multiple_data.reset_mock()
+        self.buffer.add({"url": "url2"})
+        self.buffer.flush()
+
+        self.assertEqual(mock_insert_multiple_data.call_count, 2)
+        self.assertEqual(
+            mock_insert_multiple_data.call_args_list[0][0],
+            ([{"url": "url1"}], batch_id),
+        )
+        items, other_batch_id = mock_insert_multiple_data.call_args[0]
+        self.assertEqual(items, [{"url": "url2"}])
+        self.assertNotEqual(other_batch_id, batch_id)
+        self.assertEqual(self.buffer.batches, [])
+        self.assertFalse(self.buffer.is_flush_due())
+
+
+class TestInsertMultipleData(TestCase):
+    @patch("scrapemeagain.dockerized.controller.client._post_with_retries")
+    def test_insert_multiple_data(self, mock_post_with_retries):
+        """Test items are sent along with their batch ID."""
+        client.insert_multiple_data([{"url": "url1"}], "batch1")
+
+        mock_post_with_retries.assert_called_once_with(
+            client._build_url("datastore/insert-multiple-data"),
+            {"batch": "batch1", "items": [{"url": "url1"}]},
+        )
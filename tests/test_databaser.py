@@ -0,0 +1,546 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from sqlalchemy import Column, Integer, String, text
+
+from requests import ConnectionError
+
+from scrapemeagain.databaser import Databaser, DockerizedDatabaser
+from scrapemeagain.scrapers.basemodel import Base, ItemUrlsTable
+
+
+class ItemDataTable(Base):
+    __tablename__ = "item_data"
+
+    id = Column(Integer, primary_key=True)
+    url = Column(String)
+    title = Column(String, default="untitled")
+
+
+class TestDatabaser(TestCase):
+    def setUp(self):
+        self.data_directory = tempfile.mkdtemp()
+        self.config_patcher = patch(
+            "scrapemeagain.databaser.Config.DATA_DIRECTORY",
+            self.data_directory,
+        )
+        self.config_patcher.start()
+
+        self.databaser = Databaser("test", ItemDataTable)
+
+    def tearDown(self):
+        self.databaser.session.close()
+        self.databaser.engine.dispose()
+        self.config_patcher.stop()
+        shutil.rmtree(self.data_directory)
+
+    def insert_item_urls(self, urls):
+        self.databaser.insert_item_urls([{"url": url} for url in urls])
+        self.databaser.commit()
+
+    def test_sqlite_pragmas(self):
+        """Test SQLite settings are applied to each DB connection."""
+        with self.databaser.engine.connect() as connection:
+            self.assertEqual(
+                connection.execute(text("PRAGMA journal_mode")).scalar(),
+                "wal",
+            )
+            self.assertEqual(
+                connection.execute(text("PRAGMA busy_timeout")).scalar(),
+                30000,
+            )
+
+    def test_reader_doesnt_block_writer(self):
+        """Test data can be committed while item URLs are being read."""
+        self.insert_item_urls(["url1", "url2"])
+
+        reader = self.databaser.engine.raw_connection()
+        try:
+            # NOTE: an unfinished SELECT holds a read lock.
+            cursor = reader.cursor()
+            cursor.execute("SELECT url FROM item_urls")
+            cursor.fetchone()
+
+            self.databaser.pending_rows_max = 1
+            self.databaser.mark_url_done("url1")
+            self.databaser.commit()
+        finally:
+            reader.close()
+
+        self.assertEqual(len(list(self.databaser.get_item_urls())), 1)
+
+    def test_insert_batches(self):
+        """Test rows are inserted once a batch is full or on commit."""
+        self.databaser.pending_rows_max = 2
+        table = self.databaser.item_data_table
+
+        self.databaser.insert({"url": "url1"}, table)
+        self.assertEqual(self.databaser.session.query(table).count(), 0)
+
+        self.databaser.insert({"url": "url2"}, table)
+        self.assertEqual(self.databaser.session.query(table).count(), 2)
+
+        self.databaser.insert({"url": "url3"}, table)
+        self.databaser.commit()
+        self.assertEqual(self.databaser.session.query(table).count(), 3)
+
+    def test_commit_transaction_size(self):
+        """Test a transaction is committed once it has too many items."""
+        self.databaser.transaction_items_max = 2
+        table = self.databaser.item_data_table
+
+        self.databaser.insert({"url": "url1"}, table)
+        self.databaser.insert({"url": "url2"}, table)
+        self.assertEqual(self.databaser.transaction_items, 2)
+
+        self.databaser.insert({"url": "url3"}, table)
+        self.assertEqual(self.databaser.transaction_items, 0)
+        self.assertIsNone(self.databaser.transaction_started_at)
+
+        with self.databaser.engine.connect() as connection:
+            self.assertEqual(
+                connection.execute(
+                    text("SELECT COUNT(*) FROM item_data")
+                ).scalar(),
+                3,
+            )
+
+    @patch("scrapemeagain.databaser.time.monotonic")
+    def test_commit_transaction_timeout(self, mock_monotonic):
+        """Test a transaction is committed once it's too old."""
+        self.databaser.transaction_timeout = 1
+        table = self.databaser.item_data_table
+
+        mock_monotonic.return_value = 10
+        self.assertFalse(self.databaser.is_commit_due())
+
+        self.databaser.insert({"url": "url1"}, table)
+        self.assertEqual(self.databaser.transaction_started_at, 10)
+
+        mock_monotonic.return_value = 10.5
+        self.databaser.mark_url_done("url1")
+        self.assertEqual(self.databaser.transaction_items, 2)
+
+        # Even without new items.
+        mock_monotonic.return_value = 11
+        self.databaser.commit_if_due()
+        self.assertEqual(self.databaser.transaction_items, 0)
+        self.assertEqual(self.databaser.session.query(table).count(), 1)
+
+    @patch("scrapemeagain.databaser.logging")
+    def test_commit_failed(self, mock_logging):
+        """Test a failed (rolled back) transaction isn't committed again."""
+        table = self.databaser.item_data_table
+        self.databaser.insert({"url": "url1"}, table)
+
+        with patch.object(
+            self.databaser.session, "commit", side_effect=ValueError
+        ):
+            self.assertFalse(self.databaser.commit())
+
+        mock_logging.exception.assert_called_once()
+        self.assertEqual(self.databaser.transaction_items, 0)
+        self.assertIsNone(self.databaser.transaction_started_at)
+        self.assertFalse(self.databaser.is_commit_due())
+
+        self.databaser.insert({"url": "url2"}, table)
+        self.assertTrue(self.databaser.commit())
+        self.assertEqual(
+            [row.url for row in self.databaser.session.query(table)], ["url2"]
+        )
+
+    def test_insert_different_columns(self):
+        """Test rows with different columns get column defaults."""
+        table = self.databaser.item_data_table
+
+        self.databaser.insert_multiple(
+            [{"url": "url1"}, {"url": "url2", "title": "Post 2"}], table
+        )
+        self.databaser.commit()
+
+        self.assertEqual(
+            [
+                (row.url, row.title)
+                for row in self.databaser.session.query(table).order_by(
+                    table.id
+                )
+            ],
+            [("url1", "untitled"), ("url2", "Post 2")],
+        )
+
+    def test_insert_item_urls(self):
+        """Test 'insert_item_urls' skips stored item URLs."""
+        self.insert_item_urls(["url1"])
+
+        inserted = self.databaser.insert_item_urls(
+            [{"url": "url1"}, {"url": "url2"}, {"url": "url2"}]
+        )
+        self.databaser.commit()
+
+        self.assertEqual(inserted, [{"url": "url2"}])
+        self.assertEqual(
+            self.databaser.session.query(ItemUrlsTable).count(), 2
+        )
+
+    def test_iter_item_urls(self):
+        """Test 'iter_item_urls' reads pending item URLs newest first, batch
+        by batch.
+        """
+        self.insert_item_urls(["url1", "url2", "url3", "url4", "url5"])
+        self.databaser.mark_url_done("url4")
+        self.databaser.commit()
+
+        urls = list(self.databaser.iter_item_urls(2))
+
+        self.assertEqual(urls, ["url5", "url3", "url2", "url1"])
+
+    def test_mark_url_done(self):
+        """Test a processed item URL isn't pending any more."""
+        self.insert_item_urls(["url1", "url2"])
+
+        self.databaser.mark_url_done("url1")
+        self.databaser.commit()
+
+        self.assertEqual(
+            [row.url for row in self.databaser.get_item_urls()], ["url2"]
+        )
+
+    def test_delete_url(self):
+        """Test 'delete_url' marks an item URL as done rather than deleting
+        it, so it isn't stored again.
+        """
+        self.insert_item_urls(["url1", "url2"])
+
+        self.databaser.delete_url("url1")
+        self.databaser.commit()
+        self.insert_item_urls(["url1"])
+
+        self.assertEqual(
+            [row.url for row in self.databaser.get_item_urls()], ["url2"]
+        )
+
+    def test_mark_url_done_batches(self):
+        """Test item URLs are marked as done once a batch is full or on
+        commit.
+        """
+        self.databaser.pending_rows_max = 2
+        self.insert_item_urls(["url1", "url2", "url3"])
+
+        self.databaser.mark_url_done("url1")
+        self.assertEqual(len(list(self.databaser.get_item_urls())), 3)
+
+        self.databaser.mark_url_done("url2")
+        self.assertEqual(len(list(self.databaser.get_item_urls())), 1)
+
+        self.databaser.mark_url_done("url3")
+        self.databaser.commit()
+        self.assertEqual(len(list(self.databaser.get_item_urls())), 0)
+
+    def test_migrate_item_urls_table(self):
+        """Test an item URLs table without statuses (and with duplicates) is
+        migrated.
+        """
+        with self.databaser.engine.begin() as connection:
+            connection.execute(text("DROP TABLE item_urls"))
+            connection.execute(
+                text(
+                    "CREATE TABLE item_urls "
+                    "(id INTEGER PRIMARY KEY, url VARCHAR)"
+                )
+            )
+            for url in ("url1", "url2", "url1", "url1"):
+                connection.execute(
+                    text("INSERT INTO item_urls (url) VALUES (:url)"),
+                    {"url": url},
+                )
+
+        self.databaser.create_tables()
+
+        self.assertEqual(
+            list(self.databaser.iter_item_urls(10)), ["url2", "url1"]
+        )
+        self.assertEqual(
+            [row.id for row in self.databaser.session.query(ItemUrlsTable)],
+            [1, 2],
+        )
+
+        with self.databaser.engine.connect() as connection:
+            indexes = {
+                row[1]: row[2]
+                for row in connection.execute(
+                    text("PRAGMA index_list(item_urls)")
+                )
+            }
+        self.assertIn("ix_item_urls_status_id", indexes)
+        self.assertEqual(indexes["ix_item_urls_url"], 1)
+
+    def test_migrate_item_urls_table_keeps_done(self):
+        """Test a duplicate item URL stays done if any of it's copies is."""
+        with self.databaser.engine.begin() as connection:
+            connection.execute(text("DROP INDEX ix_item_urls_url"))
+            connection.execute(
+                text("CREATE INDEX ix_item_urls_url ON item_urls (url)")
+            )
+            connection.execute(
+                text(
+                    "INSERT INTO item_urls (url, status) "
+                    "VALUES ('url1', 0), ('url1', 1)"
+                )
+            )
+
+        self.databaser.create_tables()
+
+        self.assertEqual(list(self.databaser.iter_item_urls(10)), [])
+        self.assertEqual(
+            self.databaser.session.query(ItemUrlsTable).count(), 1
+        )
+
+    def test_insert_failed_url(self):
+        """Test an URL which failed again is kept only once, also if it
+        failed twice since the last flush.
+        """
+        self.databaser.insert_failed_url("url1", 503, 6, False)
+        self.databaser.insert_failed_url("url1", 410, 1, False)
+        self.databaser.commit()
+
+        self.assertEqual(
+            [
+                (row.url, row.status_code)
+                for row in self.databaser.get_failed_urls()
+            ],
+            [("url1", 410)],
+        )
+
+    def test_redrive_failed_urls(self):
+        """Test failed item URLs are pending again after a redrive."""
+        self.insert_item_urls(["url1"])
+        self.databaser.mark_url_done("url1")
+        self.databaser.insert_failed_url("url1", 503, 6, False)
+        self.databaser.insert_failed_url("url2", 410, 1, False)
+        self.databaser.insert_failed_url("list1", 503, 6, True)
+        self.databaser.commit()
+
+        self.assertEqual(self.databaser.redrive_failed_urls(), 2)
+
+        self.assertEqual(
+            sorted(self.databaser.iter_item_urls(10)), ["url1", "url2"]
+        )
+        self.assertEqual(
+            [row.url for row in self.databaser.get_failed_urls()], ["list1"]
+        )
+        self.assertEqual(
+            self.databaser.session.query(ItemUrlsTable).count(), 2
+        )
+
+    def test_merge_shards(self):
+        """Test shards are merged into the main DB and removed."""
+        self.insert_item_urls(["url1", "url2"])
+        self.databaser.insert_failed_url("url2", 503, 6, False)
+        self.databaser.commit()
+
+        shard = self.databaser.get_shard(0)
+        shard.insert({"url": "url1"}, shard.item_data_table)
+        shard.mark_url_done("url1")
+        shard.insert_failed_url("url2", 410, 1, False)
+        shard.mark_url_done("url2")
+        shard.commit()
+        shard.close()
+
+        shard = self.databaser.get_shard(1)
+        shard.insert_item_urls([{"url": "url3"}])
+        shard.commit()
+        shard.close()
+
+        self.assertEqual(len(self.databaser.get_shard_paths()), 2)
+        self.assertEqual(self.databaser.merge_shards(), 2)
+        self.assertEqual(self.databaser.get_shard_paths(), [])
+        self.assertEqual(self.databaser.merge_shards(), 0)
+
+        self.assertEqual(
+            [
+                row.url
+                for row in self.databaser.session.query(
+                    self.databaser.item_data_table
+                )
+            ],
+            ["url1"],
+        )
+        self.assertEqual(list(self.databaser.iter_item_urls(10)), ["url3"])
+        self.assertEqual(
+            [
+                (row.url, row.status_code)
+                for row in self.databaser.get_failed_urls()
+            ],
+            [("url2", 410)],
+        )
+
+    def test_get_shard_paths(self):
+        """Test only shards are taken for shards, not other DBs named alike."""
+        other_databaser = Databaser("test_2024", ItemDataTable)
+        self.addCleanup(other_databaser.close)
+
+        shard = self.databaser.get_shard(0)
+        shard.close()
+
+        self.assertEqual(
+            self.databaser.get_shard_paths(),
+            [os.path.join(self.data_directory, "test_0.shard")],
+        )
+        self.assertEqual(self.databaser.merge_shards(), 1)
+        self.assertTrue(os.path.exists(other_databaser.get_db_path()))
+
+
+@patch("scrapemeagain.databaser.controller_client")
+class TestDockerizedDatabaser(TestCase):
+    def setUp(self):
+        self.data_directory = tempfile.mkdtemp()
+        self.config_patcher = patch(
+            "scrapemeagain.databaser.Config.DATA_DIRECTORY",
+            self.data_directory,
+        )
+        self.config_patcher.start()
+
+    def tearDown(self):
+        self.config_patcher.stop()
+        shutil.rmtree(self.data_directory)
+
+    def get_databaser(self, use_frontier=False):
+        databaser = DockerizedDatabaser("test")
+        self.addCleanup(databaser.close)
+
+        databaser.use_frontier = False
+        databaser.insert_item_urls([{"url": "url1"}])
+        databaser.commit()
+
+        databaser.use_frontier = use_frontier
+        return databaser
+
+    def test_commit(self, mock_controller_client):
+        """Test item data is sent and committed remotely before item URLs are
+        marked as done locally.
+        """
+        databaser = self.get_databaser()
+
+        databaser.insert({"url": "url1"}, None)
+        databaser.data_buffer.add.assert_called_once_with({"url": "url1"})
+        databaser.mark_url_done("url1")
+        databaser.commit()
+
+        databaser.data_buffer.flush.assert_called_with()
+        mock_controller_client.commit.assert_called_with()
+        self.assertEqual(list(databaser.iter_item_urls(10)), [])
+
+    def test_commit_failed(self, mock_controller_client):
+        """Test item URLs aren't marked as done if sending data fails and the
+        commit isn't due again right away.
+        """
+        databaser = self.get_databaser()
+        databaser.data_buffer.flush.side_effect = ConnectionError
+        mock_controller_client.commit.reset_mock()
+
+        databaser.mark_url_done("url1")
+        self.assertFalse(databaser.commit())
+
+        mock_controller_client.commit.assert_not_called()
+        self.assertEqual(databaser.transaction_items, 0)
+        self.assertIsNone(databaser.transaction_started_at)
+        # NOTE: see `DataBuffer.is_flush_due` for failed batches.
+        databaser.data_buffer.is_flush_due.return_value = False
+        self.assertFalse(databaser.is_commit_due())
+        self.assertEqual(list(databaser.iter_item_urls(10)), ["url1"])
+
+    def test_list_urls_released(self, mock_controller_client):
+        """Test list URLs are released only once their item URLs are
+        committed.
+        """
+        databaser = self.get_databaser()
+
+        databaser.insert_item_urls([{"url": "url2"}])
+        databaser.mark_list_url_done("list1")
+        mock_controller_client.release_list_urls.assert_not_called()
+
+        # A failed commit keeps the list URLs leased.
+        databaser.data_buffer.flush.side_effect = ConnectionError
+        self.assertFalse(databaser.commit())
+        mock_controller_client.release_list_urls.assert_not_called()
+
+        # A failed release is tried again with the next commit.
+        databaser.data_buffer.flush.side_effect = None
+        mock_controller_client.release_list_urls.side_effect = ConnectionError
+        self.assertTrue(databaser.commit())
+        self.assertEqual(databaser.done_list_urls, ["list1"])
+
+        mock_controller_client.release_list_urls.side_effect = None
+        self.assertTrue(databaser.commit())
+        mock_controller_client.release_list_urls.assert_called_with(["list1"])
+        self.assertEqual(databaser.done_list_urls, [])
+
+    @patch("scrapemeagain.databaser.Config.ITEM_URLS_BATCH_SIZE", 2)
+    def test_restore_item_urls(self, mock_controller_client):
+        """Test pending local item URLs are added to the frontier again."""
+        databaser = self.get_databaser(use_frontier=True)
+        databaser.insert_item_urls([{"url": "url2"}, {"url": "url3"}])
+        databaser.mark_url_done("url3")
+        databaser.insert_item_urls([{"url": "url4"}])
+        databaser.commit()
+        mock_controller_client.add_item_urls.reset_mock()
+
+        databaser.restore_item_urls()
+
+        self.assertEqual(
+            mock_controller_client.add_item_urls.call_args_list,
+            [((["url4", "url2"],),), ((["url1"],),)],
+        )
+
+        mock_controller_client.add_item_urls.reset_mock()
+        databaser.use_frontier = False
+        databaser.restore_item_urls()
+        mock_controller_client.add_item_urls.assert_not_called()
+
+    def test_commit_due(self, mock_controller_client):
+        """Test a commit is due once buffered item data should be sent."""
+        databaser = self.get_databaser()
+
+        databaser.data_buffer.is_flush_due.return_value = False
+        self.assertFalse(databaser.is_commit_due())
+
+        databaser.data_buffer.is_flush_due.return_value = True
+        self.assertTrue(databaser.is_commit_due())
+
+    def test_item_urls_frontier(self, mock_controller_client):
+        """Test item URLs are added to and leased from the frontier, and
+        released once their data is committed.
+        """
+        databaser = self.get_databaser(use_frontier=True)
+        mock_controller_client.lease_item_urls.return_value = iter(
+            [["url2", "url3"], ["url4"]]
+        )
+
+        self.assertEqual(databaser.insert_item_urls([{"url": "url2"}]), [])
+        mock_controller_client.add_item_urls.assert_called_once_with(["url2"])
+
+        self.assertEqual(
+            list(databaser.iter_item_urls(2)), ["url2", "url3", "url4"]
+        )
+        mock_controller_client.lease_item_urls.assert_called_once_with(2)
+
+        databaser.mark_url_done("url2")
+        mock_controller_client.release_item_urls.assert_not_called()
+        databaser.commit()
+        mock_controller_client.release_item_urls.assert_called_once_with(
+            ["url2"]
+        )
+        self.assertEqual(databaser.done_item_urls, [])
+
+        # Item URLs are kept locally too, processed ones are marked as done.
+        self.assertEqual(list(databaser.get_item_urls()), [("url1",)])
+
+        # Item URLs leased again are leased from the frontier too.
+        mock_controller_client.wait_for_item_urls.return_value = True
+        self.assertTrue(databaser.wait_for_item_urls())
+
+        databaser.use_frontier = False
+        self.assertFalse(databaser.wait_for_item_urls())
@@ -0,0 +1,98 @@
+import threading
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from scrapemeagain.dockerized.controller.datastore import DatastoreWriter
+
+
+class TestDatastoreWriter(TestCase):
+    def setUp(self):
+        self.databaser = Mock()
+        self.writer = DatastoreWriter(self.databaser)
+
+    def test_write(self):
+        """Test queued data is stored in order and committed."""
+        self.writer.insert({"url": "url1"})
+        self.writer.insert_multiple(
+            [{"url": "url2"}, {"url": "url3"}], "batch1"
+        )
+        self.writer.commit()
+
+        self.assertEqual(
+            self.databaser.method_calls[:3],
+            [
+                ("insert", ({"url": "url1"},), {}),
+                ("insert_multiple", ([{"url": "url2"}, {"url": "url3"}],), {}),
+                ("commit", (), {}),
+            ],
+        )
+
+    @patch("scrapemeagain.dockerized.controller.datastore.logging")
+    def test_write_batch_once(self, mock_logging):
+        """Test a batch sent again is stored only once."""
+        self.writer.insert_multiple([{"url": "url1"}], "batch1")
+        self.writer.insert_multiple([{"url": "url1"}], "batch1")
+        self.writer.insert_multiple([{"url": "url2"}], "batch2")
+        self.writer.commit()
+
+        self.assertEqual(
+            self.databaser.insert_multiple.call_args_list,
+            [(([{"url": "url1"}],),), (([{"url": "url2"}],),)],
+        )
+        mock_logging.warning.assert_called_once()
+
+    @patch("scrapemeagain.dockerized.controller.datastore.logging")
+    def test_write_batch_failed(self, mock_logging):
+        """Test a batch which failed to be stored can be sent again."""
+        self.databaser.insert_multiple.side_effect = [ValueError, None]
+
+        self.writer.insert_multiple([{"url": "url1"}], "batch1")
+        self.writer.insert_multiple([{"url": "url1"}], "batch1")
+        self.writer.commit()
+
+        self.assertEqual(self.databaser.insert_multiple.call_count, 2)
+
+    def test_write_single_thread(self):
+        """Test data sent from many threads is stored by the writer thread."""
+        threads = set()
+        self.databaser.insert.side_effect = lambda data: threads.add(
+            threading.current_thread()
+        )
+
+        senders = [
+            threading.Thread(target=self.writer.insert, args=({},))
+            for _ in range(10)
+        ]
+        for sender in senders:
+            sender.start()
+        for sender in senders:
+            sender.join()
+        self.writer.commit()
+
+        self.assertEqual(self.databaser.insert.call_count, 10)
+        self.assertEqual(threads, {self.writer._thread})
+
+    @patch("scrapemeagain.dockerized.controller.datastore.logging")
+    def test_write_failed(self, mock_logging):
+        """Test a failed insert doesn't stop the writer."""
+        self.databaser.insert.side_effect = ValueError
+
+        self.writer.insert({"url": "url1"})
+        self.writer.commit()
+
+        mock_logging.exception.assert_called_once()
+        self.databaser.commit.assert_called_once_with()
+
+    @patch(
+        "scrapemeagain.dockerized.controller.datastore.Config."
+        "TRANSACTION_TIMEOUT",
+        0.01,
+    )
+    def test_commit_while_idle(self):
+        """Test the writer checks whether to commit also while idle."""
+        called = threading.Event()
+        self.databaser.commit_if_due.side_effect = lambda: called.set()
+
+        DatastoreWriter(self.databaser)
+
+        self.assertTrue(called.wait(1))
@@ -0,0 +1,52 @@
+import asyncio
+from unittest import skipIf, TestCase
+
+from scrapemeagain.utils import http
+from scrapemeagain.utils.executors import AsyncioExecutor
+
+
+async def double(number):
+    await asyncio.sleep(0)
+    return number * 2
+
+
+class TestAsyncioExecutor(TestCase):
+    def setUp(self):
+        self.executor = AsyncioExecutor(2)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_submit(self):
+        """Test 'submit' awaits a coroutine function on the event loop."""
+        future = self.executor.submit(double, 21)
+
+        self.assertEqual(future.result(timeout=1), 42)
+
+    def test_map(self):
+        """Test 'map' yields results in the order of given arguments."""
+        results = self.executor.map(double, range(10), timeout=1)
+
+        self.assertEqual(list(results), [i * 2 for i in range(10)])
+
+    def test_submit_after_shutdown(self):
+        """Test 'submit' fails once the executor is shut down."""
+        self.executor.shutdown()
+
+        with self.assertRaises(RuntimeError):
+            self.executor.submit(double, 1)
+
+    @skipIf(http.aiohttp is None, "requires aiohttp")
+    def test_shutdown_closes_sessions(self):
+        """Test HTTP sessions bound to the event loop are closed."""
+
+        async def get_session():
+            return http._get_async_session()
+
+        session = self.executor.submit(get_session).result(timeout=1)
+        self.assertFalse(session.closed)
+
+        self.executor.shutdown()
+
+        self.assertTrue(session.closed)
+        self.assertNotIn(self.executor._loop, http._async_sessions)
@@ -0,0 +1,75 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from scrapemeagain.dockerized.controller.frontier import ItemUrlsFrontier
+
+
+class TestItemUrlsFrontier(TestCase):
+    def setUp(self):
+        self.frontier = ItemUrlsFrontier()
+        self.frontier.scrapers_count = 2
+        self.frontier.lease_timeout = 60
+
+    def test_add(self):
+        """Test each item URL is added only once."""
+        self.assertEqual(
+            self.frontier.add(["url1", "url2", "url1"]), ["url1", "url2"]
+        )
+        self.assertEqual(self.frontier.add(["url2", "url3"]), ["url3"])
+        self.assertEqual(self.frontier.pending_count, 3)
+
+    def test_lease(self):
+        """Test item URLs are leased in batches till all are found."""
+        self.frontier.add(["url1", "url2", "url3"])
+
+        self.assertEqual(self.frontier.lease(2), (1, ["url1", "url2"]))
+        self.assertEqual(self.frontier.lease(2), (2, ["url3"]))
+        self.assertEqual(self.frontier.lease(2), (None, []))
+
+        self.assertFalse(self.frontier.all_urls_leased)
+
+        # More item URLs may come till all scrapers are done finding them.
+        self.frontier.finish_discovery("scraper1")
+        self.frontier.finish_discovery("scraper1")
+        self.assertFalse(self.frontier.all_urls_leased)
+        self.frontier.finish_discovery("scraper2")
+        self.assertTrue(self.frontier.all_urls_leased)
+        self.assertFalse(self.frontier.all_urls_released)
+
+        self.frontier.release(["url1", "url2", "url3"])
+        self.assertTrue(self.frontier.all_urls_released)
+
+    @patch("scrapemeagain.dockerized.controller.frontier.time.monotonic")
+    def test_lease_expired(self, mock_monotonic):
+        """Test unreleased item URLs are leased again once a lease expires."""
+        self.frontier.add(["url1", "url2", "url3", "url4"])
+
+        mock_monotonic.return_value = 100
+        self.frontier.lease(2)
+        self.frontier.lease(1)
+        self.frontier.release(["url1"])
+
+        mock_monotonic.return_value = 160
+        self.assertEqual(
+            self.frontier.lease(10), (3, ["url2", "url3", "url4"])
+        )
+
+        # Releasing an item URL from an expired lease releases it anyway.
+        self.frontier.release(["url2", "url3", "url4"])
+        self.assertEqual(self.frontier._leases, {})
+
+    def test_expire_leases(self):
+        """Test item URLs leased to a scraper are leased again right away."""
+        self.frontier.add(["url1", "url2", "url3"])
+        self.frontier.lease(2, "scraper1")
+        self.frontier.lease(2, "scraper2")
+
+        self.frontier.expire_leases("scraper1")
+
+        self.assertEqual(self.frontier.pending_count, 2)
+        self.assertEqual(
+            self.frontier.lease(2, "scraper2"), (3, ["url1", "url2"])
+        )
+        self.assertEqual(
+            self.frontier._lease_owners, {2: "scraper2", 3: "scraper2"}
+        )
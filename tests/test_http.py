@@ -0,0 +1,264 @@
+import asyncio
+import pickle
+import threading
+from unittest import skipIf, TestCase
+from unittest.mock import patch
+
+from requests import Response
+
+from scrapemeagain.utils import http
+from scrapemeagain.utils.http import (
+    _get_async_session,
+    _get_session,
+    async_get,
+    get,
+    reset_sessions,
+    ResponseRecord,
+)
+
+try:
+    from aiohttp import web
+    from aiohttp.test_utils import TestServer
+except ImportError:  # pragma: no cover
+    web = None
+
+
+def create_response():
+    response = Response()
+    response.url = "http://localhost:9090/posts/1"
+    response.status_code = 200
+    response.encoding = "utf-8"
+    response.headers["Content-Type"] = "application/json"
+    response.headers["Set-Cookie"] = "a=b"
+    response._content = b'{"title": "Post 1"}'
+
+    return response
+
+
+class TestResponseRecord(TestCase):
+    @patch("scrapemeagain.utils.http.Config")
+    def test_from_response(self, mock_config):
+        """Test 'from_response' keeps only what scraping needs."""
+        mock_config.RESPONSE_HEADERS = ("Content-Type", "Last-Modified")
+        response = create_response()
+
+        record = ResponseRecord.from_response(response)
+
+        self.assertEqual(record.url, response.url)
+        self.assertEqual(record.status_code, 200)
+        self.assertEqual(record.encoding, "utf-8")
+        self.assertEqual(record.content, response.content)
+        self.assertEqual(
+            dict(record.headers), {"Content-Type": "application/json"}
+        )
+
+    def test_behaves_like_response(self):
+        """Test a record can be used instead of a `requests.Response`."""
+        record = ResponseRecord.from_response(create_response())
+
+        self.assertTrue(record.ok)
+        self.assertEqual(record.text, '{"title": "Post 1"}')
+        self.assertEqual(record.json(), {"title": "Post 1"})
+        self.assertEqual(record.headers["content-type"], "application/json")
+        # Provided by an equivalent `requests.Response`.
+        self.assertEqual(record.apparent_encoding, "ascii")
+        record.raise_for_status()
+
+    def test_not_ok(self):
+        """Test 'ok' matches `requests.Response.ok`."""
+        record = ResponseRecord("url1", 404)
+
+        self.assertFalse(record.ok)
+
+    def test_pickle(self):
+        """Test a record survives being passed between processes."""
+        record = ResponseRecord.from_response(create_response())
+
+        unpickled = pickle.loads(pickle.dumps(record))
+
+        self.assertEqual(unpickled.url, record.url)
+        self.assertEqual(unpickled.content, record.content)
+        self.assertEqual(dict(unpickled.headers), dict(record.headers))
+
+
+class TestSessions(TestCase):
+    def test_get_session(self):
+        """Test each thread reuses it's own session."""
+        session = _get_session()
+        self.assertIs(_get_session(), session)
+
+        other_sessions = []
+        thread = threading.Thread(
+            target=lambda: other_sessions.append(_get_session())
+        )
+        thread.start()
+        thread.join()
+
+        self.assertIsNot(other_sessions[0], session)
+
+    def test_reset_sessions(self):
+        """Test sessions are replaced after a reset."""
+        session = _get_session()
+
+        reset_sessions()
+
+        self.assertIsNot(_get_session(), session)
+
+    @patch("scrapemeagain.utils.http.Config")
+    @patch("scrapemeagain.utils.http._get_session")
+    def test_get_keep_alive(self, mock_get_session, mock_config):
+        """Test 'get' fires requests via a kept alive session."""
+        mock_config.HTTP_KEEP_ALIVE = True
+        mock_config.USER_AGENTS = ["agent"]
+        mock_get_session.return_value.get.return_value = create_response()
+
+        response = get("http://localhost:9090/posts/1")
+
+        self.assertEqual(response.status_code, 200)
+        mock_get_session.return_value.get.assert_called_once()
+
+    @patch("scrapemeagain.utils.http.Config")
+    @patch("scrapemeagain.utils.http.requests")
+    @patch("scrapemeagain.utils.http._get_session")
+    def test_get_no_keep_alive(
+        self, mock_get_session, mock_requests, mock_config
+    ):
+        """Test 'get' doesn't use sessions with keep alive turned off."""
+        mock_config.HTTP_KEEP_ALIVE = False
+        mock_config.USER_AGENTS = ["agent"]
+        mock_requests.get.return_value = create_response()
+
+        get("http://localhost:9090/posts/1")
+
+        mock_requests.get.assert_called_once()
+        mock_get_session.assert_not_called()
+
+
+@skipIf(web is None, "requires aiohttp")
+@patch("scrapemeagain.utils.http.ASYNC_SESSION_CLOSE_INTERVAL", 0.01)
+@patch("scrapemeagain.utils.http.Config")
+class TestAsyncSessions(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    async def _test_reset_sessions_in_flight(self):
+        entered = asyncio.Event()
+        release = asyncio.Event()
+
+        async def handler(request):
+            entered.set()
+            await release.wait()
+            return web.Response(text="Post 1")
+
+        app = web.Application()
+        app.router.add_get("/posts/1", handler)
+        server = TestServer(app)
+        await server.start_server()
+
+        try:
+            request = asyncio.ensure_future(
+                async_get(str(server.make_url("/posts/1")))
+            )
+            await entered.wait()
+            session = _get_async_session()
+
+            reset_sessions()
+            self.assertIsNot(_get_async_session(), session)
+
+            # The outdated session is kept open for the request in flight.
+            await asyncio.sleep(0.05)
+            self.assertFalse(session.closed)
+
+            release.set()
+            response = await request
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content, b"Post 1")
+
+            await asyncio.sleep(0.05)
+            self.assertTrue(session.closed)
+        finally:
+            await _get_async_session().close()
+            await server.close()
+
+    async def _test_async_get(self):
+        async def handler(request):
+            self.assertEqual(request.headers["User-Agent"], "agent")
+            return web.Response(
+                status=404,
+                body=b"Not found",
+                content_type="text/html",
+                charset="utf-8",
+                headers={"Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT"},
+            )
+
+        app = web.Application()
+        app.router.add_get("/posts/1", handler)
+        server = TestServer(app)
+        await server.start_server()
+
+        try:
+            url = str(server.make_url("/posts/1"))
+            response = await async_get(url)
+        finally:
+            await http.close_async_sessions()
+            await server.close()
+
+        self.assertEqual(response.url, url)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.reason, "Not Found")
+        self.assertEqual(response.content, b"Not found")
+        self.assertEqual(response.encoding, "utf-8")
+        self.assertEqual(response.text, "Not found")
+        self.assertEqual(
+            response.headers["content-type"], "text/html; charset=utf-8"
+        )
+        self.assertEqual(
+            response.headers["Last-Modified"], "Wed, 21 Oct 2015 07:28:00 GMT"
+        )
+        self.assertGreater(response.elapsed.total_seconds(), 0)
+
+    def test_async_get(self, mock_config):
+        """Test 'async_get' provides an equivalent `requests.Response`."""
+        mock_config.LOCAL_HTTP_PROXY = None
+        mock_config.USER_AGENTS = ["agent"]
+        mock_config.REQUEST_TIMEOUT = 10
+
+        self.loop.run_until_complete(self._test_async_get())
+
+    @patch("scrapemeagain.utils.http.aiohttp", None)
+    def test_async_get_no_aiohttp(self, mock_config):
+        """Test 'async_get' fails right away if aiohttp isn't installed."""
+        with self.assertRaises(RuntimeError):
+            self.loop.run_until_complete(async_get("url"))
+
+    def test_reset_sessions_in_flight(self, mock_config):
+        """Test an outdated session is closed once its requests finish."""
+        mock_config.LOCAL_HTTP_PROXY = None
+        mock_config.USER_AGENTS = ["agent"]
+        mock_config.REQUEST_TIMEOUT = 10
+
+        self.loop.run_until_complete(self._test_reset_sessions_in_flight())
+
+    async def _test_reset_sessions_timeout(self):
+        session = _get_async_session()
+        # A request which never finishes.
+        http._async_requests[session] = 1
+        self.addCleanup(http._async_requests.pop, session)
+
+        reset_sessions()
+        _get_async_session()
+
+        await asyncio.sleep(0.05)
+        self.assertFalse(session.closed)
+
+        await asyncio.sleep(0.1)
+        self.assertTrue(session.closed)
+
+        await _get_async_session().close()
+
+    def test_reset_sessions_timeout(self, mock_config):
+        """Test an outdated session is closed once its requests time out."""
+        mock_config.REQUEST_TIMEOUT = 0.1
+
+        self.loop.run_until_complete(self._test_reset_sessions_timeout())
@@ -0,0 +1,86 @@
+from unittest import TestCase
+from unittest.mock import call, Mock, patch
+
+from scrapemeagain.iprotator import IpRotator
+
+
+class TestIpRotator(TestCase):
+    def setUp(self):
+        self.ip_rotator = IpRotator(Mock())
+        self.ip_rotator.max_attempts = 3
+        self.ip_rotator.backoff = 1
+        self.ip_rotator.max_backoff = 1.5
+
+    @patch("scrapemeagain.iprotator.logging")
+    def test_change_ip(self, mock_logging):
+        """Test 'change_ip' simply sets a new IP via Tor."""
+        self.ip_rotator.tor_ip_changer.get_new_ip.return_value = "8.8.8.8"
+
+        new_ip = self.ip_rotator.change_ip()
+
+        self.assertEqual(new_ip, "8.8.8.8")
+        self.assertEqual(self.ip_rotator.current_ip, "8.8.8.8")
+        self.ip_rotator.tor_ip_changer.get_new_ip.assert_called_once_with()
+        mock_logging.info.assert_called_once_with(
+            "New IP: {new_ip}".format(new_ip="8.8.8.8")
+        )
+
+    @patch("scrapemeagain.iprotator.logging")
+    def test_change_ip_on_new_ip(self, mock_logging):
+        """Test 'change_ip' calls the new IP callback after IP has changed."""
+        self.ip_rotator.on_new_ip = Mock()
+
+        self.ip_rotator.change_ip()
+
+        self.ip_rotator.on_new_ip.assert_called_once_with()
+
+    @patch("scrapemeagain.iprotator.time")
+    @patch("scrapemeagain.iprotator.logging")
+    def test_change_ip_fail(self, mock_logging, mock_time):
+        """Test 'change_ip' tries again on fail after a while."""
+        self.ip_rotator.tor_ip_changer.get_new_ip.side_effect = [
+            ValueError,
+            "8.8.8.8",
+        ]
+
+        self.ip_rotator.change_ip()
+
+        self.assertEqual(
+            self.ip_rotator.tor_ip_changer.get_new_ip.call_count, 2
+        )
+        mock_time.sleep.assert_called_once_with(1)
+        mock_logging.error.assert_called_once_with("Failed setting new IP")
+        mock_logging.info.assert_called_once_with(
+            "New IP: {new_ip}".format(new_ip="8.8.8.8")
+        )
+
+    @patch("scrapemeagain.iprotator.time")
+    @patch("scrapemeagain.iprotator.logging")
+    def test_change_ip_gives_up(self, mock_logging, mock_time):
+        """Test 'change_ip' gives up after `max_attempts` with a bounded
+        exponential backoff between attempts.
+        """
+        self.ip_rotator.tor_ip_changer.get_new_ip.side_effect = ValueError
+
+        new_ip = self.ip_rotator.change_ip()
+
+        self.assertIsNone(new_ip)
+        self.assertIsNone(self.ip_rotator.current_ip)
+        self.assertEqual(
+            self.ip_rotator.tor_ip_changer.get_new_ip.call_count, 3
+        )
+        self.assertEqual(mock_time.sleep.call_args_list, [call(1), call(1.5)])
+        mock_logging.error.assert_called_with(
+            "Giving up setting new IP after 3 attempts"
+        )
+
+    @patch("scrapemeagain.iprotator.logging")
+    def test_rotate(self, mock_logging):
+        """Test 'rotate' changes IP in the background."""
+        self.ip_rotator.tor_ip_changer.get_new_ip.return_value = "8.8.8.8"
+
+        self.ip_rotator.rotate()
+
+        self.assertTrue(self.ip_rotator.wait(timeout=1))
+        self.assertEqual(self.ip_rotator.current_ip, "8.8.8.8")
+        self.ip_rotator.tor_ip_changer.get_new_ip.assert_called_once_with()
@@ -1,10 +1,16 @@
-from unittest.mock import patch, PropertyMock
+from concurrent.futures import Future
+import threading
+from queue import Empty
+from unittest.mock import call, MagicMock, Mock, patch
 
-from requests import Response
+from requests import ConnectionError, Response
 
 from tests.pipeline_base import TestPipelineBase
-from scrapemeagain.pipeline import EXIT, DockerizedPipeline, DUMP_URLS_BUCKET
-from scrapemeagain.utils.http import get
+from scrapemeagain.config import Config
+from scrapemeagain.pipeline import EXIT, DockerizedPipeline, ItemUrls
+from scrapemeagain.retrier import FailedUrl
+from scrapemeagain.utils.executors import AsyncioExecutor
+from scrapemeagain.utils.http import async_get, get, ResponseRecord
 
 
 def create_responses(mock_urls, mock_statuses):
@@ -22,21 +28,132 @@ def create_responses(mock_urls, mock_statuses):
 
 class TestPipeline(TestPipelineBase):
     @patch("scrapemeagain.pipeline.Value")
-    @patch("scrapemeagain.pipeline.Event")
     @patch("scrapemeagain.pipeline.ThreadPoolExecutor")
     @patch("scrapemeagain.pipeline.Queue")
-    def test_prepare_pipeline(
-        self, mock_queue, mock_pool, mock_event, mock_value
-    ):
+    def test_prepare_pipeline(self, mock_queue, mock_pool, mock_value):
         """Test 'prepare_pipeline' initializes all necessary
         multithreading and multiprocessing objects.
         """
         self.pipeline.prepare_pipeline()
 
-        self.assertTrue(mock_queue.call_count, 3)
+        self.assertEqual(mock_queue.call_count, 3)
         mock_pool.assert_called_once_with(self.pipeline.workers_count)
-        self.assertTrue(mock_event.call_count, 2)
-        self.assertTrue(mock_value.call_count, 2)
+        self.assertEqual(mock_value.call_count, 4)
+
+    @patch("scrapemeagain.pipeline.Config")
+    @patch("scrapemeagain.pipeline.AsyncioExecutor")
+    @patch("scrapemeagain.pipeline.Queue")
+    def test_prepare_pipeline_asyncio(
+        self, mock_queue, mock_executor, mock_config
+    ):
+        """Test 'prepare_pipeline' sets up the 'asyncio' fetch engine."""
+        mock_config.FETCH_ENGINE = "asyncio"
+        mock_config.RESPONSE_TRANSPORT = "queue"
+        mock_config.RATE_LIMITS = {}
+
+        self.pipeline.prepare_pipeline()
+
+        mock_executor.assert_called_once_with(self.pipeline.workers_count)
+        self.assertEqual(self.pipeline.fetch, async_get)
+
+    @patch("scrapemeagain.pipeline.Config")
+    @patch("scrapemeagain.pipeline.SharedMemoryRingBuffer")
+    @patch("scrapemeagain.pipeline.Queue")
+    def test_prepare_pipeline_shared_memory(
+        self, mock_queue, mock_ring_buffer, mock_config
+    ):
+        """Test 'prepare_pipeline' sets up the shared memory transport."""
+        mock_config.FETCH_ENGINE = "threads"
+        mock_config.RESPONSE_TRANSPORT = "shared_memory"
+
+        self.pipeline.prepare_pipeline()
+
+        mock_ring_buffer.assert_called_once_with(
+            mock_config.SHARED_MEMORY_SLOTS,
+            mock_config.SHARED_MEMORY_SLOT_SIZE,
+        )
+        self.assertEqual(
+            self.pipeline.response_buffer, mock_ring_buffer.return_value
+        )
+
+    @patch("scrapemeagain.pipeline.Config")
+    @patch("scrapemeagain.pipeline.rate_limited")
+    @patch("scrapemeagain.pipeline.RateLimiter")
+    @patch("scrapemeagain.pipeline.Queue")
+    def test_prepare_pipeline_rate_limits(
+        self, mock_queue, mock_rate_limiter, mock_rate_limited, mock_config
+    ):
+        """Test 'prepare_pipeline' rate limits requests if set."""
+        mock_config.FETCH_ENGINE = "threads"
+        mock_config.RESPONSE_TRANSPORT = "queue"
+        mock_config.RATE_LIMITS = {"*": (5, 5)}
+
+        self.pipeline.prepare_pipeline()
+
+        mock_rate_limiter.assert_called_once_with({"*": (5, 5)})
+        mock_rate_limited.assert_called_once_with(
+            get, mock_rate_limiter.return_value, self.pipeline._get_current_ip
+        )
+        self.assertEqual(self.pipeline.fetch, mock_rate_limited.return_value)
+
+    @patch("scrapemeagain.pipeline.ConcurrencyController")
+    @patch("scrapemeagain.pipeline.Queue")
+    def test_prepare_pipeline_adaptive_concurrency(
+        self, mock_queue, mock_controller
+    ):
+        """Test 'prepare_pipeline' sets up the adaptive concurrency
+        controller.
+        """
+        self.pipeline.concurrency_mode = "adaptive"
+
+        self.pipeline.prepare_pipeline()
+
+        mock_controller.assert_called_once_with(
+            Config.MIN_WORKERS_COUNT, self.pipeline.workers_count
+        )
+        self.assertEqual(
+            self.pipeline.concurrency, mock_controller.return_value
+        )
+
+    @patch("scrapemeagain.pipeline.Queue")
+    def test_prepare_pipeline_invalid_concurrency_mode(self, mock_queue):
+        """Test 'prepare_pipeline' fails on an unknown concurrency mode."""
+        self.pipeline.concurrency_mode = "yolo"
+
+        with self.assertRaises(ValueError):
+            self.pipeline.prepare_pipeline()
+
+    @patch("scrapemeagain.pipeline.Config")
+    @patch("scrapemeagain.pipeline.Queue")
+    def test_prepare_pipeline_invalid_engine(self, mock_queue, mock_config):
+        """Test 'prepare_pipeline' fails on an unknown fetch engine."""
+        mock_config.FETCH_ENGINE = "carrier-pigeons"
+        mock_config.RESPONSE_TRANSPORT = "queue"
+
+        with self.assertRaises(ValueError):
+            self.pipeline.prepare_pipeline()
+
+    def test_get_queue_depths(self):
+        """Test 'get_queue_depths' reports the backlog of each stage."""
+        self.pipeline.url_queue.qsize.return_value = 1
+        self.pipeline.response_queue.qsize.return_value = 2
+        self.pipeline.data_queue.qsize.return_value = 3
+        self.pipeline.urls_in_flight.value = 4
+        self.pipeline.urls_to_retry.value = 6
+        self.pipeline.response_bytes = Mock()
+        self.pipeline.response_bytes.used_bytes.value = 5
+
+        self.assertEqual(
+            self.pipeline.get_queue_depths(),
+            {
+                "url_queue": 1,
+                "response_queue": 2,
+                "data_queue": 3,
+                "urls_in_flight": 4,
+                "urls_to_retry": 6,
+                "response_queue_bytes": 5,
+            },
+        )
 
     @patch("scrapemeagain.pipeline.get_current_datetime")
     @patch("scrapemeagain.pipeline.logging")
@@ -75,33 +192,72 @@ class TestPipeline(TestPipelineBase):
         with self.assertRaises(AssertionError):
             mock_inform.assert_called_once_with()
 
-    @patch("scrapemeagain.pipeline.logging")
-    def test_change_ip(self, mock_logging):
-        """Test 'change_ip' simply sets a new IP via Tor."""
-        self.pipeline.tor_ip_changer.get_new_ip.return_value = "8.8.8.8"
+    def test_change_ip(self):
+        """Test 'change_ip' requests a new IP to be set in the background."""
+        self.pipeline.ip_rotator = Mock()
 
         self.pipeline.change_ip()
 
-        self.pipeline.tor_ip_changer.get_new_ip.assert_called_once_with()
-        mock_logging.info.assert_called_once_with(
-            "New IP: {new_ip}".format(new_ip="8.8.8.8")
-        )
+        self.pipeline.ip_rotator.rotate.assert_called_once_with()
+        self.assertEqual(self.pipeline.ip_rotator.change_ip.call_count, 0)
 
-    @patch("scrapemeagain.pipeline.logging")
-    def test_change_ip_fail(self, mock_logging):
-        """Test 'change_ip' tries again on fail."""
-        self.pipeline.tor_ip_changer.get_new_ip.side_effect = [
-            ValueError,
-            "8.8.8.8",
-        ]
+    @patch("scrapemeagain.pipeline.Config")
+    def test_change_ip_blocking(self, mock_config):
+        """Test 'change_ip' waits for a new IP if not set in the background."""
+        mock_config.BACKGROUND_IP_CHANGE = False
+        self.pipeline.ip_rotator = Mock()
 
         self.pipeline.change_ip()
 
-        self.assertTrue(self.pipeline.tor_ip_changer.get_new_ip.call_count, 2)
-        mock_logging.error.assert_called_once_with("Failed setting new IP")
-        mock_logging.info.assert_called_once_with(
-            "New IP: {new_ip}".format(new_ip="8.8.8.8")
-        )
+        self.pipeline.ip_rotator.change_ip.assert_called_once_with()
+        self.assertEqual(self.pipeline.ip_rotator.rotate.call_count, 0)
+
+    def test_track_urls(self):
+        """Test '_track_urls' registers URLs entering the pipeline."""
+        self.pipeline._track_urls()
+        self.pipeline._track_urls(5)
+
+        self.assertEqual(self.pipeline.urls_in_flight.value, 6)
+
+    @patch("scrapemeagain.pipeline.Pipeline.exit_workers")
+    def test_release_urls(self, mock_exit_workers):
+        """Test '_release_urls' unregisters processed URLs."""
+        self.pipeline.urls_in_flight.value = 6
+
+        self.pipeline._release_urls(5)
+
+        self.assertEqual(self.pipeline.urls_in_flight.value, 1)
+        self.assertEqual(mock_exit_workers.call_count, 0)
+
+    @patch("scrapemeagain.pipeline.Pipeline.exit_workers")
+    def test_release_urls_exits_workers(self, mock_exit_workers):
+        """Test '_release_urls' exits workers right after the last URL is
+        processed.
+        """
+        self.pipeline.urls_in_flight.value = 1
+
+        self.pipeline._release_urls()
+
+        self.assertEqual(self.pipeline.urls_in_flight.value, 0)
+        mock_exit_workers.assert_called_once_with()
+
+    def test_enqueue_url(self):
+        """Test 'enqueue_url' tracks and puts an URL to 'url_queue'."""
+        self.pipeline.enqueue_url("url1")
+
+        self.pipeline.url_queue.put.assert_called_once_with("url1")
+        self.assertEqual(self.pipeline.urls_in_flight.value, 1)
+
+    @patch("scrapemeagain.pipeline.Pipeline._release_urls")
+    def test_produce_urls(self, mock_release_urls):
+        """Test '_produce_urls' releases an exhausted generator."""
+        generator = (i for i in range(0, 1))
+
+        self.assertTrue(self.pipeline._produce_urls(generator))
+        self.assertEqual(mock_release_urls.call_count, 0)
+
+        self.assertFalse(self.pipeline._produce_urls(generator))
+        mock_release_urls.assert_called_once_with()
 
     def test_generate_list_urls(self):
         """
@@ -123,8 +279,7 @@ class TestPipeline(TestPipelineBase):
         Test `generate_item_urls` returns a generator which populates
         `url_queue` with list URLs.
         """
-        mock_get_item_urls = self.pipeline.databaser.get_item_urls
-        mock_get_item_urls.return_value.yield_per.return_value = ((0,), (1,))
+        self.pipeline.databaser.iter_item_urls.return_value = iter([0, 1])
         self.pipeline.workers_count = 2
 
         item_urls_generator = self.pipeline.generate_item_urls()
@@ -142,30 +297,81 @@ class TestPipeline(TestPipelineBase):
 
         self.pipeline._classify_response(mock_response_ok)
 
-        self.pipeline.response_queue.put.assert_called_once_with(
-            mock_response_ok
-        )
+        self.assertEqual(self.pipeline.response_queue.put.call_count, 1)
+        record = self.pipeline.response_queue.put.call_args[0][0]
+        self.assertIsInstance(record, ResponseRecord)
+        self.assertEqual(record.url, mock_response_ok.url)
+        self.assertEqual(record.status_code, mock_response_ok.status_code)
         with self.assertRaises(AssertionError):
             self.pipeline.url_queue.put.assert_called_once_with(
                 mock_response_ok.url
             )
 
+    def test_classify_response_byte_budget(self):
+        """Test '_classify_response' takes response body size from the
+        response bytes budget.
+        """
+        mock_response_ok = Response()
+        mock_response_ok.url = "url1"
+        mock_response_ok.status_code = 200
+        mock_response_ok._content = b"<h1>Post 1</h1>"
+        self.pipeline.response_bytes = Mock()
+
+        self.pipeline._classify_response(mock_response_ok)
+
+        self.pipeline.response_bytes.acquire.assert_called_once_with(15)
+        self.assertEqual(self.pipeline.response_queue.put.call_count, 1)
+
+    def test_classify_response_shared_memory(self):
+        """Test '_classify_response' moves OK response content to the shared
+        memory ring buffer.
+        """
+        mock_response_ok = Response()
+        mock_response_ok.url = "url1"
+        mock_response_ok.status_code = 200
+        self.pipeline.response_buffer = Mock()
+
+        self.pipeline._classify_response(mock_response_ok)
+
+        record = self.pipeline.response_buffer.pack.call_args[0][0]
+        self.assertIsInstance(record, ResponseRecord)
+        self.pipeline.response_queue.put.assert_called_once_with(
+            self.pipeline.response_buffer.pack.return_value
+        )
+
     def test_classify_response_not_ok(self):
-        """Test '_classify_response' puts a non OK response URL back to
-        'url_queue'."""
+        """Test '_classify_response' schedules a non OK response URL to be
+        retried."""
         mock_response_not_ok = Response()
         mock_response_not_ok.url = "url1"
-        mock_response_not_ok.status_code = 500
+        mock_response_not_ok.status_code = 503
+        mock_response_not_ok.headers["Retry-After"] = "3"
+        self.pipeline.retrier.retry.return_value = True
 
         self.pipeline._classify_response(mock_response_not_ok)
 
-        self.pipeline.url_queue.put.assert_called_once_with(
-            mock_response_not_ok.url
+        self.pipeline.retrier.retry.assert_called_once_with(
+            mock_response_not_ok.url, 503, 3
         )
-        with self.assertRaises(AssertionError):
-            self.pipeline.response_queue.put.assert_called_once_with(
-                mock_response_not_ok
-            )
+        self.pipeline.data_queue.put.assert_not_called()
+        self.pipeline.response_queue.put.assert_not_called()
+
+    def test_classify_response_not_ok_give_up(self):
+        """Test '_classify_response' passes on an URL which is out of retry
+        attempts to be stored as failed."""
+        mock_response_not_ok = Response()
+        mock_response_not_ok.url = "url1"
+        mock_response_not_ok.status_code = 410
+        self.pipeline.scraper.list_url_template = "list"
+        self.pipeline.retrier.retry.return_value = False
+        self.pipeline.retrier.forget.return_value = 1
+
+        self.pipeline._classify_response(mock_response_not_ok)
+
+        self.pipeline.data_queue.put.assert_called_once_with(
+            FailedUrl("url1", 410, 1, False)
+        )
+        self.pipeline.response_queue.put.assert_not_called()
 
     @patch("scrapemeagain.pipeline.logging")
     @patch("scrapemeagain.pipeline.Pipeline._classify_response")
@@ -181,47 +387,248 @@ class TestPipeline(TestPipelineBase):
 
         self.pipeline.pool.map.assert_called_once_with(get, mock_urls)
         self.assertEqual(mock_classify_response.call_count, len(mock_urls))
-        self.pipeline.requesting_in_progress.set.assert_called_once_with()
-        self.pipeline.requesting_in_progress.clear.assert_called_once_with()
         with self.assertRaises(AssertionError):
             mock_logging.error.assert_called_once_with("Failed scraping URLs")
 
     @patch("scrapemeagain.pipeline.logging")
-    def test_actually_get_html_fails(self, mock_logging):
-        """Test '_actually_get_html' logs an exception message on fail."""
+    @patch("scrapemeagain.pipeline.Pipeline._release_urls")
+    def test_actually_get_html_fails(self, mock_release_urls, mock_logging):
+        """Test '_actually_get_html' logs an exception message on fail and
+        releases URLs which weren't classified.
+        """
+        mock_urls = ["url1", "url2", "url3"]
         self.pipeline.pool.map.side_effect = ValueError
 
-        self.pipeline._actually_get_html(None)
+        self.pipeline._actually_get_html(mock_urls)
 
-        self.pipeline.pool.map.assert_called_once_with(get, None)
-        self.pipeline.requesting_in_progress.set.assert_called_once_with()
-        self.pipeline.requesting_in_progress.clear.assert_called_once_with()
+        self.pipeline.pool.map.assert_called_once_with(get, mock_urls)
         mock_logging.error.assert_called_once_with("Failed scraping URLs")
         self.assertEqual(mock_logging.exception.call_count, 1)
+        mock_release_urls.assert_called_once_with(3)
+
+    @patch("scrapemeagain.pipeline.Pipeline._classify_response")
+    def test_actually_get_html_adaptive_concurrency(
+        self, mock_classify_response
+    ):
+        """Test '_actually_get_html' lets the adaptive concurrency controller
+        know about each response.
+        """
+        mock_responses = create_responses(["url1", "url2"], [200, 503])
+        self.pipeline.pool.map.return_value = mock_responses
+        self.pipeline.concurrency = Mock()
+
+        self.pipeline._actually_get_html(["url1", "url2"])
+
+        self.pipeline.concurrency.update.assert_has_calls(
+            [call(mock_responses[0]), call(mock_responses[1])]
+        )
+        self.assertEqual(mock_classify_response.call_count, 2)
 
+    @patch("scrapemeagain.pipeline.Pipeline._release_urls")
+    @patch("scrapemeagain.pipeline.Pipeline._track_urls")
     @patch("scrapemeagain.pipeline.Pipeline._actually_get_html")
     @patch("scrapemeagain.pipeline.Pipeline.change_ip")
     @patch("scrapemeagain.pipeline.Pipeline.inform")
     def test_get_html(
-        self, mock_inform, mock_change_ip, mock_actually_get_html
+        self,
+        mock_inform,
+        mock_change_ip,
+        mock_actually_get_html,
+        mock_track_urls,
+        mock_release_urls,
     ):
         """Test 'get_html' populates and passes URL bulks for processing."""
         mock_urls = ["url1", "url2", "url3"]
         self.pipeline.url_queue.get.side_effect = (
-            mock_urls + [DUMP_URLS_BUCKET] + [EXIT]
+            mock_urls + [Empty()] + [EXIT]
         )
         self.pipeline.workers_count = 4
 
         generator = (i for i in range(0, 1))
         self.pipeline.get_html(generator)
 
-        # 4 = len(mock_urls) + DUMP_URLS_BUCKET + EXIT
+        # 5 = len(mock_urls) + Empty + EXIT
         self.assertEqual(self.pipeline.url_queue.get.call_count, 5)
 
+        # Only the first URL of a bucket is waited for.
+        self.pipeline.url_queue.get.assert_any_call(timeout=None)
+        self.pipeline.url_queue.get.assert_any_call(timeout=0.1)
+
         mock_change_ip.assert_called_once_with()
         mock_actually_get_html.assert_called_once_with(mock_urls)
         mock_inform.assert_called_once_with("URLs to process: 0")
 
+        # The generator is tracked till it's exhausted.
+        mock_track_urls.assert_called_once_with()
+        mock_release_urls.assert_called_once_with()
+
+        # The pool is shut down once done.
+        self.assertIsNone(self.pipeline.pool)
+
+    @patch("scrapemeagain.pipeline.Pipeline._release_urls")
+    @patch("scrapemeagain.pipeline.Pipeline._actually_get_html")
+    @patch("scrapemeagain.pipeline.Pipeline.change_ip")
+    @patch("scrapemeagain.pipeline.Pipeline.inform")
+    def test_get_html_adaptive_concurrency(
+        self,
+        mock_inform,
+        mock_change_ip,
+        mock_actually_get_html,
+        mock_release_urls,
+    ):
+        """Test 'get_html' fills buckets up to the adaptive concurrency
+        limit.
+        """
+        self.pipeline.url_queue.get.side_effect = ["url1", "url2", "url3"] + [
+            EXIT
+        ]
+        self.pipeline.workers_count = 4
+        self.pipeline.concurrency = Mock(limit=2)
+
+        generator = (i for i in range(0, 1))
+        self.pipeline.get_html(generator)
+
+        mock_actually_get_html.assert_has_calls(
+            [call(["url1", "url2"]), call(["url3"])]
+        )
+
+    @patch("scrapemeagain.pipeline.Pipeline.stream_html")
+    def test_get_html_streaming(self, mock_stream_html):
+        """Test 'get_html' streams URLs in the 'streaming' dispatch mode."""
+        self.pipeline.dispatch_mode = "streaming"
+
+        generator = (i for i in range(0, 1))
+        self.pipeline.get_html(generator)
+
+        mock_stream_html.assert_called_once_with(generator)
+        self.assertEqual(self.pipeline.url_queue.get.call_count, 0)
+
+    @patch("scrapemeagain.pipeline.Pipeline.bucket_html")
+    def test_get_html_shutdown(self, mock_bucket_html):
+        """Test 'get_html' shuts the pool down even if it fails and creates
+        a new one for the next run.
+        """
+        mock_pool = self.pipeline.pool
+        self.pipeline.pool_class = Mock()
+        mock_bucket_html.side_effect = ValueError
+
+        with self.assertRaises(ValueError):
+            self.pipeline.get_html(iter([]))
+
+        mock_pool.shutdown.assert_called_once_with()
+        self.assertIsNone(self.pipeline.pool)
+
+        mock_bucket_html.side_effect = None
+        self.pipeline.get_html(iter([]))
+
+        pool_class = self.pipeline.pool_class
+        pool_class.assert_called_once_with(self.pipeline.workers_count)
+        pool_class.return_value.shutdown.assert_called_once_with()
+
+    @patch("scrapemeagain.pipeline.Pipeline._classify_response")
+    @patch("scrapemeagain.pipeline.Pipeline.change_ip")
+    @patch("scrapemeagain.pipeline.Pipeline.inform")
+    def test_stream_html(
+        self, mock_inform, mock_change_ip, mock_classify_response
+    ):
+        """Test 'stream_html' requests URLs one by one, refills the generator
+        and changes IP periodically.
+        """
+        mock_urls = ["url1", "url2", "url3"]
+        self.pipeline.url_queue.get.side_effect = mock_urls + [EXIT]
+        self.pipeline.workers_count = 2
+
+        def submit(fetch, url):
+            future = Future()
+            future.set_result(url)
+            return future
+
+        self.pipeline.pool.submit.side_effect = submit
+
+        generator = Mock()
+        generator.__next__ = Mock(side_effect=[None, StopIteration])
+        self.pipeline.stream_html(generator)
+
+        self.assertEqual(self.pipeline.url_queue.get.call_count, 4)
+        self.assertEqual(self.pipeline.pool.submit.call_count, 3)
+        self.assertEqual(generator.__next__.call_count, 2)
+        self.assertEqual(mock_classify_response.call_count, 3)
+        mock_change_ip.assert_called_once_with()
+
+        # All requests are finished, hence all slots must be free.
+        for _ in range(self.pipeline.workers_count):
+            self.assertTrue(self.pipeline.request_slots.acquire(False))
+
+        # The generator is tracked till it's exhausted.
+        self.assertEqual(self.pipeline.urls_in_flight.value, 0)
+
+    @patch("scrapemeagain.pipeline.Pipeline._classify_response")
+    @patch("scrapemeagain.pipeline.Pipeline.change_ip")
+    @patch("scrapemeagain.pipeline.Pipeline.inform")
+    def test_stream_html_asyncio(
+        self, mock_inform, mock_change_ip, mock_classify_response
+    ):
+        """Test 'stream_html' classifies responses of the 'asyncio' engine
+        off its event loop thread.
+        """
+        self.pipeline.workers_count = 2
+
+        loop_thread = threading.current_thread()
+        classified_by = []
+        classified = threading.Event()
+
+        def classify_response(response):
+            classified_by.append(threading.current_thread())
+            classified.set()
+
+        mock_classify_response.side_effect = classify_response
+
+        # NOTE: the pipeline exits only once all URLs are processed.
+        urls = iter(["url1", EXIT])
+
+        def get():
+            url = next(urls)
+            if url == EXIT:
+                classified.wait(timeout=5)
+            return url
+
+        self.pipeline.url_queue.get.side_effect = get
+
+        self.pipeline.pool = AsyncioExecutor(2)
+        self.addCleanup(self.pipeline.pool.shutdown)
+
+        async def fetch(url):
+            nonlocal loop_thread
+            loop_thread = threading.current_thread()
+            return url
+
+        self.pipeline.fetch = fetch
+        self.pipeline.stream_html(iter([]))
+
+        # All requests are classified once the classifier is shut down.
+        self.assertIsNone(self.pipeline.classifier)
+        self.assertEqual(len(classified_by), 1)
+        self.assertNotEqual(classified_by[0], loop_thread)
+        self.assertNotEqual(classified_by[0], threading.current_thread())
+
+    @patch("scrapemeagain.pipeline.logging")
+    @patch("scrapemeagain.pipeline.Pipeline._classify_response")
+    def test_request_done_fails(self, mock_classify_response, mock_logging):
+        """Test '_request_done' logs an exception message on fail and frees
+        the request's slot anyway.
+        """
+        mock_classify_response.side_effect = ValueError
+        self.pipeline.request_slots = threading.Semaphore(0)
+        self.pipeline.urls_in_flight.value = 2
+
+        future = Future()
+        future.set_result("url1")
+        self.pipeline._request_done(future)
+
+        mock_logging.error.assert_called_once_with("Failed scraping URL")
+        self.assertEqual(self.pipeline.urls_in_flight.value, 1)
+        self.assertTrue(self.pipeline.request_slots.acquire(False))
+
     def test_scrape_data_item_urls(self):
         """Test '_scrape_data' gets item URLs from a list page."""
         mock_item_urls_response = Response()
@@ -233,6 +640,7 @@ class TestPipeline(TestPipelineBase):
 
         data = self.pipeline._scrape_data(mock_item_urls_response)
         self.assertEqual(data, [])
+        self.assertEqual(data.list_url, "url?search=1")
 
         self.pipeline.scraper.get_item_urls.assert_called_once_with(
             mock_item_urls_response
@@ -258,8 +666,9 @@ class TestPipeline(TestPipelineBase):
         with self.assertRaises(AssertionError):
             self.pipeline.scraper.get_item_urls.assert_called_once_with()
 
+    @patch("scrapemeagain.pipeline.Pipeline._release_urls")
     @patch("scrapemeagain.pipeline.Pipeline._scrape_data")
-    def test_actually_collect_data(self, mock_scrape_data):
+    def test_actually_collect_data(self, mock_scrape_data, mock_release_urls):
         """Test '_actually_collect_data' populates 'data_queue'."""
         mock_scrape_data.return_value = {"key": "value"}
 
@@ -270,12 +679,31 @@ class TestPipeline(TestPipelineBase):
         self.pipeline._actually_collect_data(mock_item_response)
 
         self.pipeline.data_queue.put.assert_called_once_with({"key": "value"})
-        self.pipeline.scraping_in_progress.set.assert_called_once_with()
-        self.pipeline.scraping_in_progress.clear.assert_called_once_with()
+        self.assertEqual(mock_release_urls.call_count, 0)
+
+    @patch("scrapemeagain.pipeline.Pipeline._release_urls")
+    @patch("scrapemeagain.pipeline.Pipeline._scrape_data")
+    def test_actually_collect_data_empty(
+        self, mock_scrape_data, mock_release_urls
+    ):
+        """Test '_actually_collect_data' releases an URL without data."""
+        mock_scrape_data.return_value = None
+
+        mock_item_response = Response()
+        mock_item_response.url = "url-item-1"
+        mock_item_response.status_code = 200
+
+        self.pipeline._actually_collect_data(mock_item_response)
+
+        self.assertEqual(self.pipeline.data_queue.put.call_count, 0)
+        mock_release_urls.assert_called_once_with()
 
     @patch("scrapemeagain.pipeline.logging")
+    @patch("scrapemeagain.pipeline.Pipeline._release_urls")
     @patch("scrapemeagain.pipeline.Pipeline._scrape_data")
-    def test_actually_collect_data_fails(self, mock_scrape_data, mock_logging):
+    def test_actually_collect_data_fails(
+        self, mock_scrape_data, mock_release_urls, mock_logging
+    ):
         """Test '_actually_collect_data' logs an exception message on fail."""
         mock_scrape_data.side_effect = ValueError
 
@@ -285,8 +713,7 @@ class TestPipeline(TestPipelineBase):
 
         self.pipeline._actually_collect_data(mock_item_response)
 
-        self.pipeline.scraping_in_progress.set.assert_called_once_with()
-        self.pipeline.scraping_in_progress.clear.assert_called_once_with()
+        mock_release_urls.assert_called_once_with()
         mock_logging.error.assert_called_once_with(
             'Failed processing response for "url-item-1"'
         )
@@ -310,21 +737,91 @@ class TestPipeline(TestPipelineBase):
         # 3 = len(mock_responses)
         self.assertEqual(mock_actually_collect_data.call_count, 3)
 
+    @patch("scrapemeagain.pipeline.Pipeline._actually_collect_data")
+    def test_collect_data_shared_memory(self, mock_actually_collect_data):
+        """Test 'collect_data' reads response content from the shared memory
+        ring buffer.
+        """
+        mock_records = [Mock(), Mock()]
+        self.pipeline.response_queue.get.side_effect = mock_records + [EXIT]
+        self.pipeline.response_buffer = Mock()
+        self.pipeline.response_buffer.unpack.side_effect = ["r1", "r2"]
+
+        self.pipeline.collect_data()
+
+        self.pipeline.response_buffer.unpack.assert_any_call(mock_records[0])
+        self.pipeline.response_buffer.unpack.assert_any_call(mock_records[1])
+        mock_actually_collect_data.assert_any_call("r1")
+        mock_actually_collect_data.assert_any_call("r2")
+
+    @patch("scrapemeagain.pipeline.Pipeline._actually_collect_data")
+    def test_collect_data_byte_budget(self, mock_actually_collect_data):
+        """Test 'collect_data' returns response body size to the response
+        bytes budget.
+        """
+        mock_responses = create_responses(["url1"], [200])
+        mock_responses[0]._content = b"<h1>Post 1</h1>"
+        self.pipeline.response_queue.get.side_effect = mock_responses + [EXIT]
+        self.pipeline.response_bytes = Mock()
+
+        self.pipeline.collect_data()
+
+        self.pipeline.response_bytes.release.assert_called_once_with(15)
+
+    def test_store_failed_url(self):
+        """Test '_store_failed_url' stores a failed URL and removes it from
+        item URLs."""
+        self.pipeline._store_failed_url(FailedUrl("url1", 410, 1, False))
+
+        self.pipeline.databaser.insert_failed_url.assert_called_once_with(
+            "url1", 410, 1, False
+        )
+        self.pipeline.databaser.mark_url_done.assert_called_once_with("url1")
+
+    def test_store_failed_list_url(self):
+        """Test '_store_failed_url' doesn't remove a failed list URL from item
+        URLs."""
+        self.pipeline._store_failed_url(FailedUrl("list1", 503, 6, True))
+
+        self.pipeline.databaser.insert_failed_url.assert_called_once_with(
+            "list1", 503, 6, True
+        )
+        self.pipeline.databaser.mark_url_done.assert_not_called()
+
     def test_store_item_urls(self):
         """Test '_store_item_urls' stores item URLs to DB."""
         mock_data = [{"url": "url1"}, {"url": "url2"}]
 
         self.pipeline._store_item_urls(mock_data)
 
-        self.pipeline.databaser.insert_multiple.assert_called_once_with(
-            mock_data, self.pipeline.databaser.item_urls_table
+        self.pipeline.databaser.insert_item_urls.assert_called_once_with(
+            mock_data
         )
 
+    @patch("scrapemeagain.pipeline.Pipeline.enqueue_url")
+    def test_store_item_urls_streaming(self, mock_enqueue_url):
+        """Test '_store_item_urls' also requests newly stored item URLs right
+        away when streaming item URLs.
+        """
+        self.pipeline.stream_item_urls = True
+        self.pipeline.urls_to_process = MagicMock(value=1)
+        mock_data = [{"url": "url1"}, {"url": "url2"}]
+        self.pipeline.databaser.insert_item_urls.return_value = [
+            {"url": "url2"}
+        ]
+
+        self.pipeline._store_item_urls(mock_data)
+
+        mock_enqueue_url.assert_called_once_with("url2")
+        self.assertEqual(self.pipeline.urls_to_process.value, 2)
+
     def test_store_item_urls_empty(self):
         """Test '_store_item_urls' only stores actual item URLs."""
         self.pipeline._store_item_urls([])
 
-        self.assertEqual(self.pipeline.databaser.insert_multiple.call_count, 0)
+        self.assertEqual(
+            self.pipeline.databaser.insert_item_urls.call_count, 0
+        )
 
     def test_store_item_properties(self):
         """Test '_store_item_properties' saves item properties to DB."""
@@ -335,7 +832,7 @@ class TestPipeline(TestPipelineBase):
         self.pipeline.databaser.insert.assert_called_once_with(
             mock_data, self.pipeline.databaser.item_data_table
         )
-        self.pipeline.databaser.delete_url.assert_called_once_with(
+        self.pipeline.databaser.mark_url_done.assert_called_once_with(
             mock_data["url"]
         )
 
@@ -348,7 +845,7 @@ class TestPipeline(TestPipelineBase):
         self.pipeline._store_item_properties(mock_data)
 
         self.assertEqual(self.pipeline.databaser.insert.call_count, 0)
-        self.pipeline.databaser.delete_url.assert_called_once_with(
+        self.pipeline.databaser.mark_url_done.assert_called_once_with(
             mock_data["url"]
         )
 
@@ -380,12 +877,14 @@ class TestPipeline(TestPipelineBase):
     #     self.pipeline.databaser.commit.assert_called_once_with()
 
     @patch("scrapemeagain.pipeline.logging")
-    def test_actually_store_data_fails(self, mock_logging):
+    @patch("scrapemeagain.pipeline.Pipeline._release_urls")
+    def test_actually_store_data_fails(self, mock_release_urls, mock_logging):
         """Test '_actually_store_data' logs an exception message on fail."""
         self.pipeline._actually_store_data(None)
 
         mock_logging.error.assert_called_once_with("Failed storing data")
         self.assertEqual(mock_logging.exception.call_count, 1)
+        mock_release_urls.assert_called_once_with()
 
     @patch("scrapemeagain.pipeline.Pipeline._actually_store_data")
     def test_store_data(self, mock_actually_store_data):
@@ -411,109 +910,118 @@ class TestPipeline(TestPipelineBase):
         # Should commit after EXIT.
         self.pipeline.databaser.commit.assert_called_once_with()
 
-    @patch("scrapemeagain.pipeline.Pipeline.inform")
-    def test_exit_workers(self, mock_inform):
-        """Test 'exit_workers' passes an EXIT message to all queues."""
-        self.pipeline.exit_workers()
+    @patch("scrapemeagain.pipeline.Pipeline._actually_store_data")
+    def test_store_data_shard(self, mock_actually_store_data):
+        """Test 'store_data' stores data from the shard's 'data_queue' in the
+        shard DB.
+        """
+        databaser = self.pipeline.databaser
+        self.pipeline.data_queues = [Mock(), Mock()]
+        self.pipeline.data_queues[1].get.side_effect = [{"url": "url1"}, EXIT]
 
-        mock_inform.assert_called_once_with("Exiting workers, please wait ...")
+        self.pipeline.store_data(1)
 
-        self.pipeline.url_queue.put.assert_called_once_with(EXIT)
-        self.pipeline.response_queue.put.assert_called_once_with(EXIT)
-        self.pipeline.data_queue.put.assert_called_once_with(EXIT)
+        databaser.get_shard.assert_called_once_with(1)
+        self.assertEqual(
+            self.pipeline.databaser, databaser.get_shard.return_value
+        )
+        self.pipeline._actually_store_data.assert_called_once_with(
+            {"url": "url1"}
+        )
+        self.pipeline.data_queues[0].get.assert_not_called()
+        self.pipeline.databaser.commit.assert_called_once_with()
+        self.pipeline.databaser.close.assert_called_once_with()
 
-    def test_queues_empty(self):
-        """Test '_queues_empty' checks if all queues are empty."""
-        self.pipeline.url_queue.empty.return_value = True
-        self.pipeline.response_queue.empty.return_value = True
-        self.pipeline.data_queue.empty.return_value = True
+    @patch("scrapemeagain.pipeline.Pipeline._actually_store_data")
+    def test_store_data_commits_while_idle(self, mock_actually_store_data):
+        """Test 'store_data' checks whether to commit also when there is no
+        data to store.
+        """
+        self.pipeline.data_queue.get.side_effect = [Empty, EXIT]
 
-        queues_empty = self.pipeline._queues_empty()
+        self.pipeline.store_data()
 
-        self.assertTrue(queues_empty)
+        self.pipeline.data_queue.get.assert_called_with(
+            timeout=Config.TRANSACTION_TIMEOUT
+        )
+        self.pipeline._actually_store_data.assert_not_called()
+        self.pipeline.databaser.commit_if_due.assert_called_once_with()
 
-        self.pipeline.url_queue.empty.assert_called_once_with()
-        self.pipeline.response_queue.empty.assert_called_once_with()
-        self.pipeline.data_queue.empty.assert_called_once_with()
+    def test_put_data_shards(self):
+        """Test 'put_data' passes data to the 'data_queue' of the shard the
+        data's URL belongs to.
+        """
+        self.pipeline.stores_count = 2
+        self.pipeline.data_queues = [Mock(), Mock()]
 
-    def test_workers_idle(self):
-        """Test '_workers_idle' checks if all workers are idle."""
-        self.pipeline.producing_urls_in_progress.is_set.return_value = False
-        self.pipeline.requesting_in_progress.is_set.return_value = False
-        self.pipeline.scraping_in_progress.is_set.return_value = False
+        urls = ["url{}".format(i) for i in range(10)]
+        shards = [self.pipeline._get_shard(url) for url in urls]
+        self.assertEqual(set(shards), {0, 1})
 
-        workers_idle = self.pipeline._workers_idle()
+        self.pipeline.put_data({"url": urls[0], "key": "value"})
+        self.pipeline.data_queues[shards[0]].put.assert_called_once_with(
+            {"url": urls[0], "key": "value"}
+        )
 
-        self.assertTrue(workers_idle)
+        self.pipeline.put_data(ItemUrls([{"url": url} for url in urls], "l1"))
+        for shard, data_queue in enumerate(self.pipeline.data_queues):
+            data_queue.put.assert_called_with(
+                [
+                    {"url": url}
+                    for url in urls
+                    if self.pipeline._get_shard(url) == shard
+                ]
+            )
+            # Each part knows the list URL it comes from.
+            self.assertEqual(data_queue.put.call_args[0][0].list_url, "l1")
 
-        self.pipeline.producing_urls_in_progress.is_set.assert_called_once_with()  # noqa
-        self.pipeline.requesting_in_progress.is_set.assert_called_once_with()
-        self.pipeline.scraping_in_progress.is_set.assert_called_once_with()
+        # The list is split in two parts, i.e. one more to store.
+        self.assertEqual(self.pipeline.urls_in_flight.value, 1)
+        self.assertEqual(self.pipeline.urls_to_process.value, 1)
 
-    @patch("scrapemeagain.pipeline.time")
-    @patch("scrapemeagain.pipeline.Pipeline._inform_progress")
-    @patch("scrapemeagain.pipeline.Pipeline.exit_workers")
-    @patch("scrapemeagain.pipeline.Pipeline._queues_empty")
-    @patch("scrapemeagain.pipeline.Pipeline._workers_idle")
-    def test_switch_power(
-        self,
-        mock_workers_idle,
-        mock_queues_empty,
-        mock_exit_workers,
-        mock_inform_progress,
-        mock_time,
-    ):
-        """Test 'switch_power' repeatedly checks the program can end."""
-        mock_queues_empty.side_effect = [False, False, True, True, True]
-        mock_workers_idle.side_effect = [False, True, True]
+    @patch("scrapemeagain.pipeline.Pipeline.inform")
+    def test_exit_workers(self, mock_inform):
+        """Test 'exit_workers' passes an EXIT message to all queues."""
+        self.pipeline.exit_workers()
 
-        self.pipeline.switch_power()
+        mock_inform.assert_called_once_with("Exiting workers, please wait ...")
 
-        # Both 'url_queue' and 'response_queue' aren't empty once so we expect
-        # 'switch_power' will need to wait 2 times.
-        self.assertEqual(mock_time.sleep.call_count, 2)
-        self.assertEqual(mock_inform_progress.call_count, 2)
-        self.assertEqual(self.pipeline.url_queue.put.call_count, 0)
+        self.pipeline.url_queue.put.assert_called_once_with(EXIT)
+        self.pipeline.response_queue.put.assert_called_once_with(EXIT)
+        self.pipeline.data_queue.put.assert_called_once_with(EXIT)
 
-        mock_exit_workers.assert_called_once_with()
+    @patch("scrapemeagain.pipeline.Pipeline.inform")
+    def test_exit_workers_multiple_stores(self, mock_inform):
+        """Test 'exit_workers' passes an EXIT message to each 'store_data'
+        worker.
+        """
+        self.pipeline.data_queues = [Mock(), Mock()]
 
-    @patch("scrapemeagain.pipeline.logging")
-    @patch("scrapemeagain.pipeline.time")
-    @patch("scrapemeagain.pipeline.Pipeline._inform_progress")
-    @patch("scrapemeagain.pipeline.Pipeline.exit_workers")
-    @patch("scrapemeagain.pipeline.Pipeline._queues_empty")
-    @patch("scrapemeagain.pipeline.Pipeline._workers_idle")
-    def test_switch_power_dumps_urls(
-        self,
-        mock_workers_idle,
-        mock_queues_empty,
-        mock_exit_workers,
-        mock_inform_progress,
-        mock_time,
-        mock_logging,
-    ):
-        """Test 'switch_power' is able to dump URLs bucket."""
-        mock_queues_empty.side_effect = [True, True, True]
-        mock_workers_idle.side_effect = [True, True, True]
-        type(self.pipeline.urls_bucket_empty).value = PropertyMock(
-            side_effect=[0, 0, 1]
-        )
+        self.pipeline.exit_workers()
 
-        self.pipeline.switch_power()
+        for data_queue in self.pipeline.data_queues:
+            data_queue.put.assert_called_once_with(EXIT)
 
-        self.assertEqual(mock_time.sleep.call_count, 1)
-        self.assertEqual(mock_inform_progress.call_count, 1)
-        self.pipeline.url_queue.put.assert_called_once_with(DUMP_URLS_BUCKET)
+    @patch("scrapemeagain.pipeline.Pipeline.inform")
+    def test_exit_workers_multiple_parsers(self, mock_inform):
+        """Test 'exit_workers' passes an EXIT message to each
+        'collect_data' worker.
+        """
+        self.pipeline.parsers_count = 3
 
-        mock_logging.info.assert_called_once_with("Dumping URLs bucket")
-        mock_exit_workers.assert_called_once_with()
+        self.pipeline.exit_workers()
+
+        self.assertEqual(self.pipeline.response_queue.put.call_count, 3)
+        self.pipeline.response_queue.put.assert_called_with(EXIT)
+        self.pipeline.url_queue.put.assert_called_once_with(EXIT)
+        self.pipeline.data_queue.put.assert_called_once_with(EXIT)
 
     @patch("scrapemeagain.pipeline.Process")
     def test_employ_worker(self, mock_process):
         """Test 'employ_worker' creates and registers a dameon worker."""
         self.pipeline.employ_worker(all)
 
-        mock_process.assert_called_once_with(target=all)
+        mock_process.assert_called_once_with(target=all, args=())
         self.assertTrue(mock_process.daemon)
         mock_process.return_value.start.assert_called_once_with()
 
@@ -552,11 +1060,48 @@ class TestPipeline(TestPipelineBase):
         mock_inform.assert_called_once_with("Collecting item URLs")
 
         mock_employ_worker.assert_any_call(self.pipeline.collect_data)
+        collect_data_workers = [
+            c
+            for c in mock_employ_worker.call_args_list
+            if c == call(self.pipeline.collect_data)
+        ]
+        self.assertEqual(
+            len(collect_data_workers), self.pipeline.parsers_count
+        )
         mock_employ_worker.assert_any_call(self.pipeline.store_data)
-        mock_employ_worker.assert_any_call(self.pipeline.switch_power)
         mock_get_html.assert_called_once_with(generator)
         mock_release_workers.assert_called_once_with()
 
+    @patch("scrapemeagain.pipeline.Pipeline.inform")
+    @patch("scrapemeagain.pipeline.Pipeline.release_workers")
+    @patch("scrapemeagain.pipeline.Pipeline.employ_worker")
+    @patch("scrapemeagain.pipeline.Pipeline.get_html")
+    @patch("scrapemeagain.pipeline.Pipeline.generate_list_urls")
+    def test_get_item_urls_multiple_stores(
+        self,
+        mock_generate_list_urls,
+        mock_get_html,
+        mock_employ_worker,
+        mock_release_workers,
+        mock_inform,
+    ):
+        """Test 'get_item_urls' starts a 'store_data' worker per shard and
+        merges shards once all workers are finished.
+        """
+        self.pipeline.stores_count = 2
+        self.pipeline.databaser.merge_shards.side_effect = (
+            lambda: mock_release_workers.assert_called_once_with()
+        )
+
+        self.pipeline.get_item_urls()
+
+        mock_employ_worker.assert_any_call(self.pipeline.store_data, 0)
+        mock_employ_worker.assert_any_call(self.pipeline.store_data, 1)
+        self.assertNotIn(
+            call(self.pipeline.store_data), mock_employ_worker.call_args_list
+        )
+        self.pipeline.databaser.merge_shards.assert_called_once_with()
+
     @patch("scrapemeagain.pipeline.Pipeline.inform")
     @patch("scrapemeagain.pipeline.Pipeline.release_workers")
     @patch("scrapemeagain.pipeline.Pipeline.employ_worker")
@@ -582,14 +1127,228 @@ class TestPipeline(TestPipelineBase):
 
         mock_employ_worker.assert_any_call(self.pipeline.collect_data)
         mock_employ_worker.assert_any_call(self.pipeline.store_data)
-        mock_employ_worker.assert_any_call(self.pipeline.switch_power)
         mock_get_html.assert_called_once_with(generator)
         mock_release_workers.assert_called_once_with()
 
+    @patch("scrapemeagain.pipeline.Pipeline.inform")
+    @patch("scrapemeagain.pipeline.Pipeline.release_workers")
+    @patch("scrapemeagain.pipeline.Pipeline.employ_worker")
+    @patch("scrapemeagain.pipeline.Pipeline.get_html")
+    @patch("scrapemeagain.pipeline.Pipeline.generate_list_urls")
+    def test_get_item_urls_and_properties(
+        self,
+        mock_generate_list_urls,
+        mock_get_html,
+        mock_employ_worker,
+        mock_release_workers,
+        mock_inform,
+    ):
+        """Test 'get_item_urls_and_properties' streams item URLs only while
+        the workers run.
+        """
+        generator = (i for i in range(0, 1))
+        mock_generate_list_urls.return_value = generator
+        mock_get_html.side_effect = lambda generator: self.assertTrue(
+            self.pipeline.stream_item_urls
+        )
+
+        self.pipeline.get_item_urls_and_properties()
+
+        mock_inform.assert_called_once_with(
+            "Collecting item URLs and properties"
+        )
+        mock_employ_worker.assert_any_call(self.pipeline.store_data)
+        mock_get_html.assert_called_once_with(generator)
+        mock_release_workers.assert_called_once_with()
+        self.assertFalse(self.pipeline.stream_item_urls)
+
 
 class TestDockerizedPipeline(TestPipelineBase):
     pipeline_class = DockerizedPipeline
 
+    def setUp(self):
+        super().setUp()
+
+        self.heartbeat_patcher = patch(
+            "scrapemeagain.pipeline.controller_client.Heartbeat"
+        )
+        self.mock_heartbeat = self.heartbeat_patcher.start()
+
+    def tearDown(self):
+        self.heartbeat_patcher.stop()
+
+    @patch("scrapemeagain.pipeline.controller_client.wait_for_list_urls")
+    @patch("scrapemeagain.pipeline.Pipeline.get_item_urls")
+    def test_get_item_urls(self, mock_get_item_urls, mock_wait_for_list_urls):
+        """Test list URLs leased again (as their scraper died) are processed
+        too and the item URLs frontier is told once all item URLs found by
+        the scraper are stored.
+        """
+        mock_wait_for_list_urls.side_effect = [True, False]
+
+        databaser = self.pipeline.databaser
+        databaser.restore_item_urls.side_effect = (
+            lambda: mock_get_item_urls.assert_not_called()
+        )
+        databaser.finish_item_urls_discovery.side_effect = lambda: (
+            self.assertEqual(mock_get_item_urls.call_count, 2)
+        )
+
+        self.pipeline.get_item_urls()
+
+        databaser.restore_item_urls.assert_called_once_with()
+        # The scraper is registered, but not done yet.
+        self.mock_heartbeat.return_value.start.assert_called_once_with()
+        self.mock_heartbeat.return_value.stop.assert_not_called()
+
+        databaser.finish_item_urls_discovery.assert_called_once_with()
+        self.assertEqual(mock_wait_for_list_urls.call_count, 2)
+
+    @patch("scrapemeagain.pipeline.logging")
+    @patch("scrapemeagain.pipeline.Pipeline._release_urls")
+    @patch("scrapemeagain.pipeline.controller_client.release_list_urls")
+    @patch("scrapemeagain.pipeline.Pipeline._scrape_data")
+    def test_actually_collect_data_discard(
+        self,
+        mock_scrape_data,
+        mock_release_list_urls,
+        mock_release_urls,
+        mock_logging,
+    ):
+        """Test a list URL without item URLs, or which failed to be scraped,
+        is released right away, so is an item URL leased from the frontier.
+        """
+        self.pipeline.scraper.list_url_template = "url?search="
+        list_response = ResponseRecord("url?search=1", 200)
+        item_response = ResponseRecord("url-item-1", 200)
+
+        mock_scrape_data.return_value = ItemUrls([{"url": "url1"}], "list1")
+        self.pipeline._actually_collect_data(list_response)
+        mock_release_list_urls.assert_not_called()
+
+        mock_scrape_data.return_value = ItemUrls([], "url?search=1")
+        self.pipeline._actually_collect_data(list_response)
+        mock_release_list_urls.assert_called_once_with(["url?search=1"])
+
+        mock_scrape_data.side_effect = ValueError
+        self.pipeline._actually_collect_data(list_response)
+        mock_release_list_urls.assert_called_with(["url?search=1"])
+        self.assertEqual(mock_release_list_urls.call_count, 2)
+
+        # Item URLs are released in the frontier.
+        mock_scrape_data.side_effect = None
+        mock_scrape_data.return_value = None
+        with patch(
+            "scrapemeagain.pipeline.controller_client.release_item_urls"
+        ) as mock_release_item_urls:
+            self.pipeline.databaser.use_frontier = False
+            self.pipeline._actually_collect_data(item_response)
+            mock_release_item_urls.assert_not_called()
+
+            self.pipeline.databaser.use_frontier = True
+            self.pipeline._actually_collect_data(item_response)
+            mock_release_item_urls.assert_called_once_with(["url-item-1"])
+        self.assertEqual(mock_release_list_urls.call_count, 2)
+
+        # A failed release doesn't stop collecting data.
+        mock_scrape_data.side_effect = ValueError
+        mock_release_list_urls.side_effect = ConnectionError
+        self.pipeline._actually_collect_data(list_response)
+        self.assertEqual(mock_release_urls.call_count, 5)
+
+    @patch("scrapemeagain.pipeline.Pipeline._store_item_urls")
+    def test_store_item_urls(self, mock_store_item_urls):
+        """Test a list URL is marked as done once its item URLs are stored."""
+        data = ItemUrls([{"url": "url1"}], "list1")
+
+        self.pipeline._store_item_urls(data)
+
+        mock_store_item_urls.assert_called_once_with(data)
+        self.pipeline.databaser.mark_list_url_done.assert_called_once_with(
+            "list1"
+        )
+
+    @patch("scrapemeagain.pipeline.Pipeline._store_failed_url")
+    def test_store_failed_url(self, mock_store_failed_url):
+        """Test a failed list URL is marked as done too."""
+        self.pipeline._store_failed_url(FailedUrl("url1", 410, 1, False))
+        self.pipeline.databaser.mark_list_url_done.assert_not_called()
+
+        self.pipeline._store_failed_url(FailedUrl("list1", 503, 6, True))
+        self.pipeline.databaser.mark_list_url_done.assert_called_once_with(
+            "list1"
+        )
+        self.assertEqual(mock_store_failed_url.call_count, 2)
+
+    @patch("scrapemeagain.pipeline.Pipeline.get_item_properties")
+    def test_get_item_properties(self, mock_get_item_properties):
+        """Test item URLs leased again (as their scraper died) are processed
+        too.
+        """
+        databaser = self.pipeline.databaser
+        databaser.wait_for_item_urls.side_effect = [True, False]
+
+        self.pipeline.get_item_properties()
+
+        self.assertEqual(mock_get_item_properties.call_count, 2)
+        self.assertEqual(databaser.wait_for_item_urls.call_count, 2)
+        # The scraper is done once all item properties are collected.
+        self.mock_heartbeat.return_value.start.assert_called_once_with()
+        self.mock_heartbeat.return_value.stop.assert_called_once_with()
+
+    @patch("scrapemeagain.pipeline.DockerizedPipeline.get_item_properties")
+    @patch("scrapemeagain.pipeline.DockerizedPipeline.get_item_urls")
+    def test_get_item_urls_and_properties_frontier(
+        self, mock_get_item_urls, mock_get_item_properties
+    ):
+        """Test item URLs are leased from the frontier rather than streamed,
+        as they are sent to it.
+        """
+        self.pipeline.databaser.use_frontier = True
+
+        self.pipeline.get_item_urls_and_properties()
+
+        mock_get_item_urls.assert_called_once_with()
+        mock_get_item_properties.assert_called_once_with()
+
+    @patch("scrapemeagain.pipeline.controller_client.wait_for_list_urls")
+    @patch("scrapemeagain.pipeline.Pipeline.get_item_urls_and_properties")
+    def test_get_item_urls_and_properties(
+        self, mock_get_item_urls_and_properties, mock_wait_for_list_urls
+    ):
+        """Test item URLs are streamed without the frontier, also from list
+        URLs leased again.
+        """
+        self.pipeline.databaser.use_frontier = False
+        mock_wait_for_list_urls.side_effect = [True, False]
+
+        self.pipeline.get_item_urls_and_properties()
+
+        self.assertEqual(mock_get_item_urls_and_properties.call_count, 2)
+        databaser = self.pipeline.databaser
+        databaser.finish_item_urls_discovery.assert_called_once_with()
+        self.mock_heartbeat.return_value.start.assert_called_once_with()
+        self.mock_heartbeat.return_value.stop.assert_called_once_with()
+
+    @patch("scrapemeagain.pipeline.socket.gethostname", return_value="scp1")
+    @patch("scrapemeagain.pipeline.controller_client.Heartbeat")
+    def test_register_and_finish(self, mock_heartbeat, mock_gethostname):
+        """Test heartbeats are sent from registering till finishing, each
+        done only once.
+        """
+        self.pipeline.finish()
+
+        self.pipeline.register()
+        self.pipeline.register()
+
+        mock_heartbeat.assert_called_once_with("scp1")
+        mock_heartbeat.return_value.start.assert_called_once_with()
+
+        self.pipeline.finish()
+        self.pipeline.finish()
+
+        mock_heartbeat.return_value.stop.assert_called_once_with()
+
     @patch("scrapemeagain.pipeline.Pipeline.inform")
     def test_inform(self, mock_inform):
         self.pipeline.inform("message")
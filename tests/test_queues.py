@@ -0,0 +1,67 @@
+from multiprocessing import Queue
+import threading
+from unittest import TestCase
+from unittest.mock import Mock
+
+from scrapemeagain.utils.http import ResponseRecord
+from scrapemeagain.utils.queues import (
+    ByteBudget,
+    get_body_size,
+    get_queue_size,
+)
+
+
+class TestByteBudget(TestCase):
+    def setUp(self):
+        self.budget = ByteBudget(10)
+
+    def test_acquire_release(self):
+        """Test acquired bytes are returned to the budget on release."""
+        self.budget.acquire(4)
+        self.budget.acquire(6)
+        self.assertEqual(self.budget.used_bytes.value, 10)
+
+        self.budget.release(4)
+        self.assertEqual(self.budget.used_bytes.value, 6)
+
+    def test_acquire_waits(self):
+        """Test 'acquire' waits till there are enough free bytes."""
+        self.budget.acquire(8)
+
+        producer = threading.Thread(target=self.budget.acquire, args=(4,))
+        producer.start()
+        producer.join(0.1)
+        self.assertTrue(producer.is_alive())
+
+        self.budget.release(8)
+        producer.join(1)
+        self.assertFalse(producer.is_alive())
+        self.assertEqual(self.budget.used_bytes.value, 4)
+
+    def test_acquire_oversized(self):
+        """Test an item larger than the budget passes if the budget is
+        unused.
+        """
+        self.budget.acquire(20)
+        self.assertEqual(self.budget.used_bytes.value, 20)
+
+
+class TestQueuesHelpers(TestCase):
+    def test_get_body_size(self):
+        """Test 'get_body_size' ignores items without content."""
+        record = ResponseRecord("url1", 200, b"<h1>Post 1</h1>", "utf-8")
+
+        self.assertEqual(get_body_size(record), 15)
+        self.assertEqual(get_body_size(("url1", {})), 0)
+
+    def test_get_queue_size(self):
+        """Test 'get_queue_size' returns None where 'qsize' isn't
+        implemented.
+        """
+        queue = Queue()
+        queue.put("item")
+        self.assertEqual(get_queue_size(queue), 1)
+
+        queue = Mock()
+        queue.qsize.side_effect = NotImplementedError
+        self.assertIsNone(get_queue_size(queue))
@@ -0,0 +1,108 @@
+import asyncio
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from scrapemeagain.utils.ratelimiter import (
+    ANY_HOST,
+    rate_limited,
+    RateLimiter,
+    TokenBucket,
+)
+
+
+class TestTokenBucket(TestCase):
+    @patch("scrapemeagain.utils.ratelimiter.time")
+    def test_reserve(self, mock_time):
+        """Test 'reserve' lets a burst through and then spaces requests
+        evenly."""
+        mock_time.monotonic.return_value = 100
+        bucket = TokenBucket(rate=2, burst=2)
+
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0.5)
+        self.assertEqual(bucket.reserve(), 1)
+
+    @patch("scrapemeagain.utils.ratelimiter.time")
+    def test_reserve_refill(self, mock_time):
+        """Test tokens are refilled over time, but only up to the burst."""
+        mock_time.monotonic.return_value = 100
+        bucket = TokenBucket(rate=2, burst=2)
+        bucket.reserve()
+        bucket.reserve()
+
+        mock_time.monotonic.return_value = 200
+
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0.5)
+
+
+class TestRateLimiter(TestCase):
+    def setUp(self):
+        self.rate_limiter = RateLimiter(
+            {"api.com": (1, 1), ANY_HOST: (10, 10)}
+        )
+
+    def test_reserve_per_host(self):
+        """Test each host is limited separately."""
+        self.assertEqual(self.rate_limiter.reserve("http://api.com/1"), 0)
+        self.assertGreater(self.rate_limiter.reserve("http://api.com/2"), 0)
+        self.assertEqual(self.rate_limiter.reserve("http://web.com/1"), 0)
+
+    def test_reserve_not_limited(self):
+        """Test hosts without a limit aren't limited."""
+        rate_limiter = RateLimiter({"api.com": (1, 1)})
+
+        for _ in range(5):
+            self.assertEqual(rate_limiter.reserve("http://web.com/1"), 0)
+
+    def test_reserve_per_ip(self):
+        """Test a new exit IP has a fresh allowance."""
+        self.assertEqual(
+            self.rate_limiter.reserve("http://api.com/1", "1.1.1.1"), 0
+        )
+        self.assertGreater(
+            self.rate_limiter.reserve("http://api.com/2", "1.1.1.1"), 0
+        )
+        self.assertEqual(
+            self.rate_limiter.reserve("http://api.com/3", "2.2.2.2"), 0
+        )
+
+
+class TestRateLimited(TestCase):
+    @patch("scrapemeagain.utils.ratelimiter.time")
+    def test_rate_limited(self, mock_time):
+        """Test a fetch function waits for it's turn."""
+        rate_limiter = Mock()
+        rate_limiter.reserve.return_value = 0.5
+        fetch = Mock(return_value="response")
+
+        limited_fetch = rate_limited(fetch, rate_limiter, lambda: "1.1.1.1")
+
+        self.assertEqual(limited_fetch("url1"), "response")
+        rate_limiter.reserve.assert_called_once_with("url1", "1.1.1.1")
+        mock_time.sleep.assert_called_once_with(0.5)
+        fetch.assert_called_once_with("url1")
+
+    def test_rate_limited_async(self):
+        """Test a fetch coroutine function waits for it's turn without
+        blocking the event loop."""
+        rate_limiter = Mock()
+        rate_limiter.reserve.return_value = 0.01
+
+        async def fetch(url):
+            return "response"
+
+        limited_fetch = rate_limited(fetch, rate_limiter, lambda: None)
+
+        self.assertTrue(asyncio.iscoroutinefunction(limited_fetch))
+
+        loop = asyncio.new_event_loop()
+        try:
+            response = loop.run_until_complete(limited_fetch("url1"))
+        finally:
+            loop.close()
+
+        self.assertEqual(response, "response")
+        rate_limiter.reserve.assert_called_once_with("url1", None)
@@ -0,0 +1,112 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from scrapemeagain.dockerized.controller.frontier import ItemUrlsFrontier
+from scrapemeagain.dockerized.controller.registry import ScrapersRegistry
+
+
+@patch("scrapemeagain.dockerized.controller.registry.time.monotonic")
+class TestScrapersRegistry(TestCase):
+    def setUp(self):
+        self.registry = ScrapersRegistry()
+        self.registry.scrapers_count = 2
+        self.registry.heartbeat_timeout = 10
+
+    def test_all_scrapers_finished(self, mock_monotonic):
+        """Test all scrapers are finished once all registered ones are done."""
+        mock_monotonic.return_value = 100
+
+        self.registry.register("scraper1")
+        self.registry.finish("scraper1")
+        self.assertFalse(self.registry.all_scrapers_finished)
+
+        self.registry.register("scraper2")
+        self.assertFalse(self.registry.all_scrapers_finished)
+        self.registry.finish("scraper2")
+        self.assertTrue(self.registry.all_scrapers_finished)
+
+        self.assertEqual(
+            self.registry.get_status(),
+            {"running": [], "done": ["scraper1", "scraper2"], "dead": []},
+        )
+
+    def test_find_dead_scrapers(self, mock_monotonic):
+        """Test running scrapers which missed heartbeats are found dead."""
+        mock_monotonic.return_value = 100
+        self.registry.register("scraper1")
+        self.registry.register("scraper2")
+        self.registry.finish("scraper1")
+
+        mock_monotonic.return_value = 105
+        self.registry.heartbeat("scraper2")
+
+        mock_monotonic.return_value = 115
+        self.assertEqual(self.registry.find_dead_scrapers(), [])
+
+        mock_monotonic.return_value = 116
+        self.assertEqual(self.registry.find_dead_scrapers(), ["scraper2"])
+        # A dead scraper is found only once.
+        self.assertEqual(self.registry.find_dead_scrapers(), [])
+        self.assertTrue(self.registry.all_scrapers_finished)
+
+        # A dead scraper may come back.
+        self.registry.heartbeat("scraper2")
+        self.assertFalse(self.registry.all_scrapers_finished)
+        self.assertEqual(
+            self.registry.get_status(),
+            {"running": ["scraper2"], "done": ["scraper1"], "dead": []},
+        )
+
+    def test_find_unregistered_scrapers(self, mock_monotonic):
+        """Test expected scrapers which didn't register in time are found
+        dead, so they don't block the others.
+        """
+        self.registry.created_at = 100
+        self.registry.registration_timeout = 30
+
+        mock_monotonic.return_value = 100
+        self.registry.register("scraper1")
+        self.registry.finish("scraper1")
+
+        mock_monotonic.return_value = 130
+        self.assertEqual(self.registry.find_dead_scrapers(), [])
+        self.assertFalse(self.registry.all_scrapers_finished)
+
+        mock_monotonic.return_value = 131
+        self.assertEqual(
+            self.registry.find_dead_scrapers(), ["unregistered-1"]
+        )
+        self.assertEqual(self.registry.find_dead_scrapers(), [])
+        self.assertTrue(self.registry.all_scrapers_finished)
+        self.assertEqual(
+            self.registry.get_status(),
+            {"running": [], "done": ["scraper1"], "dead": ["unregistered-1"]},
+        )
+
+        # The frontier doesn't wait for item URLs of the unregistered scraper.
+        frontier = ItemUrlsFrontier()
+        frontier.scrapers_count = self.registry.scrapers_count
+        frontier.finish_discovery("scraper1")
+        frontier.finish_discovery("unregistered-1")
+        self.assertTrue(frontier.all_urls_discovered)
+
+        # A late scraper replaces the placeholder and is running as any other.
+        self.assertEqual(self.registry.register("scraper2"), "unregistered-1")
+        self.assertIsNone(self.registry.register("scraper2"))
+        self.assertFalse(self.registry.all_scrapers_finished)
+        self.assertEqual(
+            self.registry.get_status(),
+            {"running": ["scraper2"], "done": ["scraper1"], "dead": []},
+        )
+        # No other placeholder is created.
+        mock_monotonic.return_value = 135
+        self.assertEqual(self.registry.find_dead_scrapers(), [])
+
+        # The frontier waits for item URLs of the late scraper instead.
+        frontier.undo_finish_discovery("unregistered-1")
+        self.assertFalse(frontier.all_urls_discovered)
+        frontier.finish_discovery("scraper2")
+        self.assertTrue(frontier.all_urls_discovered)
+
+        self.registry.finish("scraper2")
+        self.assertTrue(self.registry.all_scrapers_finished)
@@ -0,0 +1,111 @@
+import multiprocessing
+from queue import Queue
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from scrapemeagain.retrier import get_retry_after, Retrier
+
+
+class TestRetrier(TestCase):
+    def setUp(self):
+        self.requeued = Queue()
+        self.retrier = Retrier(self.requeued.put)
+        self.retrier.max_retries = 2
+        self.retrier.policies = {410: 0}
+        self.retrier.backoff = 0.01
+        self.retrier.max_backoff = 0.04
+
+    @patch("scrapemeagain.retrier.logging")
+    def test_retry(self, mock_logging):
+        """Test 'retry' requeues an URL till it's out of attempts."""
+        self.assertTrue(self.retrier.retry("url1", 503))
+        self.assertEqual(self.requeued.get(timeout=1), "url1")
+
+        self.assertTrue(self.retrier.retry("url1", 503))
+        self.assertEqual(self.requeued.get(timeout=1), "url1")
+
+        self.assertFalse(self.retrier.retry("url1", 503))
+        self.assertTrue(self.requeued.empty())
+        self.assertEqual(self.retrier.forget("url1"), 3)
+        mock_logging.error.assert_called_once_with(
+            'Giving up "url1" after 3 attempts (status 503)'
+        )
+
+    @patch("scrapemeagain.retrier.logging")
+    def test_retry_policy(self, mock_logging):
+        """Test 'retry' follows a policy set for a status code."""
+        self.assertFalse(self.retrier.retry("url1", 410))
+        self.assertEqual(self.retrier.scheduled_count, 0)
+
+    def test_retry_delayed(self):
+        """Test 'retry' requeues an URL only after a backoff."""
+        self.retrier._schedule = Mock()
+
+        self.retrier.retry("url1", 503)
+        self.retrier.retry("url1", 503)
+
+        first_delay = self.retrier._schedule.call_args_list[0][0][1]
+        second_delay = self.retrier._schedule.call_args_list[1][0][1]
+        self.assertTrue(0.005 <= first_delay <= 0.01)
+        self.assertTrue(0.01 <= second_delay <= 0.02)
+
+    def test_retry_after(self):
+        """Test 'retry' honors the delay requested by the server, but only up
+        to the max backoff."""
+        self.retrier._schedule = Mock()
+
+        self.retrier.retry("url1", 503, retry_after=1000)
+
+        self.retrier._schedule.assert_called_once_with("url1", 0.04)
+
+    def test_scheduled_in_order(self):
+        """Test URLs are requeued in the order they become due."""
+        self.retrier._schedule("url1", 0.05)
+        self.retrier._schedule("url2", 0)
+
+        self.assertEqual(self.requeued.get(timeout=1), "url2")
+        self.assertEqual(self.requeued.get(timeout=1), "url1")
+
+    def test_scheduled_count(self):
+        """Test the number of scheduled URLs is shared with other processes
+        and doesn't depend on the schedule being unlocked.
+        """
+        self.retrier._schedule("url1", 0.05)
+        self.retrier._schedule("url2", 0.05)
+
+        with self.retrier._condition:
+            counted = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=lambda: counted.put(self.retrier.scheduled_count)
+            )
+            process.start()
+            process.join(timeout=5)
+            self.assertEqual(counted.get(timeout=1), 2)
+
+        self.requeued.get(timeout=1)
+        self.requeued.get(timeout=1)
+        self.assertEqual(self.retrier.scheduled_count, 0)
+
+    def test_forget(self):
+        """Test 'forget' resets attempts of an URL."""
+        self.retrier._schedule = Mock()
+        self.retrier.retry("url1", 503)
+
+        self.assertEqual(self.retrier.forget("url1"), 1)
+        self.assertEqual(self.retrier.forget("url1"), 0)
+
+
+class TestGetRetryAfter(TestCase):
+    def test_get_retry_after(self):
+        """Test 'get_retry_after' reads the delay in seconds."""
+        response = Mock(headers={"Retry-After": "120"})
+        self.assertEqual(get_retry_after(response), 120)
+
+    def test_get_retry_after_not_seconds(self):
+        """Test 'get_retry_after' ignores missing or HTTP date values."""
+        self.assertIsNone(get_retry_after(Mock(headers={})))
+        self.assertIsNone(
+            get_retry_after(
+                Mock(headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})
+            )
+        )
@@ -0,0 +1,71 @@
+from multiprocessing import Process, Queue
+import pickle
+from unittest import TestCase
+
+from scrapemeagain.utils.http import ResponseRecord
+from scrapemeagain.utils.ringbuffer import (
+    BufferedResponseRecord,
+    SharedMemoryRingBuffer,
+)
+
+
+def unpack_in_process(ring_buffer, records, results):
+    for record in records:
+        results.put(ring_buffer.unpack(pickle.loads(record)).content)
+
+
+class TestSharedMemoryRingBuffer(TestCase):
+    def setUp(self):
+        self.ring_buffer = SharedMemoryRingBuffer(2, 16)
+
+    def tearDown(self):
+        self.ring_buffer.unlink()
+
+    def test_pack_unpack(self):
+        """Test a record content goes through a slot which is freed after
+        the content is read.
+        """
+        record = ResponseRecord("url1", 200, b"<h1>Post 1</h1>", "utf-8")
+
+        buffered_record = self.ring_buffer.pack(record)
+
+        self.assertIsInstance(buffered_record, BufferedResponseRecord)
+        self.assertIsNone(buffered_record.content)
+
+        unpacked_record = self.ring_buffer.unpack(buffered_record)
+
+        self.assertEqual(unpacked_record.url, "url1")
+        self.assertEqual(unpacked_record.content, b"<h1>Post 1</h1>")
+        self.assertEqual(unpacked_record.encoding, "utf-8")
+
+        # Both slots must be free again.
+        self.ring_buffer.free_slots.get(timeout=1)
+        self.ring_buffer.free_slots.get(timeout=1)
+
+    def test_pack_large_content(self):
+        """Test content larger than a slot is left in the record."""
+        record = ResponseRecord("url1", 200, b"x" * 17)
+
+        self.assertIs(self.ring_buffer.pack(record), record)
+
+    def test_unpack_not_buffered(self):
+        """Test unpacking leaves any other object untouched."""
+        self.assertEqual(self.ring_buffer.unpack("__exit__"), "__exit__")
+
+    def test_unpack_in_another_process(self):
+        """Test content written by one process can be read by another."""
+        records = [
+            pickle.dumps(self.ring_buffer.pack(ResponseRecord(url, 200, url)))
+            for url in (b"url1", b"url2")
+        ]
+        results = Queue()
+
+        process = Process(
+            target=unpack_in_process,
+            args=(self.ring_buffer, records, results),
+        )
+        process.start()
+        process.join()
+
+        self.assertEqual(results.get(timeout=1), b"url1")
+        self.assertEqual(results.get(timeout=1), b"url2")
@@ -0,0 +1,132 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from scrapemeagain.dockerized.controller.urlbrokers import UrlsRangeManager
+
+
+class FakeUrlsRangeManager(UrlsRangeManager):
+    def get_urls_count(self):
+        return 25
+
+
+class TestUrlsRangeManager(TestCase):
+    def setUp(self):
+        self.broker = FakeUrlsRangeManager()
+        self.broker.chunk_size = 10
+        self.broker.lease_timeout = 60
+
+    def test_generate_urls_chunks(self):
+        """Test URLs are split to chunks of at most `chunk_size` URLs."""
+        self.assertEqual(
+            list(self.broker.generate_urls_chunks()),
+            [(25, 15), (15, 5), (5, 0)],
+        )
+
+        self.broker.descending = False
+        self.assertEqual(
+            list(self.broker.generate_urls_chunks()),
+            [(15, 25), (5, 15), (0, 5)],
+        )
+
+    def test_lease_urls_range(self):
+        """Test chunks are leased one by one till all are released."""
+        leases = [self.broker.lease_urls_range() for _ in range(3)]
+        self.assertEqual(leases, [(1, (25, 15)), (2, (15, 5)), (3, (5, 0))])
+
+        self.assertEqual(self.broker.lease_urls_range(), (None, None))
+        self.assertFalse(self.broker.all_urls_released)
+
+        for lease_id, _ in leases:
+            self.assertTrue(self.broker.release_urls_range(lease_id))
+        self.assertFalse(self.broker.release_urls_range(1))
+
+        self.assertTrue(self.broker.all_urls_released)
+
+    @patch("scrapemeagain.dockerized.controller.urlbrokers.time.monotonic")
+    def test_lease_urls_range_expired(self, mock_monotonic):
+        """Test a chunk is leased again once its lease expires."""
+        mock_monotonic.return_value = 100
+        self.broker.lease_urls_range()
+        self.broker.lease_urls_range()
+
+        mock_monotonic.return_value = 130
+        self.assertEqual(self.broker.pending_count, 1)
+
+        mock_monotonic.return_value = 160
+        self.assertEqual(self.broker.pending_count, 3)
+        self.assertEqual(self.broker.lease_urls_range(), (3, (25, 15)))
+        self.assertEqual(self.broker.lease_urls_range(), (4, (15, 5)))
+        self.assertEqual(self.broker.lease_urls_range(), (5, (5, 0)))
+
+        # The expired lease stays released.
+        self.assertFalse(self.broker.release_urls_range(1))
+
+    def test_expire_leases(self):
+        """Test chunks leased to a scraper are leased again right away."""
+        self.broker.lease_urls_range("scraper1")
+        self.broker.lease_urls_range("scraper2")
+        self.broker.lease_urls_range("scraper1")
+
+        self.broker.expire_leases("scraper1")
+
+        self.assertEqual(
+            self.broker.lease_urls_range("scraper2"), (4, (25, 15))
+        )
+        self.assertEqual(self.broker.lease_urls_range("scraper2"), (5, (5, 0)))
+        self.assertEqual(self.broker.lease_urls_range(), (None, None))
+        self.assertEqual(
+            self.broker._lease_owners,
+            {2: "scraper2", 4: "scraper2", 5: "scraper2"},
+        )
+
+    def test_release_urls(self):
+        """Test a chunk is released once all of its URLs are released."""
+        self.assertTrue(self.broker.all_urls_released)
+
+        self.broker.lease_urls_range()
+        self.assertTrue(self.broker.assign_urls(1, ["url25", "url24"]))
+        self.assertFalse(self.broker.assign_urls(2, ["url15"]))
+
+        self.broker.release_urls(["url25", "unknown"])
+        self.assertIn(1, self.broker._leases)
+
+        self.broker.release_urls(["url24"])
+        self.assertNotIn(1, self.broker._leases)
+        self.assertEqual(self.broker._url_leases, {})
+
+        # A chunk without URLs is released right away.
+        self.broker.lease_urls_range()
+        self.assertTrue(self.broker.assign_urls(2, []))
+        self.assertNotIn(2, self.broker._leases)
+
+        self.assertFalse(self.broker.all_urls_released)
+        self.broker.lease_urls_range()
+        self.assertTrue(self.broker.all_urls_leased)
+        self.assertFalse(self.broker.all_urls_released)
+
+        self.broker.release_urls_range(3)
+        self.assertTrue(self.broker.all_urls_released)
+
+    def test_scraper_died_with_urls_queued(self):
+        """Test URLs of a chunk which were taken, but not processed yet, by a
+        scraper which died are leased again.
+        """
+        self.broker.lease_urls_range("scraper1")
+        self.broker.assign_urls(1, ["url25", "url24", "url23"])
+        # The scraper moved on to the next chunk while URLs of the first one
+        # are still queued.
+        self.broker.lease_urls_range("scraper1")
+        self.broker.release_urls(["url25"])
+
+        self.broker.expire_leases("scraper1")
+
+        self.assertEqual(self.broker.pending_count, 3)
+        self.assertEqual(
+            self.broker.lease_urls_range("scraper2"), (3, (25, 15))
+        )
+        self.assertEqual(self.broker._url_leases, {})
+
+        # The dead scraper's late releases don't release the new lease.
+        self.broker.assign_urls(3, ["url25", "url24", "url23"])
+        self.broker.release_urls(["url24"])
+        self.assertIn(3, self.broker._leases)